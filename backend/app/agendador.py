@@ -0,0 +1,329 @@
+import os
+import time
+import uuid
+import queue
+import hashlib
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from .eventos import PublicadorDeEventos
+from .exclusao import obter_filtro
+from .jobs import JobStore
+from .metricas import MedidorDeEtapas, perfilar
+from .parcelamentos import Painel, sha256_do_painel
+from .processing import (DATASET_PADRAO, MODO_PADRAO, TERMOS_EXCLUIR, UF_DESEJADA, normalizar_dataset, normalizar_modo, normalizar_ufs,
+                         preparar_base, processar_dados)
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Quantos jobs rodam ao mesmo tempo neste worker do uvicorn; os demais esperam na fila (FIFO).
+MAXIMO_JOBS_SIMULTANEOS = int(os.environ.get("PGFN_MAX_JOBS", "2"))
+# Intervalo (em segundos) com que pedidos de cancelamento feitos por outros workers são verificados.
+INTERVALO_VERIFICACAO_CANCELAMENTO = 1.0
+# Intervalo (em segundos) com que o batimento dos jobs deste worker é renovado; bem abaixo de LIMITE_BATIMENTO_SEGUNDOS.
+INTERVALO_BATIMENTO = 10.0
+
+
+class JobCancelado(Exception):
+    pass
+
+
+def chave_do_job(arquivo_parcelamento: Union[Painel, List[Painel]], valor_minimo: float, termos_excluir: Optional[List[str]], perfil: bool = False,
+                 ufs: Tuple[str, ...] = (UF_DESEJADA,), dataset: str = DATASET_PADRAO, modo: str = MODO_PADRAO,
+                 hashes: Optional[List[str]] = None) -> str:
+    """
+    Identifica requisições idênticas: mesmos arquivos enviados, na mesma ordem, mesmo valor mínimo, termos equivalentes,
+    mesmo modo de perfil e mesmas UFs, conjunto de dados e modo (completo ou delta), já normalizados.
+    `hashes` traz o SHA-256 de cada arquivo quando já foi calculado (no recebimento do upload).
+    """
+    termos = obter_filtro(termos_excluir if termos_excluir is not None else TERMOS_EXCLUIR).termos
+    arquivos = [arquivo_parcelamento] if isinstance(arquivo_parcelamento, (bytes, str)) else arquivo_parcelamento
+    chave = hashlib.sha256()
+    for resumo in hashes or [sha256_do_painel(arquivo) for arquivo in arquivos]:
+        chave.update(bytes.fromhex(resumo))
+    chave.update(repr((float(valor_minimo), termos, perfil, tuple(ufs), dataset, modo)).encode("utf-8"))
+    return chave.hexdigest()
+
+
+def _executar_job(job_id: str, valor_minimo: float, arquivo_parcelamento: Union[Painel, List[Painel]], termos_excluir: Optional[List[str]],
+                  perfil: bool, ufs: List[str], dataset: str, modo: str, cancelamentos, eventos) -> Tuple[Dict, List[Dict], Optional[str]]:
+    """
+    Executado num processo do pool. A cada evento de progresso verifica se o job foi cancelado
+    e publica o evento para o processo principal. Devolve o resultado, as métricas das etapas
+    e, no modo de perfil, o relatório do cProfile.
+    """
+    publicar = PublicadorDeEventos(job_id, eventos)
+
+    def progresso(etapa: str, **detalhes):
+        if cancelamentos.get(job_id):
+            raise JobCancelado(f"Job cancelado durante a etapa '{etapa}'.")
+        publicar(etapa, **detalhes)
+
+    metricas: List[Dict] = []
+    try:
+        with perfilar(perfil) as relatorio:
+            resultado = processar_dados(valor_minimo, arquivo_parcelamento, termos_excluir, progresso=progresso, metricas=metricas,
+                                        uf=ufs, dataset=dataset, modo=modo)
+    except Exception as e:
+        # As métricas das etapas já executadas (inclusive a que falhou) seguem com a exceção para o processo principal
+        e.metricas = metricas
+        raise
+    return resultado, metricas, relatorio["texto"]
+
+
+class Agendador:
+    """
+    Executa os jobs num pool de processos dedicado, com no máximo MAXIMO_JOBS_SIMULTANEOS ao mesmo tempo.
+    Os jobs excedentes esperam numa fila FIFO própria (e não na fila interna do pool) para que seja
+    possível informar a posição de cada um e cancelá-los antes de começarem.
+    Requisições idênticas a um job na fila, em execução ou concluído são anexadas a esse job; o batimento
+    renovado pelo monitor é o que indica que um job na fila ou em execução ainda tem um worker vivo.
+    """
+
+    def __init__(self, jobs: JobStore, maximo_simultaneos: int = MAXIMO_JOBS_SIMULTANEOS):
+        self.jobs = jobs
+        self.maximo_simultaneos = maximo_simultaneos
+        self._fila: Deque[Tuple[str, tuple]] = deque()
+        self._em_execucao: Dict[str, Future] = {}
+        self._trava = threading.RLock()
+        self._contexto = multiprocessing.get_context("spawn")
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._gerenciador = None
+        self._cancelamentos = None
+        self._eventos = None
+        self._posicoes: Dict[str, int] = {}
+        self._parar = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        self._gravador_eventos: Optional[threading.Thread] = None
+        # Futures concluídos esperando o finalizador (gravar o resultado e despachar o próximo da fila)
+        self._concluidos: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._finalizador: Optional[threading.Thread] = None
+        # Preparação das bases (download e particionamento por UF) pedidas fora de um job, por conjunto de dados
+        self._preparacoes: Dict[str, Future] = {}
+
+    def _iniciar(self):
+        if self._pool is None:
+            self._gerenciador = self._contexto.Manager()
+            self._cancelamentos = self._gerenciador.dict()
+            self._eventos = self._gerenciador.Queue()
+            self._pool = ProcessPoolExecutor(max_workers=self.maximo_simultaneos, mp_context=self._contexto)
+            self._monitor = threading.Thread(target=self._monitorar, daemon=True)
+            self._monitor.start()
+            self._gravador_eventos = threading.Thread(target=self._gravar_eventos, daemon=True)
+            self._gravador_eventos.start()
+            self._finalizador = threading.Thread(target=self._finalizar_concluidos, daemon=True)
+            self._finalizador.start()
+
+    def _publicar(self, job_id: str, etapa: str, **detalhes):
+        # Passa pela mesma fila dos eventos dos workers, para que tudo seja gravado na ordem em que aconteceu
+        self._eventos.put((job_id, etapa, detalhes))
+
+    def _gravar_eventos(self):
+        while True:
+            item = self._eventos.get()
+            if item is None:
+                return
+            job_id, etapa, detalhes = item
+            self.jobs.registrar_evento(job_id, etapa, detalhes)
+
+    def submeter(self, valor_minimo: float, arquivo_parcelamento: Union[Painel, List[Painel]], termos_excluir: Optional[List[str]] = None,
+                 perfil: bool = False, uf: Union[str, List[str]] = UF_DESEJADA, dataset: str = DATASET_PADRAO,
+                 modo: str = MODO_PADRAO, hashes: Optional[List[str]] = None) -> Tuple[str, bool]:
+        """
+        Enfileira um job e retorna (job_id, reaproveitado). Com `perfil`, o job roda sob o cProfile.
+        Os arquivos podem vir como bytes ou como caminhos em disco; com caminhos, só eles passam para o
+        processo do job. UF, conjunto de dados ou modo inválidos levantam ValueError antes de qualquer job ser criado.
+        """
+        ufs, dataset = normalizar_ufs(uf), normalizar_dataset(dataset)
+        modo = normalizar_modo(modo, dataset)
+        chave = chave_do_job(arquivo_parcelamento, valor_minimo, termos_excluir, perfil, tuple(ufs), dataset, modo, hashes)
+        with self._trava:
+            existente = self.jobs.buscar_por_chave(chave)
+            if existente:
+                return existente["job_id"], True
+
+            self._iniciar()
+            job_id = str(uuid.uuid4())
+            self.jobs.criar(job_id, status="na_fila", chave=chave)
+            self._fila.append((job_id, (valor_minimo, arquivo_parcelamento, termos_excluir, perfil, ufs, dataset, modo)))
+            self._despachar()
+        return job_id, False
+
+    def preparar(self, dataset: str = DATASET_PADRAO) -> bool:
+        """
+        Baixa e particiona o ZIP do conjunto de dados num processo do pool, para que a API não faça isso dentro
+        de uma requisição. Retorna False se a preparação desse conjunto já está em andamento neste worker.
+        A preparação não ocupa uma vaga da fila de jobs; ela só acontece quando a base muda (uma vez por trimestre).
+        """
+        dataset = normalizar_dataset(dataset)
+        with self._trava:
+            if dataset in self._preparacoes and not self._preparacoes[dataset].done():
+                return False
+            self._iniciar()
+            print(f"[AGENDADOR] Preparando a base do conjunto {dataset}...")
+            try:
+                futuro = self._submeter(preparar_base, dataset)
+            except Exception as e:
+                print(f"[AGENDADOR] Não foi possível iniciar a preparação da base do conjunto {dataset}: {e}")
+                return False
+            self._preparacoes[dataset] = futuro
+        futuro.add_done_callback(lambda f: self._relatar_preparacao(dataset, f))
+        return True
+
+    def _relatar_preparacao(self, dataset: str, futuro: Future):
+        if futuro.cancelled():
+            return
+        if futuro.exception() is not None:
+            print(f"[AGENDADOR] Falha ao preparar a base do conjunto {dataset}: {futuro.exception()}")
+        else:
+            print(f"[AGENDADOR] Base do conjunto {dataset} preparada.")
+
+    def cancelar(self, job_id: str) -> bool:
+        """
+        Cancela um job na fila (imediatamente) ou em execução (na próxima troca de etapa).
+        Jobs que pertencem a outro worker recebem o pedido pelo armazenamento de jobs.
+        """
+        job = self.jobs.obter(job_id)
+        if not job or job["status"] not in ("na_fila", "processando"):
+            return False
+        self.jobs.atualizar(job_id, cancelamento_solicitado=1)
+        self._aplicar_cancelamento(job_id)
+        return True
+
+    def _aplicar_cancelamento(self, job_id: str):
+        with self._trava:
+            for item in list(self._fila):
+                if item[0] == job_id:
+                    self._fila.remove(item)
+                    self._posicoes.pop(job_id, None)
+                    self.jobs.atualizar(job_id, status="cancelado", posicao_fila=None)
+                    self._publicar(job_id, "cancelado")
+                    self._atualizar_posicoes()
+                    return
+            if job_id in self._em_execucao:
+                self._cancelamentos[job_id] = True
+
+    def _monitorar(self):
+        """Aplica os cancelamentos pedidos por outros workers e mantém vivo o batimento dos jobs deste worker."""
+        ultimo_batimento = time.monotonic()
+        while not self._parar.wait(INTERVALO_VERIFICACAO_CANCELAMENTO):
+            with self._trava:
+                locais = [job_id for job_id, _ in self._fila] + list(self._em_execucao)
+            if locais and time.monotonic() - ultimo_batimento >= INTERVALO_BATIMENTO:
+                try:
+                    self.jobs.registrar_batimento(locais)
+                    ultimo_batimento = time.monotonic()
+                except Exception as e:
+                    print(f"[AGENDADOR] Falha ao renovar o batimento dos jobs: {e}")
+            for job_id in locais:
+                job = self.jobs.obter(job_id)
+                if job and job["cancelamento_solicitado"]:
+                    self._aplicar_cancelamento(job_id)
+
+    def _atualizar_posicoes(self):
+        for posicao, (job_id, _) in enumerate(self._fila, start=1):
+            if self._posicoes.get(job_id) != posicao:
+                self._posicoes[job_id] = posicao
+                self.jobs.atualizar(job_id, posicao_fila=posicao)
+                self._publicar(job_id, "na_fila", posicao_fila=posicao)
+
+    def _despachar(self):
+        with self._trava:
+            while self._fila and len(self._em_execucao) < self.maximo_simultaneos:
+                job_id, argumentos = self._fila.popleft()
+                self._posicoes.pop(job_id, None)
+                self.jobs.atualizar(job_id, status="processando", posicao_fila=None)
+                self._publicar(job_id, "processando")
+                try:
+                    futuro = self._submeter(_executar_job, job_id, *argumentos, self._cancelamentos, self._eventos)
+                except Exception as e:
+                    # O job já saiu da fila: sem isso ele ficaria "processando" para sempre
+                    erro = f"Não foi possível iniciar o job: {e or e.__class__.__name__}"
+                    self.jobs.atualizar(job_id, status="erro", erro=erro)
+                    self._publicar(job_id, "erro", erro=erro)
+                    continue
+                self._em_execucao[job_id] = futuro
+                # O callback roda na thread de gerenciamento do pool; ele só repassa o future ao finalizador
+                futuro.add_done_callback(lambda f, job_id=job_id: self._concluidos.put((job_id, f)))
+            self._atualizar_posicoes()
+
+    def _submeter(self, funcao, *argumentos) -> Future:
+        """Envia a tarefa ao pool. Se um worker morreu (por exemplo, falta de memória), o pool quebrado é trocado por um novo."""
+        try:
+            return self._pool.submit(funcao, *argumentos)
+        except BrokenProcessPool:
+            print("[AGENDADOR] Pool de processos quebrado; criando um novo.")
+            # Desliga o pool quebrado sem esperar, para não deixar processos e threads de gerenciamento para trás
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = ProcessPoolExecutor(max_workers=self.maximo_simultaneos, mp_context=self._contexto)
+            return self._pool.submit(funcao, *argumentos)
+
+    def _finalizar_concluidos(self):
+        """
+        Thread dedicada aos jobs concluídos: serializar e gravar o resultado pode demorar, e recriar o pool
+        depois de um BrokenProcessPool não pode acontecer dentro da thread que o próprio pool usa.
+        """
+        while True:
+            item = self._concluidos.get()
+            if item is None:
+                return
+            try:
+                self._finalizar(*item)
+            except Exception as e:
+                # Uma falha ao despachar o próximo job não pode parar a finalização dos demais
+                print(f"[AGENDADOR] Falha ao finalizar o job {item[0]}: {e}")
+
+    def _finalizar(self, job_id: str, futuro: Future):
+        metricas: List[Dict] = []
+        try:
+            resultado, metricas, relatorio_perfil = futuro.result()
+            medidor = MedidorDeEtapas(lambda etapa: self._publicar(job_id, etapa), metricas)
+            with medidor.etapa("serializando", linhas_entrada=sum(len(df) for df in resultado.values())) as etapa:
+                self.jobs.gravar_resultado(job_id, resultado)
+                etapa["linhas_saida"] = etapa["linhas_entrada"]
+            self.jobs.registrar_metricas(job_id, metricas)
+            self.jobs.atualizar(job_id, status="concluido", perfil=relatorio_perfil)
+            self._publicar(job_id, "concluido")
+        except JobCancelado as e:
+            self._registrar_metricas_parciais(job_id, getattr(e, "metricas", metricas))
+            self.jobs.atualizar(job_id, status="cancelado")
+            self._publicar(job_id, "cancelado")
+        except Exception as e:
+            self._registrar_metricas_parciais(job_id, getattr(e, "metricas", metricas))
+            erro = str(e) or e.__class__.__name__
+            self.jobs.atualizar(job_id, status="erro", erro=erro)
+            self._publicar(job_id, "erro", erro=erro)
+        finally:
+            with self._trava:
+                self._em_execucao.pop(job_id, None)
+                self._cancelamentos.pop(job_id, None)
+            if not self._parar.is_set():
+                self._despachar()
+
+    def _registrar_metricas_parciais(self, job_id: str, metricas: List[Dict]):
+        """Guarda as métricas de um job que falhou ou foi cancelado; a etapa interrompida vem marcada com `erro`."""
+        if not metricas:
+            return
+        try:
+            self.jobs.registrar_metricas(job_id, metricas)
+        except Exception as e:
+            print(f"[AGENDADOR] Falha ao registrar as métricas do job {job_id}: {e}")
+
+    def encerrar(self):
+        """Para o pool; jobs ainda na fila ficam marcados como cancelados."""
+        self._parar.set()
+        with self._trava:
+            while self._fila:
+                job_id, _ = self._fila.popleft()
+                self.jobs.atualizar(job_id, status="cancelado", erro="Servidor encerrado antes do início do job.")
+                self._publicar(job_id, "cancelado")
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._concluidos.put(None)
+            self._finalizador.join()
+            self._eventos.put(None)
+            self._gravador_eventos.join()
+            self._gerenciador.shutdown()
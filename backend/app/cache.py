@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: a trava entre processos fica desativada
+    fcntl = None
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Diretório onde os arquivos baixados da PGFN ficam guardados entre um job e outro.
+DIRETORIO_CACHE = os.environ.get("PGFN_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pgfn_cache"))
+# Tempo (em segundos) durante o qual o arquivo em cache é usado sem revalidar com o servidor.
+# Com 0, toda requisição faz uma revalidação condicional (ETag/Last-Modified), que custa só um 304.
+TTL_CACHE_SEGUNDOS = float(os.environ.get("PGFN_CACHE_TTL", "0"))
+TIMEOUT_DOWNLOAD = (10, 60)
+TAMANHO_BLOCO_DOWNLOAD = 1024 * 1024
+TENTATIVAS_DOWNLOAD = 5
+
+_travas_locais: Dict[str, threading.Lock] = {}
+_trava_do_registro = threading.Lock()
+
+
+def caminho_no_cache(url: str) -> str:
+    """Retorna o caminho local onde o arquivo de `url` é guardado no cache."""
+    nome = os.path.basename(urlparse(url).path) or "arquivo"
+    prefixo = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(DIRETORIO_CACHE, "downloads", f"{prefixo}_{nome}")
+
+
+@contextmanager
+def trava_arquivo(caminho: str):
+    """
+    Garante que apenas um job por vez crie, baixe ou revalide o mesmo arquivo do cache.
+    Threads do mesmo processo esperam numa trava local; processos diferentes (vários workers
+    do uvicorn) esperam num lock de arquivo. Quem chega depois reaproveita o trabalho já feito.
+    """
+    with _trava_do_registro:
+        trava_local = _travas_locais.setdefault(caminho, threading.Lock())
+    with trava_local:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho + ".lock", "w") as arquivo_lock:
+            if fcntl:
+                fcntl.flock(arquivo_lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(arquivo_lock, fcntl.LOCK_UN)
+
+
+def ler_metadados(caminho: str) -> Optional[Dict]:
+    """Lê os metadados (ETag, Last-Modified, datas) gravados ao lado do arquivo em cache."""
+    try:
+        with open(caminho + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_metadados(caminho: str, metadados: Dict):
+    temporario = caminho + ".json.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(metadados, f)
+    os.replace(temporario, caminho + ".json")
+
+
+def _relatar_progresso(baixados: int, total: Optional[int], ultimo_percentual: List[int]):
+    """Imprime o progresso do download a cada 10% (ou a cada 50 MB quando o tamanho é desconhecido)."""
+    if total:
+        percentual = int(baixados * 100 / total) // 10 * 10
+        if percentual > ultimo_percentual[0]:
+            ultimo_percentual[0] = percentual
+            print(f"[DOWNLOAD] {percentual}% ({baixados / 1e6:.1f} MB de {total / 1e6:.1f} MB)")
+    elif baixados // (50 * 1024 * 1024) > ultimo_percentual[0]:
+        ultimo_percentual[0] = baixados // (50 * 1024 * 1024)
+        print(f"[DOWNLOAD] {baixados / 1e6:.1f} MB baixados")
+
+
+def _descartar_parcial(parcial: str):
+    for caminho in (parcial, parcial + ".json"):
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def baixar_arquivo(url: str, destino: str, headers: Optional[Dict] = None,
+                   progresso: Optional[Callable[[int, Optional[int]], None]] = None) -> Optional[requests.Response]:
+    """
+    Baixa `url` para `destino` gravando os blocos direto no disco, sem manter o arquivo em memória.
+    O download é feito em `destino + '.part'`; se a conexão cair, a próxima tentativa continua de onde
+    parou usando HTTP Range (com If-Range, para não emendar pedaços de versões diferentes do arquivo).
+    Retorna a resposta (já fechada) quando o arquivo foi baixado, ou None se o servidor respondeu 304.
+    """
+    parcial = destino + ".part"
+    for tentativa in range(1, TENTATIVAS_DOWNLOAD + 1):
+        headers_requisicao = dict(headers or {})
+        metadados_parcial = ler_metadados(parcial)
+        ja_baixados = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+        validador = metadados_parcial and (metadados_parcial.get("etag") or metadados_parcial.get("last_modified"))
+        if ja_baixados and validador:
+            headers_requisicao["Range"] = f"bytes={ja_baixados}-"
+            headers_requisicao["If-Range"] = validador
+
+        try:
+            with requests.get(url, headers=headers_requisicao, stream=True, timeout=TIMEOUT_DOWNLOAD) as response:
+                if response.status_code == 304:
+                    return None
+                response.raise_for_status()
+
+                if response.status_code == 206 and not response.headers.get("Content-Range", "").startswith(f"bytes {ja_baixados}-"):
+                    # O servidor mandou outro pedaço do arquivo: emendá-lo ao parcial corromperia o ZIP.
+                    # O parcial é descartado e a próxima tentativa pede o arquivo inteiro, sem Range.
+                    _descartar_parcial(parcial)
+                    if tentativa == TENTATIVAS_DOWNLOAD:
+                        raise IOError(f"Download de '{url}' recebeu um intervalo diferente do pedido: {response.headers.get('Content-Range')}.")
+                    print(f"[DOWNLOAD] Intervalo inesperado ({response.headers.get('Content-Range')}). Baixando o arquivo inteiro de novo...")
+                    continue
+                if response.status_code == 206:
+                    modo = "ab"
+                    total = int(response.headers["Content-Range"].rsplit("/", 1)[-1]) if not response.headers["Content-Range"].endswith("/*") else None
+                    print(f"[DOWNLOAD] Retomando download de '{url}' a partir de {ja_baixados / 1e6:.1f} MB.")
+                else:
+                    modo, ja_baixados = "wb", 0
+                    total = int(response.headers["Content-Length"]) if response.headers.get("Content-Length") else None
+                    _gravar_metadados(parcial, {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    })
+
+                ultimo_percentual = [-1]
+                with open(parcial, modo) as f:
+                    for bloco in response.iter_content(chunk_size=TAMANHO_BLOCO_DOWNLOAD):
+                        f.write(bloco)
+                        ja_baixados += len(bloco)
+                        _relatar_progresso(ja_baixados, total, ultimo_percentual)
+                        if progresso:
+                            progresso(ja_baixados, total)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if tentativa == TENTATIVAS_DOWNLOAD:
+                raise
+            print(f"[DOWNLOAD] Conexão interrompida ({e}). Tentativa {tentativa + 1} de {TENTATIVAS_DOWNLOAD}...")
+            continue
+
+        if total is not None and ja_baixados < total:
+            if tentativa == TENTATIVAS_DOWNLOAD:
+                raise IOError(f"Download de '{url}' incompleto: {ja_baixados} de {total} bytes.")
+            continue
+
+        os.replace(parcial, destino)
+        os.remove(parcial + ".json")
+        return response
+
+
+def obter_arquivo(url: str, ttl: Optional[float] = None,
+                  progresso: Optional[Callable[[int, Optional[int]], None]] = None) -> str:
+    """
+    Retorna o caminho local de uma cópia atualizada do arquivo em `url`.
+    O arquivo só é baixado de novo quando o servidor indica que ele mudou (ETag/Last-Modified)
+    ou, se um TTL for configurado, quando a última verificação ficou mais velha que o TTL.
+    `progresso(baixados, total)` é chamado a cada bloco gravado durante um download.
+    """
+    ttl = TTL_CACHE_SEGUNDOS if ttl is None else ttl
+    caminho = caminho_no_cache(url)
+
+    with trava_arquivo(caminho):
+        metadados = ler_metadados(caminho) if os.path.exists(caminho) else None
+        headers = {}
+        if metadados:
+            if ttl > 0 and time.time() - metadados.get("verificado_em", 0) < ttl:
+                print(f"[CACHE] Usando cópia local de '{url}' (dentro do TTL).")
+                return caminho
+            if metadados.get("etag"):
+                headers["If-None-Match"] = metadados["etag"]
+            if metadados.get("last_modified"):
+                headers["If-Modified-Since"] = metadados["last_modified"]
+
+        try:
+            if metadados:
+                print(f"[CACHE] Verificando se '{url}' mudou no servidor...")
+            else:
+                print(f"[CACHE] Baixando '{url}'...")
+            response = baixar_arquivo(url, caminho, headers=headers, progresso=progresso)
+        except (requests.RequestException, IOError) as e:
+            if metadados:
+                print(f"[CACHE] Falha ao revalidar '{url}' ({e}). Usando a cópia local.")
+                return caminho
+            raise
+
+        agora = time.time()
+        if response is None:
+            print(f"[CACHE] Arquivo '{url}' não mudou no servidor. Usando a cópia local.")
+            metadados["verificado_em"] = agora
+            _gravar_metadados(caminho, metadados)
+            return caminho
+
+        _gravar_metadados(caminho, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "tamanho": os.path.getsize(caminho),
+            "baixado_em": agora,
+            "verificado_em": agora,
+        })
+
+    return caminho
@@ -0,0 +1,155 @@
+"""
+Execução em lote da geração de leads, sem servidor e sem perguntas no terminal: tudo vem por argumentos.
+As tabelas passam de uma etapa da pipeline para a outra em memória; as planilhas gravadas são só os
+relatórios finais.
+
+Uso, a partir da pasta backend:
+    python -m app.cli --valor-minimo 100000 --paineis "painel do *.xlsx"
+    python -m app.cli --valor-minimo 100000 --somente-fase1
+    python -m app.cli --leads relatorio_prospeccao_previdenciario.xlsx --paineis "painel do *.xlsx"
+Com --drive-pasta, cada relatório entra na fila de upload para o Google Drive assim que é gravado, e o envio
+acontece em paralelo com as etapas seguintes.
+"""
+import os
+import sys
+import glob
+import argparse
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from . import pipeline
+from .cnpj import normalizar_cnpj
+from .drive import GOOGLE_AUTH_DISPONIVEL, FilaDeUploads
+from .exportacao import ABAS_PLANILHA
+from .processing import (COLUNAS_PARA_MANTER_FASE2, DATASET_PADRAO, DATASETS, MODO_PADRAO, MODOS, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO,
+                         TERMOS_EXCLUIR, UF_DESEJADA, normalizar_dataset, normalizar_modo, normalizar_ufs, url_anterior_do_dataset)
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+PADRAO_ARQUIVOS_PARCELAMENTO = "painel do *.xlsx"
+# Nomes dos relatórios gerados; {conjunto} é o conjunto de dados em minúsculas (previdenciario, fgts...).
+NOME_RELATORIO_POR_DIVIDA = "relatorio_prospeccao_{conjunto}_por_divida.xlsx"
+NOME_RELATORIO_LEADS = "relatorio_prospeccao_{conjunto}.xlsx"
+NOME_RELATORIO_FINAL = "relatorio_detalhado_{conjunto}.xlsx"
+ABA_DIVIDAS = "Dívidas"
+ABA_LEADS = "Leads"
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Gera os relatórios de leads da PGFN cruzados com os painéis de parcelamento.")
+    parser.add_argument("--valor-minimo", type=float, default=None,
+                        help="Valor mínimo da dívida, sem casas decimais (para R$100.000,00 use 100000).")
+    parser.add_argument("--paineis", nargs="+", default=[PADRAO_ARQUIVOS_PARCELAMENTO],
+                        help=f"Painéis de parcelamento (XLSX ou ZIP), por caminho ou padrão (padrão: '{PADRAO_ARQUIVOS_PARCELAMENTO}').")
+    parser.add_argument("--uf", default=UF_DESEJADA, help="Uma UF ou várias separadas por vírgula (RS,SC).")
+    parser.add_argument("--dataset", default=DATASET_PADRAO, help=f"Conjunto de dados: {', '.join(DATASETS)}.")
+    parser.add_argument("--modo", default=MODO_PADRAO, choices=MODOS, help="delta: só os leads que mudaram desde o trimestre anterior.")
+    parser.add_argument("--termos-excluir", default=None, help="Termos de exclusão separados por vírgula (substituem a lista padrão).")
+    parser.add_argument("--pasta-saida", default=".", help="Pasta onde os relatórios são gravados.")
+    parser.add_argument("--somente-fase1", action="store_true", help="Só gera os relatórios de leads, sem o cruzamento.")
+    parser.add_argument("--leads", default=None, help="Planilha de leads já gerada; pula a Fase 1 e só faz o cruzamento.")
+    parser.add_argument("--drive-pasta", default=None, help="ID da pasta (ou Drive compartilhado) para onde os relatórios são enviados.")
+    parser.add_argument("--drive-credenciais", default=None, help="Arquivo JSON da conta de serviço usada no upload para o Drive.")
+    return parser
+
+
+def ler_argumentos(argv: Optional[List[str]] = None, **padroes) -> argparse.Namespace:
+    """
+    Lê e valida os argumentos da linha de comando. `padroes` troca os valores padrão, para que os scripts
+    de 0.OUTROS mantenham o comportamento de antes (valor fixo, só a Fase 1 ou só o cruzamento).
+    """
+    parser = criar_parser()
+    parser.set_defaults(**padroes)
+    argumentos = parser.parse_args(argv)
+    if argumentos.leads is None and argumentos.valor_minimo is None:
+        parser.error("informe --valor-minimo (ou --leads com uma planilha de leads já gerada).")
+    if argumentos.valor_minimo is not None and argumentos.valor_minimo <= 0:
+        parser.error("--valor-minimo deve ser um número positivo maior que zero.")
+    if argumentos.leads and argumentos.somente_fase1:
+        parser.error("--leads e --somente-fase1 não podem ser usados juntos.")
+    # Sem isso a falta do pacote só apareceria no primeiro upload, depois de a Fase 1 inteira ter rodado
+    if argumentos.drive_pasta and argumentos.drive_credenciais and not GOOGLE_AUTH_DISPONIVEL:
+        parser.error("--drive-credenciais exige o pacote google-auth (pip install google-auth).")
+    return argumentos
+
+
+def encontrar_paineis(padroes: List[str]) -> List[str]:
+    """Expande os padrões (como 'painel do *.xlsx') nos arquivos encontrados, sem repetição e em ordem."""
+    paineis: List[str] = []
+    for padrao in padroes:
+        for caminho in sorted(glob.glob(padrao)) or ([padrao] if os.path.isfile(padrao) else []):
+            if caminho not in paineis:
+                paineis.append(caminho)
+    if not paineis:
+        raise FileNotFoundError(f"Nenhum arquivo de parcelamento encontrado em: {', '.join(padroes)}.")
+    return paineis
+
+
+def ler_leads(caminho: str) -> pd.DataFrame:
+    """Lê uma planilha de leads gerada antes (pela Fase 1), com o CNPJ convertido na chave usada no cruzamento."""
+    df_leads = pd.read_excel(caminho)
+    return df_leads.assign(CPF_CNPJ=normalizar_cnpj(df_leads['CPF_CNPJ']))
+
+
+def executar(argumentos: argparse.Namespace, ao_gerar: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    Executa as etapas pedidas e devolve os caminhos dos relatórios gravados, na ordem em que foram gerados.
+    `ao_gerar(caminho)` é chamado logo que cada relatório fica pronto, antes das etapas seguintes.
+    """
+    ufs, dataset = normalizar_ufs(argumentos.uf), normalizar_dataset(argumentos.dataset)
+    modo = normalizar_modo(argumentos.modo, dataset)
+    termos = TERMOS_EXCLUIR if argumentos.termos_excluir is None else [t.strip() for t in argumentos.termos_excluir.split(",") if t.strip()]
+    nomes = {"conjunto": dataset.lower()}
+    os.makedirs(argumentos.pasta_saida, exist_ok=True)
+    gerados: List[str] = []
+
+    def exportar(abas: Dict[str, pd.DataFrame], nome: str):
+        gerados.append(pipeline.exportar(abas, os.path.join(argumentos.pasta_saida, nome.format(**nomes))))
+        if ao_gerar:
+            ao_gerar(gerados[-1])
+
+    if argumentos.leads:
+        print(f"[FASE 2] Lendo o arquivo de leads: {argumentos.leads}")
+        df_leads = ler_leads(argumentos.leads)
+    else:
+        print(f"[FASE 1] Gerando leads de {dataset} ({', '.join(ufs)}) acima de R$ {argumentos.valor_minimo:,.2f}...")
+        prefixo = DATASETS[dataset]["prefixo_csv"]
+        indice = pipeline.filtrar(pipeline.buscar(DATASETS[dataset]["url"], prefixo), ufs, termos)
+        df_leads = pipeline.agregar(indice, argumentos.valor_minimo)
+        if modo == "delta":
+            indice_anterior = pipeline.filtrar(pipeline.buscar(url_anterior_do_dataset(dataset), prefixo), ufs, termos)
+            df_leads = pipeline.comparar(df_leads, pipeline.agregar(indice_anterior, argumentos.valor_minimo))
+        exportar({ABA_DIVIDAS: pipeline.detalhar(indice, argumentos.valor_minimo)}, NOME_RELATORIO_POR_DIVIDA)
+        exportar({ABA_LEADS: df_leads}, NOME_RELATORIO_LEADS)
+        print(f"[FASE 1] Concluída. {len(df_leads)} leads gerados.")
+    if argumentos.somente_fase1:
+        return gerados
+
+    paineis = encontrar_paineis(argumentos.paineis)
+    print(f"[FASE 2] Cruzando {len(df_leads)} leads com {len(paineis)} arquivos de parcelamento...")
+    df_parcelamentos = pipeline.ler_parcelamentos(paineis, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2)
+    resultado: Dict[str, pd.DataFrame] = pipeline.cruzar(df_leads, df_parcelamentos)
+    print(f"[FASE 2] {resultado['com_parcelamento']['CPF_CNPJ'].nunique()} CNPJs COM parcelamento "
+          f"({len(resultado['com_parcelamento'])} linhas de negociação) e {len(resultado['sem_parcelamento'])} SEM parcelamento.")
+    exportar({titulo: resultado[particao] for particao, titulo in ABAS_PLANILHA.items()}, NOME_RELATORIO_FINAL)
+    return gerados
+
+
+def main(argv: Optional[List[str]] = None, **padroes) -> int:
+    argumentos = ler_argumentos(argv, **padroes)
+    fila = FilaDeUploads(argumentos.drive_pasta, argumentos.drive_credenciais) if argumentos.drive_pasta else nullcontext()
+    # Os relatórios já gerados continuam sendo enviados mesmo se uma etapa seguinte falhar
+    with fila:
+        try:
+            gerados = executar(argumentos, ao_gerar=fila.enviar if argumentos.drive_pasta else None)
+        except Exception as e:
+            print(f"ERRO CRÍTICO: o processo foi interrompido. Detalhe: {e}")
+            return 1
+    for caminho in gerados:
+        print(f"-> Relatório salvo em '{caminho}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Chave usada quando o valor não pôde ser convertido num CNPJ válido.
+CNPJ_INVALIDO = -1
+# Um CNPJ sem os zeros à esquerda com até essa quantidade de dígitos só é aceito se os dígitos verificadores
+# conferirem; com 11 dígitos (o tamanho de um CPF) nunca é aceito.
+MAXIMO_DIGITOS_CNPJ_AMBIGUO = 10
+PESOS_DV1_CNPJ = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_DV2_CNPJ = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+def digitos_verificadores_validos(chaves: np.ndarray) -> np.ndarray:
+    """True para as chaves de 14 dígitos cujos dois últimos dígitos conferem com o cálculo do CNPJ (módulo 11)."""
+    chaves = np.asarray(chaves, dtype='int64')
+    digitos = np.stack([(chaves // 10 ** (13 - i)) % 10 for i in range(14)], axis=1) if len(chaves) else np.zeros((0, 14), dtype='int64')
+    resto = (digitos[:, :12] * PESOS_DV1_CNPJ).sum(axis=1) % 11
+    dv1 = np.where(resto < 2, 0, 11 - resto)
+    resto = (digitos[:, :13] * PESOS_DV2_CNPJ).sum(axis=1) % 11
+    dv2 = np.where(resto < 2, 0, 11 - resto)
+    return (digitos[:, 12] == dv1) & (digitos[:, 13] == dv2)
+
+
+def _aceitar_sem_zeros(chaves: np.ndarray, quantidade: np.ndarray) -> np.ndarray:
+    """
+    Regra para números que podem ter perdido os zeros à esquerda: 12 a 14 dígitos só podem ser CNPJ;
+    11 dígitos são tratados como CPF; com menos, o CNPJ completado com zeros precisa ter dígitos verificadores válidos.
+    """
+    return (quantidade >= 12) | ((quantidade <= MAXIMO_DIGITOS_CNPJ_AMBIGUO) & digitos_verificadores_validos(chaves))
+
+
+def normalizar_cnpj(valores: pd.Series, somente_cnpj_completo: bool = False) -> pd.Series:
+    """
+    Converte CNPJs em chaves int64 de 14 dígitos, qualquer que seja o formato de origem:
+    formatado ('12.345.678/0001-90'), só dígitos ('12345678000190') ou numérico com os zeros
+    à esquerda perdidos pelo Excel (12345678000190.0). Valores inválidos viram CNPJ_INVALIDO.
+    Textos com máscara precisam ter os 14 dígitos (CPFs como '123.456.789-01' são descartados); números e
+    textos só com dígitos são completados com zeros segundo `_aceitar_sem_zeros`.
+    Com `somente_cnpj_completo`, textos que não têm exatamente 14 dígitos também são descartados,
+    o que só faz sentido para fontes que sempre trazem o CNPJ completo, como a PGFN.
+    """
+    if pd.api.types.is_numeric_dtype(valores) and not pd.api.types.is_bool_dtype(valores):
+        numeros = pd.to_numeric(valores, errors='coerce')
+        validos = (numeros.notna() & (numeros > 0) & (numeros < 10 ** 14)).to_numpy(dtype=bool)
+        chaves = np.where(validos, numeros.fillna(0).round(), CNPJ_INVALIDO).astype('int64')
+        # Quantidade de dígitos de cada número: quantas potências de 10 são menores ou iguais a ele
+        quantidade = np.searchsorted(10 ** np.arange(15, dtype='int64'), chaves, side='right')
+        validos = validos & _aceitar_sem_zeros(chaves, quantidade)
+        return pd.Series(np.where(validos, chaves, CNPJ_INVALIDO), index=valores.index)
+
+    textos = valores.astype('string')
+    # Números lidos como texto a partir de células decimais do Excel ('12345678000190.0')
+    textos = textos.str.replace(r'\.0+$', '', regex=True)
+    digitos = textos.str.replace(r'\D', '', regex=True)
+    quantidade = digitos.str.len().fillna(0).to_numpy(dtype='int64')
+    validos = (quantidade >= 1) & (quantidade <= 14)
+    chaves = np.full(len(valores), CNPJ_INVALIDO, dtype='int64')
+    chaves[validos] = digitos[validos].astype('int64').to_numpy()
+    if somente_cnpj_completo:
+        validos &= quantidade == 14
+    else:
+        so_digitos = textos.str.fullmatch(r'\s*\d+\s*').fillna(False).to_numpy(dtype=bool)
+        validos &= (quantidade == 14) | (so_digitos & _aceitar_sem_zeros(chaves, quantidade))
+    return pd.Series(np.where(validos, chaves, CNPJ_INVALIDO), index=valores.index)
+
+
+def raiz_cnpj(chaves: pd.Series) -> pd.Series:
+    """Os 8 primeiros dígitos do CNPJ, que identificam a empresa."""
+    return chaves // 1_000_000
+
+
+def ordem_estabelecimento(chaves: pd.Series) -> pd.Series:
+    """Os 4 dígitos após a barra: 0001 para a matriz, demais números para as filiais."""
+    return (chaves // 100) % 10_000
+
+
+def e_matriz(chaves: pd.Series) -> pd.Series:
+    """True para chaves válidas cujo estabelecimento é a matriz ('/0001-')."""
+    return (chaves != CNPJ_INVALIDO) & (ordem_estabelecimento(chaves) == 1)
+
+
+def formatar_cnpj(chaves: pd.Series) -> pd.Series:
+    """Converte as chaves int64 de volta para o formato 'XX.XXX.XXX/XXXX-XX'."""
+    digitos = chaves.astype('int64').astype(str).str.zfill(14)
+    formatado = (digitos.str[:2] + '.' + digitos.str[2:5] + '.' + digitos.str[5:8] + '/'
+                 + digitos.str[8:12] + '-' + digitos.str[12:])
+    return formatado.where(chaves != CNPJ_INVALIDO)
@@ -0,0 +1,182 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .exclusao import normalizar_nome
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# eq/ne/gt/ge/lt/le comparam números (ou textos, sem diferenciar maiúsculas e acentos, em eq/ne);
+# contem procura um trecho no texto e em aceita vários valores separados por '|'.
+OPERADORES = ("eq", "ne", "gt", "ge", "lt", "le", "contem", "em")
+# Quantidade de partições (já indexadas para consulta) mantidas em memória por processo.
+MAXIMO_TABELAS_CONSULTA = 8
+
+_tabelas: "OrderedDict[Tuple[str, str], TabelaConsultavel]" = OrderedDict()
+_trava_tabelas = threading.Lock()
+
+
+class Filtro(NamedTuple):
+    coluna: str
+    operador: str
+    valor: str
+
+
+def interpretar_filtro(texto: str) -> Filtro:
+    """Converte 'coluna:operador:valor' (como 'Qtde de Parcelas em Atraso:gt:3') num Filtro."""
+    partes = texto.split(":", 2)
+    if len(partes) != 3 or partes[1] not in OPERADORES:
+        raise ValueError(f"Filtro inválido: '{texto}'. Use coluna:operador:valor, com operador entre {', '.join(OPERADORES)}.")
+    return Filtro(partes[0].strip(), partes[1], partes[2].strip())
+
+
+def _numero(filtro: Filtro) -> float:
+    try:
+        return float(filtro.valor.replace(",", "."))
+    except ValueError:
+        raise ValueError(f"O filtro '{filtro.operador}' da coluna '{filtro.coluna}' precisa de um número, não '{filtro.valor}'.")
+
+
+class TabelaConsultavel:
+    """
+    Uma partição do resultado preparada para consultas repetidas: colunas numéricas como arrays NumPy e colunas
+    de texto codificadas uma única vez (pd.factorize), de modo que filtros de igualdade e agrupamentos comparam
+    inteiros e só as poucas categorias distintas são comparadas como texto.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self._numeros: Dict[str, np.ndarray] = {}
+        self._codigos: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._trava = threading.Lock()
+
+    def conferir_colunas(self, colunas: List[str]):
+        desconhecidas = [c for c in colunas if c not in self.df.columns]
+        if desconhecidas:
+            raise ValueError(f"Colunas inexistentes no resultado: {', '.join(desconhecidas)}")
+
+    def _e_numerica(self, coluna: str) -> bool:
+        serie = self.df[coluna]
+        return pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie)
+
+    def numeros(self, coluna: str) -> np.ndarray:
+        with self._trava:
+            if coluna not in self._numeros:
+                if not self._e_numerica(coluna):
+                    raise ValueError(f"A coluna '{coluna}' não é numérica.")
+                self._numeros[coluna] = pd.to_numeric(self.df[coluna]).to_numpy(dtype="float64", na_value=np.nan)
+            return self._numeros[coluna]
+
+    def codigos(self, coluna: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(código de cada linha, categorias); nulos ficam com o código -1."""
+        with self._trava:
+            if coluna not in self._codigos:
+                self._codigos[coluna] = pd.factorize(self.df[coluna], sort=True)
+            codigos, categorias = self._codigos[coluna]
+            return codigos, np.asarray(categorias, dtype=object)
+
+    def _mascara(self, filtro: Filtro) -> np.ndarray:
+        if filtro.operador in ("gt", "ge", "lt", "le") or (filtro.operador in ("eq", "ne") and self._e_numerica(filtro.coluna)):
+            valores, limite = self.numeros(filtro.coluna), _numero(filtro)
+            comparar = {"gt": np.greater, "ge": np.greater_equal, "lt": np.less, "le": np.less_equal, "eq": np.equal, "ne": np.not_equal}
+            return comparar[filtro.operador](valores, limite)
+
+        # Textos: a condição é avaliada uma vez por categoria e levada às linhas pelos códigos
+        codigos, categorias = self.codigos(filtro.coluna)
+        normalizadas = [normalizar_nome(str(c)).strip() for c in categorias]
+        if filtro.operador == "contem":
+            trecho = normalizar_nome(filtro.valor)
+            aceitas = [trecho in c for c in normalizadas]
+        else:
+            procurados = {normalizar_nome(v).strip() for v in (filtro.valor.split("|") if filtro.operador == "em" else [filtro.valor])}
+            aceitas = [c in procurados for c in normalizadas]
+        mascara = np.asarray(aceitas, dtype=bool)[codigos] & (codigos >= 0)
+        return ~mascara if filtro.operador == "ne" else mascara
+
+    def filtrar(self, filtros: List[Filtro]) -> np.ndarray:
+        """Posições das linhas que atendem a todos os filtros, na ordem original."""
+        self.conferir_colunas([f.coluna for f in filtros])
+        mascara = np.ones(len(self.df), dtype=bool)
+        for filtro in filtros:
+            mascara &= self._mascara(filtro)
+        return np.flatnonzero(mascara)
+
+    def top(self, linhas: np.ndarray, coluna: str, k: int, decrescente: bool = True) -> np.ndarray:
+        """
+        As k linhas com os maiores (ou menores) valores da coluna, em ordem. O np.argpartition separa as k
+        primeiras em O(n) e só elas são ordenadas; empates mantêm a ordem original e nulos nunca entram antes.
+        """
+        self.conferir_colunas([coluna])
+        valores = self.numeros(coluna)[linhas]
+        chaves = np.where(np.isnan(valores), np.inf, -valores if decrescente else valores)
+        if k < len(linhas):
+            # O argpartition acha o k-ésimo valor; entre os empatados com ele entram os primeiros na ordem original
+            limite = chaves[np.argpartition(chaves, k - 1)[k - 1]]
+            menores = np.flatnonzero(chaves < limite)
+            escolhidas = np.concatenate([menores, np.flatnonzero(chaves == limite)[:k - len(menores)]])
+        else:
+            escolhidas = np.arange(len(linhas))
+        escolhidas = escolhidas[np.lexsort((escolhidas, chaves[escolhidas]))]
+        return linhas[escolhidas]
+
+    def agrupar(self, linhas: np.ndarray, coluna: str, somar: List[str]) -> pd.DataFrame:
+        """Resumo por valor da coluna: quantidade de linhas, de CNPJs distintos (sem contar os nulos) e a soma das colunas em `somar`."""
+        self.conferir_colunas([coluna] + somar)
+        codigos, categorias = self.codigos(coluna)
+        codigos = codigos[linhas]
+        # Nulos formam um grupo próprio, no fim
+        grupos = np.where(codigos < 0, len(categorias), codigos)
+        quantidade = np.bincount(grupos, minlength=len(categorias) + 1)
+        resumo = {coluna: list(categorias) + [None], "linhas": quantidade}
+        if "CPF_CNPJ" in self.df.columns:
+            codigos_cnpj, _ = self.codigos("CPF_CNPJ")
+            codigos_cnpj = codigos_cnpj[linhas]
+            # Linhas sem CNPJ (código -1) entram em "linhas", mas não são um CNPJ distinto
+            com_cnpj = codigos_cnpj >= 0
+            pares = np.unique(grupos[com_cnpj].astype(np.int64) * len(self.df) + codigos_cnpj[com_cnpj])
+            resumo["cnpjs"] = np.bincount(pares // len(self.df), minlength=len(categorias) + 1)
+        for coluna_soma in somar:
+            valores = self.numeros(coluna_soma)[linhas]
+            resumo[f"soma_{coluna_soma}"] = np.bincount(grupos, weights=np.nan_to_num(valores), minlength=len(categorias) + 1).round(2)
+        df = pd.DataFrame(resumo)
+        return df[df["linhas"] > 0].sort_values("linhas", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def obter_tabela_consultavel(job_id: str, particao: str, df: pd.DataFrame) -> TabelaConsultavel:
+    """A partição preparada para consulta, montada só na primeira consulta deste processo ao job."""
+    chave = (job_id, particao)
+    with _trava_tabelas:
+        tabela = _tabelas.get(chave)
+        if tabela is not None:
+            _tabelas.move_to_end(chave)
+            return tabela
+    tabela = TabelaConsultavel(df)
+    with _trava_tabelas:
+        tabela = _tabelas.setdefault(chave, tabela)
+        while len(_tabelas) > MAXIMO_TABELAS_CONSULTA:
+            _tabelas.popitem(last=False)
+    return tabela
+
+
+def consultar(tabela: TabelaConsultavel, filtros: Optional[List[Filtro]] = None, top: Optional[int] = None,
+              ordenar: str = "VALOR_TOTAL_DIVIDA", decrescente: bool = True, agrupar: Optional[str] = None,
+              somar: Optional[List[str]] = None, colunas: Optional[List[str]] = None, offset: int = 0,
+              limite: int = 100) -> Tuple[pd.DataFrame, int]:
+    """
+    Aplica os filtros e devolve (tabela da resposta, total de linhas filtradas). Com `agrupar`, a resposta é o
+    resumo por grupo; com `top`, as `top` linhas com os maiores valores de `ordenar` (ou menores, sem
+    `decrescente`); sem eles, a página [offset, offset + limite) das linhas filtradas na ordem original.
+    """
+    linhas = tabela.filtrar(filtros or [])
+    if agrupar:
+        return tabela.agrupar(linhas, agrupar, somar or []), len(linhas)
+    if top:
+        selecionadas = tabela.top(linhas, ordenar, top, decrescente)
+    else:
+        selecionadas = linhas[offset:offset + limite]
+    if colunas:
+        tabela.conferir_colunas(colunas)
+    df = tabela.df.iloc[selecionadas]
+    return (df[colunas] if colunas else df).reset_index(drop=True), len(linhas)
@@ -0,0 +1,59 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Colunas do agregado por CNPJ cujo conteúdo decide se um lead mudou de um trimestre para o outro.
+COLUNAS_COMPARADAS = ['NOME_DEVEDOR', 'UF_DEVEDOR', 'VALOR_TOTAL_DIVIDA']
+# NOVO: não era lead no trimestre anterior. SAIU: deixou de ser lead. AUMENTOU/REDUZIU: a dívida total mudou.
+# ALTERADO: mesma dívida, mas nome ou UF diferentes no cadastro.
+SITUACOES_DELTA = ('NOVO', 'AUMENTOU', 'REDUZIU', 'ALTERADO', 'SAIU')
+# Trimestre na URL dos dados abertos, como em .../2025_trimestre_02/Dados_abertos_Previdenciario.zip
+PADRAO_TRIMESTRE_URL = re.compile(r"(\d{4})_trimestre_(\d{2})")
+
+
+def url_trimestre_anterior(url: str) -> str:
+    """Troca o trimestre da URL dos dados abertos pelo anterior (2025_trimestre_01 -> 2024_trimestre_04)."""
+    encontrado = PADRAO_TRIMESTRE_URL.search(url)
+    if not encontrado:
+        raise ValueError(f"Não foi possível identificar o trimestre na URL '{url}' para buscar o trimestre anterior.")
+    ano, trimestre = int(encontrado.group(1)), int(encontrado.group(2))
+    ano, trimestre = (ano - 1, 4) if trimestre == 1 else (ano, trimestre - 1)
+    return url[:encontrado.start()] + f"{ano}_trimestre_{trimestre:02d}" + url[encontrado.end():]
+
+
+def hash_das_linhas(df: pd.DataFrame) -> np.ndarray:
+    """Um hash de 64 bits por linha, sobre as colunas comparadas, para comparar os trimestres sem comparar coluna a coluna."""
+    return pd.util.hash_pandas_object(df[COLUNAS_COMPARADAS], index=False).to_numpy()
+
+
+def comparar_trimestres(df_atual: pd.DataFrame, df_anterior: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compara o agregado por CNPJ do trimestre atual com o do anterior pela chave CPF_CNPJ e devolve só os
+    leads que mudaram, com SITUACAO_DELTA e VALOR_TOTAL_DIVIDA_ANTERIOR. Os leads que saíram aparecem com os
+    dados do trimestre anterior e VALOR_TOTAL_DIVIDA vazio. O custo acompanha o tamanho das bases, mas o
+    resultado (e tudo o que vem depois dele) acompanha só a quantidade de mudanças.
+    """
+    # UInt64 (com nulos) para que o merge externo não converta os hashes em float64, que não representa 64 bits
+    atual = df_atual.assign(_HASH=pd.array(hash_das_linhas(df_atual), dtype='UInt64'))
+    anterior = df_anterior[['CPF_CNPJ', 'NOME_DEVEDOR', 'UF_DEVEDOR', 'VALOR_TOTAL_DIVIDA']].rename(
+        columns={'NOME_DEVEDOR': '_NOME_ANTERIOR', 'UF_DEVEDOR': '_UF_ANTERIOR', 'VALOR_TOTAL_DIVIDA': 'VALOR_TOTAL_DIVIDA_ANTERIOR'})
+    anterior = anterior.assign(_HASH_ANTERIOR=pd.array(hash_das_linhas(df_anterior), dtype='UInt64'))
+
+    df = atual.merge(anterior, on='CPF_CNPJ', how='outer', indicator=True, sort=False)
+    iguais = (df['_merge'] == 'both') & (df['_HASH'] == df['_HASH_ANTERIOR']).fillna(False)
+    df = df[~iguais.to_numpy(dtype=bool)]
+
+    so_anterior = (df['_merge'] == 'right_only').to_numpy()
+    valor, valor_anterior = df['VALOR_TOTAL_DIVIDA'].to_numpy(), df['VALOR_TOTAL_DIVIDA_ANTERIOR'].to_numpy()
+    situacao = np.select(
+        [(df['_merge'] == 'left_only').to_numpy(), so_anterior, valor > valor_anterior, valor < valor_anterior],
+        ['NOVO', 'SAIU', 'AUMENTOU', 'REDUZIU'], default='ALTERADO')
+    df = df.assign(
+        NOME_DEVEDOR=df['NOME_DEVEDOR'].where(~so_anterior, df['_NOME_ANTERIOR']),
+        UF_DEVEDOR=df['UF_DEVEDOR'].where(~so_anterior, df['_UF_ANTERIOR']),
+        SITUACAO_DELTA=situacao,
+    )
+    colunas = list(df_atual.columns) + ['VALOR_TOTAL_DIVIDA_ANTERIOR', 'SITUACAO_DELTA']
+    return df[colunas].reset_index(drop=True)
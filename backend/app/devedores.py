@@ -0,0 +1,139 @@
+import os
+import shutil
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from .cnpj import e_matriz, normalizar_cnpj
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Colunas dos CSVs da PGFN usadas para filtrar e agregar; fora estas e as de detalhe, nenhuma chega a ser convertida.
+COLUNAS_USADAS_FASE1 = ['CPF_CNPJ', 'NOME_DEVEDOR', 'UF_DEVEDOR', 'VALOR_CONSOLIDADO']
+# Colunas que só aparecem no relatório por dívida (as que o script original não removia); ficam nulas se o CSV não as tiver.
+COLUNAS_DETALHE_FASE1 = ['TIPO_SITUACAO_INSCRICAO', 'SITUACAO_INSCRICAO', 'RECEITA_PRINCIPAL']
+TIPOS_COLUNAS_FASE1 = {'CPF_CNPJ': str, 'NOME_DEVEDOR': str, 'UF_DEVEDOR': str, 'VALOR_CONSOLIDADO': 'float64',
+                       **{coluna: str for coluna in COLUNAS_DETALHE_FASE1}}
+# Quantidade de linhas lidas de cada vez; limita o pico de memória durante a leitura de cada CSV.
+TAMANHO_CHUNK_CSV = 250_000
+# Número de processos usados para ler os CSVs em paralelo (um CSV por processo).
+WORKERS_FASE1 = int(os.environ.get("PGFN_WORKERS_FASE1", os.cpu_count() or 1))
+# Esquema fixo das partições por UF, para que partições de UFs diferentes possam ser concatenadas.
+# As colunas seguem a ordem dos CSVs da PGFN, que é a ordem do relatório por dívida.
+ESQUEMA_PARTICAO = pa.schema([('CPF_CNPJ', pa.int64()), ('NOME_DEVEDOR', pa.string()), ('UF_DEVEDOR', pa.string())]
+                             + [(coluna, pa.string()) for coluna in COLUNAS_DETALHE_FASE1] + [('VALOR_CONSOLIDADO', pa.float64())])
+
+
+def _executar_por_membro(caminho_zip: str, nomes_arquivos: List[str], tarefa: Callable, argumentos: Callable[[int], tuple],
+                         workers: Optional[int], progresso: Optional[Callable[..., None]] = None,
+                         contar: Callable = len) -> List:
+    """
+    Distribui os CSVs do ZIP entre processos (um CSV por tarefa) e devolve os resultados de
+    `tarefa(caminho_zip, nome_arquivo, *argumentos(indice_do_csv))` na mesma ordem de `nomes_arquivos`.
+    `progresso("lendo_membro", membro=N, total_membros=M, ...)` é chamado a cada CSV concluído,
+    com `contar(resultado)` como quantidade de registros.
+    """
+    with zipfile.ZipFile(caminho_zip) as z:
+        # Pega apenas os nomes de arquivo que existem no ZIP
+        nomes_validos = [nome for nome in nomes_arquivos if nome in z.namelist()]
+    if not nomes_validos:
+        raise ValueError("Nenhum dos arquivos CSV especificados foi encontrado no ZIP da PGFN.")
+
+    workers = min(workers or WORKERS_FASE1, len(nomes_validos))
+    def relatar(partes: List, nome_arquivo: str):
+        registros = contar(partes[-1])
+        print(f"[FASE 1] '{nome_arquivo}' processado. {registros} registros após os filtros.")
+        if progresso:
+            progresso("lendo_membro", membro=len(partes), total_membros=len(nomes_validos), arquivo=nome_arquivo, registros=registros)
+
+    if workers <= 1:
+        partes = []
+        for indice, nome_arquivo in enumerate(nomes_validos):
+            partes.append(tarefa(caminho_zip, nome_arquivo, *argumentos(indice)))
+            relatar(partes, nome_arquivo)
+        return partes
+
+    print(f"[FASE 1] Processando {len(nomes_validos)} arquivos em {workers} processos...")
+    # spawn, e não fork: quem chama pode ter outras threads rodando (a fila de uploads da CLI, por exemplo)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futuros = [executor.submit(tarefa, caminho_zip, nome_arquivo, *argumentos(indice))
+                   for indice, nome_arquivo in enumerate(nomes_validos)]
+        partes = []
+        for nome_arquivo, futuro in zip(nomes_validos, futuros):
+            partes.append(futuro.result())
+            relatar(partes, nome_arquivo)
+    return partes
+
+
+def _particionar_membro(caminho_zip: str, nome_arquivo: str, diretorio: str) -> Dict[str, int]:
+    """
+    Executado em um processo do pool: lê um CSV em blocos, mantém só os CNPJs matriz e grava as linhas
+    de cada UF em `diretorio/<UF>.arrow`, na ordem em que aparecem. Retorna as linhas gravadas por UF.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    escritores: Dict[str, pa.ipc.RecordBatchFileWriter] = {}
+    arquivos = []
+    linhas: Dict[str, int] = {}
+    try:
+        with zipfile.ZipFile(caminho_zip) as z, z.open(nome_arquivo) as f:
+            leitor = pd.read_csv(f, sep=';', encoding='latin-1', usecols=lambda coluna: coluna in TIPOS_COLUNAS_FASE1,
+                                 dtype=TIPOS_COLUNAS_FASE1, on_bad_lines='warn', chunksize=TAMANHO_CHUNK_CSV)
+            for bloco in leitor:
+                faltando = [coluna for coluna in COLUNAS_USADAS_FASE1 if coluna not in bloco]
+                if faltando:
+                    raise ValueError(f"Colunas não encontradas em '{nome_arquivo}': {faltando}")
+                bloco = bloco.assign(**{coluna: None for coluna in COLUNAS_DETALHE_FASE1 if coluna not in bloco})
+                chaves = normalizar_cnpj(bloco['CPF_CNPJ'], somente_cnpj_completo=True)
+                bloco = bloco.assign(CPF_CNPJ=chaves)[e_matriz(chaves)]
+                for uf, linhas_uf in bloco.groupby('UF_DEVEDOR', sort=False):
+                    if uf not in escritores:
+                        arquivos.append(pa.OSFile(os.path.join(diretorio, f"{uf}.arrow"), "wb"))
+                        escritores[uf] = pa.ipc.new_file(arquivos[-1], ESQUEMA_PARTICAO)
+                    escritores[uf].write_table(pa.Table.from_pandas(linhas_uf[ESQUEMA_PARTICAO.names], schema=ESQUEMA_PARTICAO, preserve_index=False))
+                    linhas[uf] = linhas.get(uf, 0) + len(linhas_uf)
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+        for arquivo in arquivos:
+            arquivo.close()
+    return linhas
+
+
+def particionar_por_uf(caminho_zip: str, nomes_arquivos: List[str], diretorio: str, workers: Optional[int] = None,
+                       progresso: Optional[Callable[..., None]] = None) -> Dict[str, int]:
+    """
+    Lê os CSVs do ZIP uma única vez (em paralelo, um por processo) e grava os débitos de CNPJs matriz
+    de todas as UFs em `diretorio/<UF>.arrow`, uma partição por UF. Cada partição mantém a ordem
+    original das linhas (CSV a CSV), a mesma de uma leitura filtrada só por essa UF.
+    Retorna a quantidade de débitos gravados em cada UF.
+
+    Substitui a leitura filtrada por requisição (blocos filtrados durante o parse e agregados por CSV
+    no pool): UF, termos de exclusão e valor mínimo mudam a cada requisição, e aplicá-los na leitura
+    obrigaria a reler o ZIP nacional a cada uma. Continuam durante o parse, bloco a bloco, só os filtros
+    que não dependem da requisição (colunas usadas e CNPJ matriz) e a separação por UF; termos e valor
+    mínimo ficam com o IndiceLimiar, que agrega só os débitos acima do limiar.
+    """
+    temporario = os.path.join(diretorio, "membros")
+    partes = _executar_por_membro(caminho_zip, nomes_arquivos, _particionar_membro,
+                                  lambda indice: (os.path.join(temporario, f"{indice:03d}"),), workers, progresso,
+                                  contar=lambda linhas: sum(linhas.values()))
+    totais: Dict[str, int] = {}
+    for linhas in partes:
+        for uf, quantidade in linhas.items():
+            totais[uf] = totais.get(uf, 0) + quantidade
+
+    # Junta as partes de cada UF na ordem dos CSVs, lote a lote, sem carregar uma UF inteira de uma vez
+    for uf in sorted(totais):
+        with pa.OSFile(os.path.join(diretorio, f"{uf}.arrow"), "wb") as arquivo, pa.ipc.new_file(arquivo, ESQUEMA_PARTICAO) as escritor:
+            for indice, linhas in enumerate(partes):
+                if uf not in linhas:
+                    continue
+                with pa.memory_map(os.path.join(temporario, f"{indice:03d}", f"{uf}.arrow"), "r") as origem:
+                    leitor = pa.ipc.open_file(origem)
+                    for lote in range(leitor.num_record_batches):
+                        escritor.write_batch(leitor.get_batch(lote))
+    shutil.rmtree(temporario, ignore_errors=True)
+    return totais
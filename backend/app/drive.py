@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .exportacao import FORMATOS_EXPORTACAO
+
+try:
+    from google.auth.transport.requests import AuthorizedSession
+    from google.oauth2.service_account import Credentials
+    GOOGLE_AUTH_DISPONIVEL = True
+except ImportError:
+    GOOGLE_AUTH_DISPONIVEL = False
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Endereço da API do Drive; pode apontar para um Drive falso local (benchmarks/drive_falso.py) nos testes.
+ENDPOINT_DRIVE = os.environ.get("PGFN_DRIVE_ENDPOINT", "https://www.googleapis.com")
+ESCOPOS_DRIVE = ['https://www.googleapis.com/auth/drive']
+# Bytes enviados por requisição no upload retomável; o Drive exige múltiplos de 256 KB.
+TAMANHO_BLOCO_UPLOAD_DRIVE = 32 * 256 * 1024
+TENTATIVAS_UPLOAD_DRIVE = 6
+# Espera antes da tentativa n: aleatória entre 0 e min(ESPERA_MAXIMA, ESPERA_INICIAL * 2^(n-1)) segundos.
+ESPERA_INICIAL_DRIVE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_DRIVE_SEGUNDOS = 32.0
+TIMEOUT_DRIVE = (10, 120)
+# Uploads feitos ao mesmo tempo pela fila.
+UPLOADS_SIMULTANEOS_DRIVE = int(os.environ.get("PGFN_DRIVE_UPLOADS", "3"))
+# Respostas que indicam falha passageira: a mesma requisição pode ser repetida depois de esperar.
+STATUS_TEMPORARIOS = {408, 429, 500, 502, 503, 504}
+
+# Uma sessão HTTP por thread (requests.Session não é garantidamente thread-safe, e cada AuthorizedSession
+# renova o próprio token); o JSON da conta de serviço é lido uma vez só por processo.
+_sessoes_da_thread = threading.local()
+_credenciais: Dict[str, Dict] = {}
+_trava_credenciais = threading.Lock()
+
+
+class ErroDrive(Exception):
+    pass
+
+
+class _FalhaTemporaria(Exception):
+    pass
+
+
+class _SessaoExpirada(_FalhaTemporaria):
+    pass
+
+
+def _ler_credenciais(arquivo_credenciais: str) -> Dict:
+    with _trava_credenciais:
+        if arquivo_credenciais not in _credenciais:
+            with open(arquivo_credenciais, encoding="utf-8") as arquivo:
+                _credenciais[arquivo_credenciais] = json.load(arquivo)
+        return _credenciais[arquivo_credenciais]
+
+
+def obter_sessao(arquivo_credenciais: Optional[str]) -> requests.Session:
+    """
+    Sessão HTTP autenticada com a conta de serviço, criada uma vez por thread e por arquivo de credenciais:
+    cada worker da FilaDeUploads usa a sua, com as próprias credenciais, e o token é renovado pela própria
+    sessão quando expira, sem disputa entre threads. Sem credenciais, devolve uma sessão anônima (usada com
+    o Drive falso local).
+    """
+    if not hasattr(_sessoes_da_thread, "sessoes"):
+        _sessoes_da_thread.sessoes = {}
+    sessoes: Dict[Optional[str], requests.Session] = _sessoes_da_thread.sessoes
+    sessao = sessoes.get(arquivo_credenciais)
+    if sessao is None:
+        if arquivo_credenciais is None:
+            sessao = requests.Session()
+        elif not GOOGLE_AUTH_DISPONIVEL:
+            raise ErroDrive("Para enviar ao Google Drive instale o pacote google-auth.")
+        else:
+            sessao = AuthorizedSession(Credentials.from_service_account_info(_ler_credenciais(arquivo_credenciais), scopes=ESCOPOS_DRIVE))
+        sessoes[arquivo_credenciais] = sessao
+    return sessao
+
+
+def _tipo_mime(caminho: str) -> str:
+    return FORMATOS_EXPORTACAO.get(os.path.splitext(caminho)[1].lstrip(".").lower(), "application/octet-stream")
+
+
+def _conferir(resposta: requests.Response):
+    if resposta.status_code in STATUS_TEMPORARIOS:
+        raise _FalhaTemporaria(f"HTTP {resposta.status_code}")
+    if resposta.status_code >= 400:
+        raise ErroDrive(f"O Drive recusou o upload (HTTP {resposta.status_code}): {resposta.text[:300]}")
+
+
+def _iniciar_upload(sessao: requests.Session, endpoint: str, nome: str, id_pasta: str, tipo_mime: str, tamanho: int) -> str:
+    """Abre uma sessão de upload retomável e devolve a URL dela (o cabeçalho Location)."""
+    resposta = sessao.post(
+        f"{endpoint}/upload/drive/v3/files",
+        params={"uploadType": "resumable", "supportsAllDrives": "true", "fields": "id"},
+        json={"name": nome, "parents": [id_pasta]},
+        headers={"X-Upload-Content-Type": tipo_mime, "X-Upload-Content-Length": str(tamanho)},
+        timeout=TIMEOUT_DRIVE,
+    )
+    _conferir(resposta)
+    return resposta.headers["Location"]
+
+
+def _bytes_confirmados(resposta: requests.Response) -> int:
+    # Resposta 308 com 'Range: bytes=0-N': o Drive já guardou N + 1 bytes (sem Range, nenhum)
+    intervalo = resposta.headers.get("Range")
+    return int(intervalo.rsplit("-", 1)[1]) + 1 if intervalo else 0
+
+
+def _resultado_do_upload(resposta: requests.Response) -> Tuple[Optional[int], Optional[Dict]]:
+    """(bytes confirmados, arquivo criado) de uma resposta da sessão de upload; a criação vem com 200/201."""
+    if resposta.status_code in (200, 201):
+        return None, resposta.json()
+    if resposta.status_code == 308:
+        return _bytes_confirmados(resposta), None
+    if resposta.status_code in (404, 410):
+        # A sessão expirou no servidor: o upload recomeça do zero numa sessão nova
+        raise _SessaoExpirada("sessão de upload expirada")
+    _conferir(resposta)
+    raise ErroDrive(f"Resposta inesperada do Drive no upload (HTTP {resposta.status_code}).")
+
+
+def _enviar_bloco(sessao: requests.Session, url_sessao: str, arquivo, inicio: int, tamanho: int,
+                  tamanho_bloco: int) -> Tuple[Optional[int], Optional[Dict]]:
+    arquivo.seek(inicio)
+    bloco = arquivo.read(tamanho_bloco)
+    faixa = f"bytes {inicio}-{inicio + len(bloco) - 1}/{tamanho}" if bloco else f"bytes */{tamanho}"
+    return _resultado_do_upload(sessao.put(url_sessao, data=bloco, headers={"Content-Range": faixa}, timeout=TIMEOUT_DRIVE))
+
+
+def _consultar_upload(sessao: requests.Session, url_sessao: str, tamanho: int) -> Tuple[Optional[int], Optional[Dict]]:
+    """Pergunta ao Drive quantos bytes da sessão já chegaram, depois de uma falha no meio do envio."""
+    return _resultado_do_upload(sessao.put(url_sessao, headers={"Content-Range": f"bytes */{tamanho}"}, timeout=TIMEOUT_DRIVE))
+
+
+def _esperar(tentativa: int):
+    time.sleep(random.uniform(0, min(ESPERA_MAXIMA_DRIVE_SEGUNDOS, ESPERA_INICIAL_DRIVE_SEGUNDOS * 2 ** (tentativa - 1))))
+
+
+def enviar_arquivo(caminho: str, id_pasta: str, nome: Optional[str] = None, arquivo_credenciais: Optional[str] = None,
+                   endpoint: str = ENDPOINT_DRIVE, tamanho_bloco: int = TAMANHO_BLOCO_UPLOAD_DRIVE,
+                   progresso: Optional[Callable[[int, int], None]] = None) -> str:
+    """
+    Envia `caminho` para a pasta `id_pasta` (também em Drives compartilhados) com upload retomável, em blocos de
+    `tamanho_bloco` bytes, e devolve o ID do arquivo criado. Falhas de conexão e respostas passageiras (429 e 5xx)
+    são repetidas com espera exponencial: o Drive informa quantos bytes já recebeu e o envio continua dali, sem
+    reenviar o arquivo inteiro. `progresso(enviados, total)` é chamado a cada bloco confirmado.
+    """
+    sessao = obter_sessao(arquivo_credenciais)
+    nome = nome or os.path.basename(caminho)
+    tamanho = os.path.getsize(caminho)
+    url_sessao, enviados, consultar = None, 0, False
+    tentativa = 0
+    with open(caminho, "rb") as arquivo:
+        while True:
+            try:
+                if url_sessao is None:
+                    url_sessao, enviados = _iniciar_upload(sessao, endpoint, nome, id_pasta, _tipo_mime(caminho), tamanho), 0
+                if consultar:
+                    confirmados, criado = _consultar_upload(sessao, url_sessao, tamanho)
+                    consultar = False
+                else:
+                    confirmados, criado = _enviar_bloco(sessao, url_sessao, arquivo, enviados, tamanho, tamanho_bloco)
+                    if criado is None and confirmados <= enviados:
+                        raise _FalhaTemporaria("o Drive não confirmou o bloco enviado")
+                if criado is not None:
+                    return criado["id"]
+                if confirmados > enviados:
+                    tentativa = 0
+                enviados = confirmados
+                if progresso:
+                    progresso(enviados, tamanho)
+                continue
+            except _SessaoExpirada as e:
+                motivo, url_sessao, consultar = str(e), None, False
+            except _FalhaTemporaria as e:
+                motivo, consultar = str(e), url_sessao is not None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                motivo = type(e).__name__
+                consultar = url_sessao is not None
+            tentativa += 1
+            if tentativa > TENTATIVAS_UPLOAD_DRIVE:
+                raise ErroDrive(f"Upload de '{nome}' falhou depois de {TENTATIVAS_UPLOAD_DRIVE} tentativas ({motivo}).")
+            print(f"[DRIVE] Falha no upload de '{nome}' ({motivo}). Tentativa {tentativa + 1} de {TENTATIVAS_UPLOAD_DRIVE + 1}...")
+            _esperar(tentativa)
+
+
+class FilaDeUploads:
+    """
+    Envia arquivos ao Drive em segundo plano, vários ao mesmo tempo, enquanto o processo continua gerando os
+    próximos. Uso: `with FilaDeUploads(id_pasta, credenciais) as fila: ... fila.enviar(caminho) ...`; ao sair
+    do bloco, espera todos os envios terminarem. Uma falha num arquivo é relatada e não interrompe os demais.
+    """
+
+    def __init__(self, id_pasta: str, arquivo_credenciais: Optional[str] = None, endpoint: str = ENDPOINT_DRIVE,
+                 workers: int = UPLOADS_SIMULTANEOS_DRIVE):
+        self.id_pasta = id_pasta
+        self.arquivo_credenciais = arquivo_credenciais
+        self.endpoint = endpoint
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-drive")
+        self._envios: List[Tuple[str, Future]] = []
+
+    def enviar(self, caminho: str, nome: Optional[str] = None) -> Future:
+        nome = nome or os.path.basename(caminho)
+        print(f"[DRIVE] '{nome}' entrou na fila de upload.")
+        futuro = self._executor.submit(enviar_arquivo, caminho, self.id_pasta, nome, self.arquivo_credenciais, self.endpoint)
+        self._envios.append((nome, futuro))
+        return futuro
+
+    def aguardar(self) -> Dict[str, Optional[str]]:
+        """Espera os envios pendentes e devolve nome -> ID no Drive (None para os que falharam)."""
+        resultados: Dict[str, Optional[str]] = {}
+        for nome, futuro in self._envios:
+            try:
+                resultados[nome] = futuro.result()
+                print(f"[DRIVE] -> SUCESSO! '{nome}' carregado com ID: {resultados[nome]}")
+            except Exception as e:
+                resultados[nome] = None
+                print(f"[DRIVE] -> ERRO no upload de '{nome}': {e}")
+        return resultados
+
+    def __enter__(self) -> "FilaDeUploads":
+        return self
+
+    def __exit__(self, *excecao):
+        self.aguardar()
+        self._executor.shutdown()
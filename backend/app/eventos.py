@@ -0,0 +1,45 @@
+import json
+import time
+from typing import Dict
+
+from .jobs import STATUS_FINALIZADOS
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Etapas que disparam eventos continuamente (a cada bloco baixado); são enviadas no máximo a cada tantos segundos.
+ETAPAS_CONTINUAS = ("baixando",)
+INTERVALO_MINIMO_EVENTOS_CONTINUOS = 0.5
+# Com que frequência o stream SSE procura eventos novos no armazenamento de jobs (compartilhado entre os workers).
+INTERVALO_CONSULTA_EVENTOS = 0.25
+# Comentário enviado periodicamente para que proxies não derrubem a conexão ociosa.
+INTERVALO_HEARTBEAT_SSE = 15.0
+
+
+class PublicadorDeEventos:
+    """
+    Callback de progresso usado dentro do processo que executa o job. Os eventos vão para uma fila
+    compartilhada com o processo principal, que os grava no armazenamento de jobs.
+    """
+
+    def __init__(self, job_id: str, fila):
+        self.job_id = job_id
+        self.fila = fila
+        self._ultimo_envio: Dict[str, float] = {}
+
+    def __call__(self, etapa: str, **detalhes):
+        agora = time.monotonic()
+        if etapa in ETAPAS_CONTINUAS:
+            terminou = detalhes.get("total") is not None and detalhes.get("baixados") == detalhes.get("total")
+            if not terminou and agora - self._ultimo_envio.get(etapa, -INTERVALO_MINIMO_EVENTOS_CONTINUOS) < INTERVALO_MINIMO_EVENTOS_CONTINUOS:
+                return
+        self._ultimo_envio[etapa] = agora
+        self.fila.put((self.job_id, etapa, detalhes))
+
+
+def evento_finaliza_job(evento: Dict) -> bool:
+    return evento["etapa"] in STATUS_FINALIZADOS
+
+
+def formatar_evento_sse(evento: Dict) -> str:
+    """Formata um evento no padrão Server-Sent Events; o id permite retomar o stream com Last-Event-ID."""
+    dados = json.dumps({"etapa": evento["etapa"], **evento["detalhes"]}, ensure_ascii=False)
+    return f"id: {evento['id']}\ndata: {dados}\n\n"
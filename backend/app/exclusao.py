@@ -0,0 +1,142 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Nomes com veredito guardado por filtro; ao passar disso o cache recomeça, para não crescer sem limite no servidor.
+MAXIMO_VEREDICTOS_EXCLUSAO = 500_000
+# Marcas de acento que sobram depois da decomposição NFKD ('Ê' -> 'E' + '\u0302').
+PADRAO_ACENTOS = '[\u0300-\u036f]'
+PADRAO_NAO_ASCII = '[^\x00-\x7f]'
+
+
+def normalizar_nome(texto: str) -> str:
+    """Coloca o texto em maiúsculas e remove os acentos ('Falência' -> 'FALENCIA')."""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).upper()
+
+
+def normalizar_nomes(nomes: pd.Series) -> pd.Series:
+    """Versão vetorizada de `normalizar_nome` para uma Series de nomes."""
+    nomes = nomes.str.upper()
+    # Só os nomes com caracteres fora do ASCII podem ter acento; os demais já estão normalizados.
+    # A regex, e não Series.str.isascii, que só existe a partir do pandas 3.
+    com_acento = nomes.str.contains(PADRAO_NAO_ASCII, regex=True, na=False).to_numpy(dtype=bool)
+    if com_acento.any():
+        nomes = nomes.copy()
+        nomes[com_acento] = nomes[com_acento].str.normalize('NFKD').str.replace(PADRAO_ACENTOS, '', regex=True)
+    return nomes
+
+
+def _termos_essenciais(termos: Iterable[str]) -> List[str]:
+    """
+    Normaliza os termos e descarta os redundantes: variações com e sem acento viram o mesmo termo,
+    e um termo que contém outro ('MASSA FALIDA' contém 'FALIDA') nunca muda o resultado da busca.
+    """
+    normalizados = sorted({normalizar_nome(t).strip() for t in termos if t and t.strip()}, key=len)
+    essenciais: List[str] = []
+    for termo in normalizados:
+        if not any(menor in termo for menor in essenciais):
+            essenciais.append(termo)
+    return sorted(essenciais)
+
+
+def _regex_de_trie(termos: List[str]) -> str:
+    """
+    Monta uma regex em forma de árvore de prefixos ('CONTA(?:BIL|DOR)' em vez de 'CONTABIL|CONTADOR'),
+    para que cada posição do nome seja testada contra todos os termos numa única passada, sem
+    recomeçar a comparação a cada alternativa.
+    """
+    trie: Dict = {}
+    for termo in termos:
+        no = trie
+        for caractere in termo:
+            no = no.setdefault(caractere, {})
+        no[''] = {}
+
+    def montar(no: Dict) -> str:
+        alternativas = []
+        for caractere, filho in sorted(no.items()):
+            alternativas.append('' if caractere == '' else (caractere if caractere.isalnum() or caractere == ' ' else re.escape(caractere)) + montar(filho))
+        if len(alternativas) == 1:
+            return alternativas[0]
+        opcional = '' in alternativas
+        alternativas = [a for a in alternativas if a]
+        grupo = alternativas[0] if len(alternativas) == 1 and len(alternativas[0]) == 1 else '(?:' + '|'.join(alternativas) + ')'
+        return grupo + '?' if opcional else grupo
+
+    return montar(trie)
+
+
+class FiltroExclusao:
+    """
+    Identifica devedores cujo nome contém algum dos termos de exclusão (município, contabilidade, falência...).
+    Os nomes são normalizados sem acento antes da busca, e o veredito de cada nome fica guardado,
+    porque o mesmo devedor aparece em muitas inscrições. Colunas de texto em Arrow (o padrão do pandas 3)
+    são avaliadas direto no dicionário da coluna, com o pyarrow.compute, sem passar por objetos Python.
+    """
+
+    def __init__(self, termos: Iterable[str]):
+        self.termos = _termos_essenciais(termos)
+        self._padrao = _regex_de_trie(self.termos) if self.termos else None
+        self._veredictos: Dict[str, bool] = {}
+
+    def mascara(self, nomes: pd.Series) -> np.ndarray:
+        """Retorna um vetor booleano com True para os nomes que devem ser excluídos (nulos nunca são)."""
+        if self._padrao is None or nomes.empty:
+            return np.zeros(len(nomes), dtype=bool)
+        if _e_texto_arrow(nomes.dtype):
+            return self._mascara_arrow(nomes)
+
+        codigos, unicos = pd.factorize(nomes)
+        unicos = pd.Series(unicos)
+        conhecidos = unicos.map(self._veredictos)
+        faltando = conhecidos.isna().to_numpy()
+        veredictos = conhecidos.where(~faltando, False).to_numpy(dtype=bool)
+        if faltando.any():
+            novos = unicos[faltando]
+            veredictos_novos = normalizar_nomes(novos).str.contains(self._padrao, na=False).to_numpy(dtype=bool)
+            if len(self._veredictos) + len(novos) > MAXIMO_VEREDICTOS_EXCLUSAO:
+                self._veredictos = {}
+            self._veredictos.update(zip(novos, veredictos_novos.tolist()))
+            veredictos[faltando] = veredictos_novos
+
+        return np.where(codigos >= 0, veredictos[codigos], False)
+
+    def _mascara_arrow(self, nomes: pd.Series) -> np.ndarray:
+        dados = pa.array(nomes.array)
+        if isinstance(dados, pa.ChunkedArray):
+            dados = dados.combine_chunks()
+        codificados = pc.dictionary_encode(dados)
+        # Cada nome distinto é normalizado e testado uma vez; só os que têm caracteres fora do ASCII perdem os acentos
+        unicos = pc.utf8_upper(codificados.dictionary)
+        veredictos = pc.match_substring_regex(unicos, self._padrao).to_numpy(zero_copy_only=False)
+        nao_ascii = ~pc.string_is_ascii(unicos).to_numpy(zero_copy_only=False)
+        if nao_ascii.any():
+            sem_acento = pc.replace_substring_regex(pc.utf8_normalize(unicos.filter(pa.array(nao_ascii)), "NFKD"), PADRAO_ACENTOS, "")
+            veredictos[nao_ascii] = pc.match_substring_regex(sem_acento, self._padrao).to_numpy(zero_copy_only=False)
+        # Nulos ficam com o código -1, que aponta para o False acrescentado no fim
+        codigos = pc.fill_null(codificados.indices, -1).to_numpy(zero_copy_only=False)
+        return np.append(veredictos, False)[codigos]
+
+
+def _e_texto_arrow(tipo) -> bool:
+    # pd.ArrowDtype só existe a partir do pandas 2
+    tipo_arrow = getattr(pd, "ArrowDtype", ())
+    return (isinstance(tipo, pd.StringDtype) and tipo.storage == "pyarrow") or (isinstance(tipo, tipo_arrow) and pa.types.is_string(tipo.pyarrow_dtype))
+
+
+@lru_cache(maxsize=32)
+def _filtro_por_termos(termos: Tuple[str, ...]) -> FiltroExclusao:
+    return FiltroExclusao(termos)
+
+
+def obter_filtro(termos: Iterable[str]) -> FiltroExclusao:
+    """Reaproveita o mesmo filtro (e o cache de veredictos) para listas de termos equivalentes."""
+    return _filtro_por_termos(tuple(_termos_essenciais(termos)))
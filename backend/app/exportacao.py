@@ -0,0 +1,116 @@
+import os
+import csv
+import time
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from .cache import DIRETORIO_CACHE, trava_arquivo
+from .jobs import TTL_JOBS_SEGUNDOS
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+DIRETORIO_EXPORTACOES = os.path.join(DIRETORIO_CACHE, "exportacoes")
+# Formato -> tipo MIME do arquivo gerado.
+FORMATOS_EXPORTACAO = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Mesmas abas da planilha final gerada pelos scripts em 0.OUTROS.
+ABAS_PLANILHA = {"com_parcelamento": "Com Parcelamento (Detalhado)", "sem_parcelamento": "Sem Parcelamento"}
+# Linhas convertidas e gravadas por vez, para nunca montar o arquivo inteiro em memória.
+LINHAS_POR_BLOCO_EXPORTACAO = 10_000
+# CSV no padrão do Excel em português: ponto e vírgula, vírgula decimal e BOM para o UTF-8 ser reconhecido.
+SEPARADOR_CSV = ";"
+DECIMAL_CSV = ","
+
+
+def _blocos(df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO_EXPORTACAO):
+        yield df.iloc[inicio:inicio + LINHAS_POR_BLOCO_EXPORTACAO]
+
+
+def gravar_planilha(abas: Dict[str, pd.DataFrame], destino: str):
+    """Grava uma planilha XLSX com uma aba por DataFrame (título da aba -> DataFrame), bloco a bloco."""
+    # Modo write-only: as linhas vão direto para o arquivo da aba, sem montar a planilha em memória
+    planilha = Workbook(write_only=True)
+    for titulo, df in abas.items():
+        aba = planilha.create_sheet(title=titulo)
+        aba.append(list(df.columns))
+        for bloco in _blocos(df):
+            for linha in bloco.astype(object).where(bloco.notna(), None).itertuples(index=False, name=None):
+                aba.append(linha)
+    planilha.save(destino)
+
+
+def _gravar_csv(df: pd.DataFrame, destino: str):
+    with open(destino, "w", encoding="utf-8-sig", newline="") as arquivo:
+        for numero, bloco in enumerate(_blocos(df)):
+            bloco.to_csv(arquivo, header=numero == 0, index=False, sep=SEPARADOR_CSV, decimal=DECIMAL_CSV, quoting=csv.QUOTE_MINIMAL)
+        if df.empty:
+            df.to_csv(arquivo, index=False, sep=SEPARADOR_CSV)
+
+
+def _gravar_parquet(df: pd.DataFrame, destino: str):
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as escritor:
+        for bloco in _blocos(df):
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+        if df.empty:
+            escritor.write_table(esquema.empty_table())
+
+
+def _remover_exportacoes_expiradas():
+    """Apaga os arquivos exportados de jobs que já expiraram no armazenamento de jobs."""
+    limite = time.time() - TTL_JOBS_SEGUNDOS
+    for nome in os.listdir(DIRETORIO_EXPORTACOES):
+        caminho = os.path.join(DIRETORIO_EXPORTACOES, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def nome_exportacao(job_id: str, formato: str, particao: Optional[str] = None) -> str:
+    """Nome do arquivo baixado: a planilha traz as duas partições; CSV e Parquet, uma só."""
+    sufixo = f"_{particao}" if formato != "xlsx" else ""
+    return f"leads_pgfn_{job_id[:8]}{sufixo}.{formato}"
+
+
+def _caminho_exportacao(job_id: str, formato: str, particao: Optional[str] = None) -> str:
+    """Arquivo no cache, com o job_id completo: o prefixo curto do nome baixado pode coincidir entre jobs."""
+    sufixo = f"_{particao}" if formato != "xlsx" else ""
+    return os.path.join(DIRETORIO_EXPORTACOES, f"{job_id}{sufixo}.{formato}")
+
+
+def exportar(job_id: str, resultado: Dict[str, pd.DataFrame], formato: str, particao: Optional[str] = None) -> str:
+    """
+    Gera (só na primeira vez) o arquivo exportado do job e retorna o caminho dele no cache.
+    XLSX traz as duas partições em abas; CSV e Parquet trazem a partição pedida.
+    """
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação inválido: '{formato}'. Use um de: {', '.join(FORMATOS_EXPORTACAO)}.")
+    if formato != "xlsx" and particao not in ABAS_PLANILHA:
+        raise ValueError(f"Informe a partição a exportar: {', '.join(ABAS_PLANILHA)}.")
+
+    os.makedirs(DIRETORIO_EXPORTACOES, exist_ok=True)
+    destino = _caminho_exportacao(job_id, formato, particao)
+    # O resultado de um job não muda, então o arquivo já gerado (por qualquer worker) é reaproveitado
+    with trava_arquivo(destino):
+        if os.path.exists(destino):
+            return destino
+        print(f"[EXPORTAÇÃO] Gerando '{os.path.basename(destino)}'...")
+        temporario = destino + ".tmp"
+        if formato == "xlsx":
+            gravar_planilha({titulo: resultado[particao] for particao, titulo in ABAS_PLANILHA.items()}, temporario)
+        elif formato == "csv":
+            _gravar_csv(resultado[particao], temporario)
+        else:
+            _gravar_parquet(resultado[particao], temporario)
+        os.replace(temporario, destino)
+    _remover_exportacoes_expiradas()
+    return destino
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .devedores import COLUNAS_DETALHE_FASE1, COLUNAS_USADAS_FASE1, ESQUEMA_PARTICAO
+from .exclusao import FiltroExclusao, obter_filtro
+from .snapshot import diretorio_particoes, obter_snapshot
+
+# Quantidade de índices (um por snapshot e lista de termos de exclusão) mantidos em memória por processo.
+MAXIMO_INDICES_EM_MEMORIA = 8
+
+_indices: "OrderedDict[Tuple[str, Tuple[str, ...], Tuple[str, ...]], IndiceLimiar]" = OrderedDict()
+_trava_indices = threading.Lock()
+
+
+class IndiceLimiar:
+    """
+    Índice sobre os débitos do snapshot que responde a qualquer valor mínimo sem reprocessar a base.
+    Os débitos ficam ordenados por VALOR_CONSOLIDADO, então os que passam por `VALOR_CONSOLIDADO > valor_minimo`
+    são sempre um sufixo do vetor: uma busca binária encontra o início e só essas k linhas são agregadas.
+    """
+
+    def __init__(self, tabela: pa.Table, filtro: FiltroExclusao):
+        # Só as colunas de filtro e agregação vão para o pandas; as de detalhe ficam na tabela (mapeada em
+        # memória) e são lidas apenas para os débitos do relatório por dívida
+        df = tabela.select(COLUNAS_USADAS_FASE1).to_pandas()
+        mantidas = ~filtro.mascara(df['NOME_DEVEDOR'])
+        df = df[mantidas].reset_index(drop=True)
+        self.tabela = tabela
+        # Linha da tabela de cada débito que passou pelo filtro de termos
+        self.linhas_tabela = np.flatnonzero(np.asarray(mantidas, dtype=bool))
+        codigos, cnpjs = pd.factorize(df['CPF_CNPJ'], sort=True)
+        self.cnpjs = np.asarray(cnpjs, dtype='int64')
+        valores = df['VALOR_CONSOLIDADO'].to_numpy(dtype='float64')
+        ordem = np.argsort(valores, kind='stable')
+
+        self.valores = valores[ordem]
+        self.codigos = codigos[ordem]
+        # Posição original de cada débito, usada para reproduzir o 'first' do groupby
+        self.posicoes = ordem
+        self.nomes = df['NOME_DEVEDOR'].to_numpy(dtype=object)
+        self.ufs = df['UF_DEVEDOR'].to_numpy(dtype=object)
+
+        # Maior débito de cada CNPJ: um CNPJ vira lead sempre que o valor mínimo fica abaixo dele
+        maximos = np.full(len(self.cnpjs), -np.inf)
+        np.maximum.at(maximos, codigos, valores)
+        self.maximos_ordenados = np.sort(maximos)
+
+    def totalizar(self, valor_minimo: float) -> pd.DataFrame:
+        """Retorna o mesmo `df_totalizado` da Fase 1 para `valor_minimo`, em O(k log k) para k débitos acima dele."""
+        inicio = np.searchsorted(self.valores, valor_minimo, side='right')
+        codigos = self.codigos[inicio:]
+        cnpjs_presentes, grupo = np.unique(codigos, return_inverse=True)
+        somas = np.bincount(grupo, weights=self.valores[inicio:], minlength=len(cnpjs_presentes))
+        primeiras = np.full(len(cnpjs_presentes), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(primeiras, grupo, self.posicoes[inicio:])
+        return pd.DataFrame({
+            'CPF_CNPJ': self.cnpjs[cnpjs_presentes],
+            'NOME_DEVEDOR': self.nomes[primeiras],
+            'UF_DEVEDOR': self.ufs[primeiras],
+            'VALOR_TOTAL_DIVIDA': somas.round(2),
+        })
+
+    def debitos(self, valor_minimo: float) -> pd.DataFrame:
+        """
+        Os débitos individuais acima de `valor_minimo` (o relatório por dívida), na ordem em que estavam na base
+        e com as mesmas colunas do relatório original (as da partição, na ordem dos CSVs da PGFN).
+        """
+        inicio = np.searchsorted(self.valores, valor_minimo, side='right')
+        ordem = np.argsort(self.posicoes[inicio:], kind='stable')
+        posicoes = self.posicoes[inicio:][ordem]
+        detalhes = self.tabela.select(COLUNAS_DETALHE_FASE1).take(self.linhas_tabela[posicoes]).to_pandas()
+        df = pd.DataFrame({
+            'CPF_CNPJ': self.cnpjs[self.codigos[inicio:][ordem]],
+            'NOME_DEVEDOR': self.nomes[posicoes],
+            'UF_DEVEDOR': self.ufs[posicoes],
+            'VALOR_CONSOLIDADO': self.valores[inicio:][ordem],
+        })
+        return pd.concat([df, detalhes], axis=1)[ESQUEMA_PARTICAO.names]
+
+    def contar_leads(self, limiares: List[float]) -> List[int]:
+        """Quantidade de CNPJs que viram leads para cada valor mínimo, em O(log n) por valor."""
+        posicoes = np.searchsorted(self.maximos_ordenados, limiares, side='right')
+        return (len(self.maximos_ordenados) - posicoes).tolist()
+
+
+def obter_indice(caminho_zip: str, nomes_arquivos: List[str], ufs: List[str], termos_excluir: List[str],
+                 progresso: Optional[Callable[..., None]] = None) -> IndiceLimiar:
+    """
+    Retorna o índice das partições das UFs pedidas com os termos de exclusão aplicados, montando-o
+    só na primeira consulta deste processo. Os índices menos usados recentemente são descartados.
+    """
+    filtro = obter_filtro(termos_excluir)
+    chave = (diretorio_particoes(caminho_zip, nomes_arquivos), tuple(ufs), tuple(filtro.termos))
+    with _trava_indices:
+        indice = _indices.get(chave)
+        if indice is not None:
+            _indices.move_to_end(chave)
+            return indice
+
+    indice = IndiceLimiar(obter_snapshot(caminho_zip, nomes_arquivos, ufs, progresso), filtro)
+    with _trava_indices:
+        _indices[chave] = indice
+        while len(_indices) > MAXIMO_INDICES_EM_MEMORIA:
+            _indices.popitem(last=False)
+    return indice
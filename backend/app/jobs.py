@@ -0,0 +1,460 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from .cache import DIRETORIO_CACHE
+from .metricas import BUCKETS_DURACAO_SEGUNDOS
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# "sqlite:///caminho/para/jobs.db" (padrão, compartilhado entre os workers do uvicorn) ou "memoria".
+URL_JOB_STORE = os.environ.get("PGFN_JOB_STORE", "sqlite:///" + os.path.join(DIRETORIO_CACHE, "jobs.db"))
+# Jobs finalizados há mais tempo que isso são apagados, junto com seus resultados.
+TTL_JOBS_SEGUNDOS = float(os.environ.get("PGFN_JOB_TTL", str(24 * 60 * 60)))
+# Limite para a soma dos resultados guardados; acima dele os jobs finalizados mais antigos são apagados.
+TAMANHO_MAXIMO_RESULTADOS = int(float(os.environ.get("PGFN_JOB_STORE_MAX_MB", "512")) * 1024 * 1024)
+COMPRESSAO_RESULTADOS = "zstd" if pa.Codec.is_available("zstd") else None
+
+# O worker dono renova o batimento dos seus jobs na fila ou em execução a cada poucos segundos. Um job
+# sem batimento há mais que isso ficou para trás (o worker morreu ou o servidor reiniciou): ele deixa de
+# ser reaproveitado e é marcado como erro.
+LIMITE_BATIMENTO_SEGUNDOS = float(os.environ.get("PGFN_JOB_BATIMENTO", "60"))
+
+STATUS_FINALIZADOS = ("concluido", "erro", "cancelado")
+STATUS_EM_ANDAMENTO = ("na_fila", "processando")
+# Jobs nesses status podem ser reaproveitados por uma requisição idêntica (mesma chave).
+STATUS_REAPROVEITAVEIS = ("na_fila", "processando", "concluido")
+ERRO_JOB_ABANDONADO = "O processo que executava o job parou antes de terminar. Envie a requisição novamente."
+
+
+def serializar_tabela(df: pd.DataFrame) -> bytes:
+    """Serializa um DataFrame no formato Arrow IPC comprimido, bem menor que a lista de dicionários."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    opcoes = pa.ipc.IpcWriteOptions(compression=COMPRESSAO_RESULTADOS)
+    destino = pa.BufferOutputStream()
+    with pa.ipc.new_stream(destino, tabela.schema, options=opcoes) as escritor:
+        escritor.write_table(tabela)
+    return destino.getvalue().to_pybytes()
+
+
+def desserializar_tabela(dados: bytes) -> pd.DataFrame:
+    return pa.ipc.open_stream(pa.py_buffer(dados)).read_all().to_pandas()
+
+
+class JobStore(ABC):
+    """
+    Interface dos armazenamentos de jobs. Um job é um dicionário com 'status' e, quando termina
+    com erro, 'erro'; o resultado (um DataFrame por partição) é guardado e lido à parte.
+    Um armazenamento que não implementa todos os métodos falha já ao ser instanciado.
+    """
+
+    @abstractmethod
+    def criar(self, job_id: str, status: str = "processando", chave: Optional[str] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def obter(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def buscar_por_chave(self, chave: str) -> Optional[Dict]:
+        """
+        Retorna o job mais recente com esta chave que ainda pode ser reaproveitado, se houver.
+        Jobs na fila ou em execução sem batimento recente (abandonados) não contam.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def registrar_batimento(self, job_ids: List[str]):
+        """Marca os jobs como ainda vivos; chamado periodicamente pelo worker que os executa."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def atualizar(self, job_id: str, **campos):
+        raise NotImplementedError
+
+    @abstractmethod
+    def gravar_resultado(self, job_id: str, resultado: Dict[str, pd.DataFrame]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def obter_resultado(self, job_id: str) -> Optional[Dict[str, pd.DataFrame]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def registrar_evento(self, job_id: str, etapa: str, detalhes: Optional[Dict] = None):
+        """Acrescenta um evento de progresso (etapa do processamento ou mudança de status) ao job."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def listar_eventos(self, job_id: str, depois_de: int = 0) -> List[Dict]:
+        """Eventos do job com id maior que `depois_de`, em ordem: dicionários com id, etapa, detalhes e criado_em."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def registrar_metricas(self, job_id: str, metricas: List[Dict]):
+        """Guarda as métricas das etapas no job e as soma aos totais por etapa (que não expiram com os jobs)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def metricas_agregadas(self) -> Dict[str, Dict]:
+        """Totais por etapa: execucoes, somas de duração/CPU/linhas, maior pico de memória e buckets de duração."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def contar_jobs_por_status(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def remover_expirados(self):
+        """
+        Marca como erro os jobs abandonados e apaga os finalizados há mais de TTL_JOBS_SEGUNDOS
+        (e os mais antigos, se os resultados passarem de TAMANHO_MAXIMO_RESULTADOS).
+        """
+        raise NotImplementedError
+
+
+def _somar_metricas(agregados: Dict, registro: Dict):
+    """Acumula o registro de uma etapa nos totais em memória (mesma regra usada nas tabelas do SQLite)."""
+    total = agregados.setdefault(registro["etapa"], {"execucoes": 0, "duracao_segundos": 0.0, "cpu_segundos": 0.0, "pico_rss_bytes": 0,
+                                                     "linhas_entrada": 0, "linhas_saida": 0, "buckets": {}})
+    total["execucoes"] += 1
+    for campo in ("duracao_segundos", "cpu_segundos", "linhas_entrada", "linhas_saida"):
+        total[campo] += registro[campo] or 0
+    total["pico_rss_bytes"] = max(total["pico_rss_bytes"], registro["pico_rss_bytes"])
+    for limite in BUCKETS_DURACAO_SEGUNDOS:
+        if registro["duracao_segundos"] <= limite:
+            total["buckets"][limite] = total["buckets"].get(limite, 0) + 1
+
+
+class MemoriaJobStore(JobStore):
+    """Guarda os jobs no próprio processo. Só serve para um único worker e perde tudo ao reiniciar."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._resultados: Dict[str, Dict[str, pd.DataFrame]] = {}
+        # Memória ocupada pelos DataFrames de cada resultado, para o limite TAMANHO_MAXIMO_RESULTADOS
+        self._tamanhos: Dict[str, int] = {}
+        self._eventos: Dict[str, List[Dict]] = {}
+        self._metricas: Dict[str, Dict] = {}
+        self._ultimo_evento = 0
+        self._trava = threading.Lock()
+
+    def criar(self, job_id: str, status: str = "processando", chave: Optional[str] = None):
+        with self._trava:
+            agora = time.time()
+            self._jobs[job_id] = {"job_id": job_id, "status": status, "chave": chave, "erro": None, "posicao_fila": None,
+                                  "cancelamento_solicitado": 0, "metricas": None, "perfil": None, "criado_em": agora, "atualizado_em": agora,
+                                  "batimento": agora}
+
+    def obter(self, job_id: str) -> Optional[Dict]:
+        with self._trava:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def buscar_por_chave(self, chave: str) -> Optional[Dict]:
+        limite = time.time() - LIMITE_BATIMENTO_SEGUNDOS
+        with self._trava:
+            candidatos = [job for job in self._jobs.values() if job["chave"] == chave and job["status"] in STATUS_REAPROVEITAVEIS
+                          and (job["status"] not in STATUS_EM_ANDAMENTO or job["batimento"] >= limite)]
+            return dict(max(candidatos, key=lambda job: job["criado_em"])) if candidatos else None
+
+    def registrar_batimento(self, job_ids: List[str]):
+        agora = time.time()
+        with self._trava:
+            for job_id in job_ids:
+                if job_id in self._jobs:
+                    self._jobs[job_id]["batimento"] = agora
+
+    def atualizar(self, job_id: str, **campos):
+        with self._trava:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(campos, atualizado_em=time.time())
+
+    def gravar_resultado(self, job_id: str, resultado: Dict[str, pd.DataFrame]):
+        tamanho = sum(int(df.memory_usage(index=True, deep=True).sum()) for df in resultado.values())
+        with self._trava:
+            self._resultados[job_id] = resultado
+            self._tamanhos[job_id] = tamanho
+        self.remover_expirados()
+
+    def obter_resultado(self, job_id: str) -> Optional[Dict[str, pd.DataFrame]]:
+        with self._trava:
+            return self._resultados.get(job_id)
+
+    def registrar_evento(self, job_id: str, etapa: str, detalhes: Optional[Dict] = None):
+        with self._trava:
+            if job_id in self._jobs:
+                self._ultimo_evento += 1
+                self._eventos.setdefault(job_id, []).append({"id": self._ultimo_evento, "etapa": etapa, "detalhes": detalhes or {}, "criado_em": time.time()})
+
+    def listar_eventos(self, job_id: str, depois_de: int = 0) -> List[Dict]:
+        with self._trava:
+            return [dict(evento) for evento in self._eventos.get(job_id, []) if evento["id"] > depois_de]
+
+    def registrar_metricas(self, job_id: str, metricas: List[Dict]):
+        with self._trava:
+            if job_id in self._jobs:
+                self._jobs[job_id]["metricas"] = metricas
+            for registro in metricas:
+                _somar_metricas(self._metricas, registro)
+
+    def metricas_agregadas(self) -> Dict[str, Dict]:
+        with self._trava:
+            return {etapa: dict(total, buckets=dict(total["buckets"])) for etapa, total in self._metricas.items()}
+
+    def contar_jobs_por_status(self) -> Dict[str, int]:
+        with self._trava:
+            contagem: Dict[str, int] = {}
+            for job in self._jobs.values():
+                contagem[job["status"]] = contagem.get(job["status"], 0) + 1
+            return contagem
+
+    def remover_expirados(self):
+        agora = time.time()
+        limite = agora - TTL_JOBS_SEGUNDOS
+        with self._trava:
+            for job in self._jobs.values():
+                if job["status"] in STATUS_EM_ANDAMENTO and job["batimento"] < agora - LIMITE_BATIMENTO_SEGUNDOS:
+                    job.update(status="erro", erro=ERRO_JOB_ABANDONADO, posicao_fila=None, atualizado_em=agora)
+            for job_id in [j for j, job in self._jobs.items() if job["status"] in STATUS_FINALIZADOS and job["atualizado_em"] < limite]:
+                self._remover(job_id)
+
+            # Se os resultados ainda passarem do limite de tamanho, apaga os jobs finalizados mais antigos
+            total = sum(self._tamanhos.values())
+            if total > TAMANHO_MAXIMO_RESULTADOS:
+                finalizados = sorted((job for job in self._jobs.values() if job["status"] in STATUS_FINALIZADOS), key=lambda job: job["atualizado_em"])
+                for job in finalizados:
+                    if total <= TAMANHO_MAXIMO_RESULTADOS:
+                        break
+                    total -= self._tamanhos.get(job["job_id"], 0)
+                    self._remover(job["job_id"])
+
+    def _remover(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._resultados.pop(job_id, None)
+        self._tamanhos.pop(job_id, None)
+        self._eventos.pop(job_id, None)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Guarda os jobs e os resultados (em Arrow IPC comprimido) num arquivo SQLite local.
+    Todos os workers do uvicorn apontam para o mesmo arquivo, então /status e /resultado
+    funcionam qualquer que seja o processo que atende a requisição.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with self._conexao() as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    erro TEXT,
+                    criado_em REAL NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )""")
+            # Colunas acrescentadas depois da primeira versão da tabela
+            existentes = {linha["name"] for linha in conexao.execute("PRAGMA table_info(jobs)")}
+            for coluna, definicao in [("chave", "TEXT"), ("posicao_fila", "INTEGER"), ("cancelamento_solicitado", "INTEGER NOT NULL DEFAULT 0"),
+                                      ("metricas", "TEXT"), ("perfil", "TEXT"), ("batimento", "REAL")]:
+                if coluna not in existentes:
+                    conexao.execute(f"ALTER TABLE jobs ADD COLUMN {coluna} {definicao}")
+            conexao.execute("CREATE INDEX IF NOT EXISTS jobs_chave ON jobs (chave)")
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS resultados (
+                    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+                    particao TEXT NOT NULL,
+                    dados BLOB NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    PRIMARY KEY (job_id, particao)
+                )""")
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS eventos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+                    etapa TEXT NOT NULL,
+                    detalhes TEXT NOT NULL,
+                    criado_em REAL NOT NULL
+                )""")
+            conexao.execute("CREATE INDEX IF NOT EXISTS eventos_job ON eventos (job_id, id)")
+            # Totais por etapa para o /metrics; não referenciam jobs, então sobrevivem à expiração deles
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS metricas_etapas (
+                    etapa TEXT PRIMARY KEY,
+                    execucoes INTEGER NOT NULL,
+                    duracao_segundos REAL NOT NULL,
+                    cpu_segundos REAL NOT NULL,
+                    pico_rss_bytes INTEGER NOT NULL,
+                    linhas_entrada INTEGER NOT NULL,
+                    linhas_saida INTEGER NOT NULL
+                )""")
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS metricas_buckets (
+                    etapa TEXT NOT NULL,
+                    limite REAL NOT NULL,
+                    contagem INTEGER NOT NULL,
+                    PRIMARY KEY (etapa, limite)
+                )""")
+        # Jobs deixados na fila ou em execução por um servidor que parou não ficam pendurados para sempre
+        self.remover_expirados()
+
+    @contextmanager
+    def _conexao(self):
+        # Uma conexão por operação: seguro entre threads e processos, e o custo é desprezível perto do job
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        conexao.row_factory = sqlite3.Row
+        conexao.execute("PRAGMA foreign_keys=ON")
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def criar(self, job_id: str, status: str = "processando", chave: Optional[str] = None):
+        agora = time.time()
+        with self._conexao() as conexao:
+            conexao.execute("INSERT INTO jobs (job_id, status, chave, criado_em, atualizado_em, batimento) VALUES (?, ?, ?, ?, ?, ?)",
+                            (job_id, status, chave, agora, agora, agora))
+
+    @staticmethod
+    def _job(linha: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if linha is None:
+            return None
+        job = dict(linha)
+        job["metricas"] = json.loads(job["metricas"]) if job["metricas"] else None
+        return job
+
+    def obter(self, job_id: str) -> Optional[Dict]:
+        with self._conexao() as conexao:
+            linha = conexao.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job(linha)
+
+    def buscar_por_chave(self, chave: str) -> Optional[Dict]:
+        marcadores = ", ".join("?" for _ in STATUS_REAPROVEITAVEIS)
+        em_andamento = ", ".join("?" for _ in STATUS_EM_ANDAMENTO)
+        with self._conexao() as conexao:
+            linha = conexao.execute(f"""
+                SELECT * FROM jobs WHERE chave = ? AND status IN ({marcadores})
+                    AND (status NOT IN ({em_andamento}) OR COALESCE(batimento, atualizado_em) >= ?)
+                ORDER BY criado_em DESC LIMIT 1""",
+                                    (chave, *STATUS_REAPROVEITAVEIS, *STATUS_EM_ANDAMENTO, time.time() - LIMITE_BATIMENTO_SEGUNDOS)).fetchone()
+        return self._job(linha)
+
+    def registrar_batimento(self, job_ids: List[str]):
+        with self._conexao() as conexao:
+            conexao.executemany("UPDATE jobs SET batimento = ? WHERE job_id = ?", [(time.time(), job_id) for job_id in job_ids])
+
+    def atualizar(self, job_id: str, **campos):
+        campos["atualizado_em"] = time.time()
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in campos)
+        with self._conexao() as conexao:
+            conexao.execute(f"UPDATE jobs SET {atribuicoes} WHERE job_id = ?", (*campos.values(), job_id))
+
+    def gravar_resultado(self, job_id: str, resultado: Dict[str, pd.DataFrame]):
+        linhas = []
+        for particao, df in resultado.items():
+            dados = serializar_tabela(df)
+            linhas.append((job_id, particao, dados, len(dados)))
+        with self._conexao() as conexao:
+            conexao.executemany("INSERT OR REPLACE INTO resultados (job_id, particao, dados, tamanho) VALUES (?, ?, ?, ?)", linhas)
+        self.remover_expirados()
+
+    def obter_resultado(self, job_id: str) -> Optional[Dict[str, pd.DataFrame]]:
+        with self._conexao() as conexao:
+            linhas = conexao.execute("SELECT particao, dados FROM resultados WHERE job_id = ?", (job_id,)).fetchall()
+        if not linhas:
+            return None
+        return {linha["particao"]: desserializar_tabela(linha["dados"]) for linha in linhas}
+
+    def registrar_evento(self, job_id: str, etapa: str, detalhes: Optional[Dict] = None):
+        with self._conexao() as conexao:
+            conexao.execute("INSERT INTO eventos (job_id, etapa, detalhes, criado_em) SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM jobs WHERE job_id = ?)",
+                            (job_id, etapa, json.dumps(detalhes or {}), time.time(), job_id))
+
+    def listar_eventos(self, job_id: str, depois_de: int = 0) -> List[Dict]:
+        with self._conexao() as conexao:
+            linhas = conexao.execute("SELECT id, etapa, detalhes, criado_em FROM eventos WHERE job_id = ? AND id > ? ORDER BY id",
+                                     (job_id, depois_de)).fetchall()
+        return [{"id": linha["id"], "etapa": linha["etapa"], "detalhes": json.loads(linha["detalhes"]), "criado_em": linha["criado_em"]} for linha in linhas]
+
+    def registrar_metricas(self, job_id: str, metricas: List[Dict]):
+        # Os totais são somados no próprio SQL, então workers que terminam jobs ao mesmo tempo não perdem atualizações
+        with self._conexao() as conexao:
+            conexao.execute("UPDATE jobs SET metricas = ? WHERE job_id = ?", (json.dumps(metricas), job_id))
+            for registro in metricas:
+                conexao.execute("""
+                    INSERT INTO metricas_etapas (etapa, execucoes, duracao_segundos, cpu_segundos, pico_rss_bytes, linhas_entrada, linhas_saida)
+                    VALUES (?, 1, ?, ?, ?, ?, ?)
+                    ON CONFLICT (etapa) DO UPDATE SET
+                        execucoes = execucoes + 1,
+                        duracao_segundos = duracao_segundos + excluded.duracao_segundos,
+                        cpu_segundos = cpu_segundos + excluded.cpu_segundos,
+                        pico_rss_bytes = MAX(pico_rss_bytes, excluded.pico_rss_bytes),
+                        linhas_entrada = linhas_entrada + excluded.linhas_entrada,
+                        linhas_saida = linhas_saida + excluded.linhas_saida""",
+                                (registro["etapa"], registro["duracao_segundos"], registro["cpu_segundos"], registro["pico_rss_bytes"],
+                                 registro["linhas_entrada"] or 0, registro["linhas_saida"] or 0))
+                conexao.executemany("""
+                    INSERT INTO metricas_buckets (etapa, limite, contagem) VALUES (?, ?, 1)
+                    ON CONFLICT (etapa, limite) DO UPDATE SET contagem = contagem + 1""",
+                                    [(registro["etapa"], limite) for limite in BUCKETS_DURACAO_SEGUNDOS if registro["duracao_segundos"] <= limite])
+
+    def metricas_agregadas(self) -> Dict[str, Dict]:
+        with self._conexao() as conexao:
+            agregados = {linha["etapa"]: dict(linha, buckets={}) for linha in conexao.execute("SELECT * FROM metricas_etapas")}
+            for linha in conexao.execute("SELECT etapa, limite, contagem FROM metricas_buckets"):
+                if linha["etapa"] in agregados:
+                    agregados[linha["etapa"]]["buckets"][linha["limite"]] = linha["contagem"]
+        return agregados
+
+    def contar_jobs_por_status(self) -> Dict[str, int]:
+        with self._conexao() as conexao:
+            return {linha["status"]: linha["quantidade"] for linha in conexao.execute("SELECT status, COUNT(*) AS quantidade FROM jobs GROUP BY status")}
+
+    def remover_expirados(self):
+        agora = time.time()
+        limite = agora - TTL_JOBS_SEGUNDOS
+        marcadores = ", ".join("?" for _ in STATUS_FINALIZADOS)
+        em_andamento = ", ".join("?" for _ in STATUS_EM_ANDAMENTO)
+        with self._conexao() as conexao:
+            abandonados = conexao.execute(f"""
+                UPDATE jobs SET status = 'erro', erro = ?, posicao_fila = NULL, atualizado_em = ?
+                WHERE status IN ({em_andamento}) AND COALESCE(batimento, atualizado_em) < ?""",
+                                          (ERRO_JOB_ABANDONADO, agora, *STATUS_EM_ANDAMENTO, agora - LIMITE_BATIMENTO_SEGUNDOS)).rowcount
+            if abandonados:
+                print(f"[JOBS] {abandonados} job(s) sem batimento marcados como erro (o processo que os executava parou).")
+            conexao.execute(f"DELETE FROM jobs WHERE status IN ({marcadores}) AND atualizado_em < ?", (*STATUS_FINALIZADOS, limite))
+
+            # Se os resultados ainda passarem do limite de tamanho, apaga os jobs finalizados mais antigos
+            total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM resultados").fetchone()[0]
+            if total > TAMANHO_MAXIMO_RESULTADOS:
+                antigos = conexao.execute(f"""
+                    SELECT jobs.job_id, COALESCE(SUM(resultados.tamanho), 0) AS tamanho
+                    FROM jobs LEFT JOIN resultados ON resultados.job_id = jobs.job_id
+                    WHERE jobs.status IN ({marcadores})
+                    GROUP BY jobs.job_id ORDER BY jobs.atualizado_em""", STATUS_FINALIZADOS).fetchall()
+                for linha in antigos:
+                    if total <= TAMANHO_MAXIMO_RESULTADOS:
+                        break
+                    conexao.execute("DELETE FROM jobs WHERE job_id = ?", (linha["job_id"],))
+                    total -= linha["tamanho"]
+
+
+def criar_job_store(url: str = URL_JOB_STORE) -> JobStore:
+    """Cria o armazenamento de jobs configurado em PGFN_JOB_STORE."""
+    if url == "memoria":
+        return MemoriaJobStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    raise ValueError(f"PGFN_JOB_STORE inválido: '{url}'. Use 'sqlite:///caminho.db' ou 'memoria'.")
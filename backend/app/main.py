@@ -1,14 +1,41 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware  # Garante que esta linha existe
-import uuid
-from typing import Dict
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 
-from .processing import processar_dados
+from .agendador import Agendador
+from .consultas import consultar, interpretar_filtro, obter_tabela_consultavel
+from .eventos import INTERVALO_CONSULTA_EVENTOS, INTERVALO_HEARTBEAT_SSE, evento_finaliza_job, formatar_evento_sse
+from .exportacao import FORMATOS_EXPORTACAO, exportar, nome_exportacao
+from .jobs import STATUS_FINALIZADOS, criar_job_store
+from .metricas import formatar_prometheus
+from .processing import DATASET_PADRAO, MODO_PADRAO, UF_DESEJADA, BaseNaoPreparada, contar_leads_por_limiar
+from .resultados import LIMITE_MAXIMO_PAGINA, LIMITE_PADRAO_PAGINA, PARTICOES, decodificar_cursor, linhas_ndjson, obter_resultado_em_memoria, pagina, selecionar
+from .serializacao import FORMATOS, responder_json, tabela_no_formato
+from .uploads import CAMPO_ARQUIVOS, ArquivoMuitoGrande, conferir_tamanho_declarado, receber_formulario
+
+# Segundos sugeridos (Retry-After) para repetir /limiares enquanto a base é preparada
+INTERVALO_RETRY_LIMIARES = 30
+
+# Jobs e resultados ficam num armazenamento compartilhado entre os workers (SQLite por padrão)
+jobs = criar_job_store()
+# Executa os jobs num pool de processos, com limite de jobs simultâneos e fila FIFO
+agendador = Agendador(jobs)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    agendador.encerrar()
 
 app = FastAPI(
     title="PGFN Leads API",
     description="API para processar dados de devedores da PGFN e cruzá-los com dados de parcelamento.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --- CONFIGURAÇÃO DE CORS DO PROJETO FUNCIONAL ---
@@ -24,38 +51,271 @@ app.add_middleware(
 )
 # --- FIM DA CONFIGURAÇÃO DE CORS ---
 
-# O resto do seu código permanece o mesmo...
-jobs: Dict[str, Dict] = {}
+@app.middleware("http")
+async def limitar_tamanho_do_envio(request: Request, call_next):
+    """Recusa com 413 um envio para /processar cujo Content-Length já passa do limite, sem ler o corpo."""
+    if request.method == "POST" and request.url.path == "/processar":
+        try:
+            conferir_tamanho_declarado(request.headers.get("content-length"))
+        except ArquivoMuitoGrande as e:
+            return JSONResponse(status_code=413, content={"detail": str(e)})
+    return await call_next(request)
+
+def ler_termos_excluir(texto: Optional[str]) -> Optional[List[str]]:
+    """Converte a lista de termos enviada pelo formulário (separada por vírgula ou quebra de linha)."""
+    if texto is None:
+        return None
+    return [termo.strip() for termo in texto.replace("\n", ",").split(",") if termo.strip()]
 
-def run_processing_task(job_id: str, valor_minimo: float, file_bytes: bytes):
+def _campo_obrigatorio(campos: Dict[str, str], nome: str) -> str:
+    if nome not in campos:
+        raise HTTPException(status_code=422, detail=f"Campo obrigatório ausente: {nome}.")
+    return campos[nome]
+
+def _campo_booleano(texto: str) -> bool:
+    return texto.strip().lower() in ("1", "true", "on", "yes", "sim")
+
+# O corpo é lido direto do stream, então o formulário é descrito aqui para a documentação da API
+FORMULARIO_PROCESSAR = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["valor_minimo", "file"],
+    "properties": {
+        "valor_minimo": {"type": "number"},
+        "file": {"type": "array", "items": {"type": "string", "format": "binary"}},
+        "termos_excluir": {"type": "string"},
+        "perfil": {"type": "boolean", "default": False},
+        "uf": {"type": "string", "default": UF_DESEJADA},
+        "dataset": {"type": "string", "default": DATASET_PADRAO},
+    },
+}}}}}
+
+@app.post("/processar", status_code=202, openapi_extra=FORMULARIO_PROCESSAR)
+async def iniciar_processamento(request: Request, modo: str = Query(MODO_PADRAO)):
+    """
+    `file` pode ser repetido (vários painéis) e cada arquivo pode ser um painel XLSX ou um ZIP de painéis; eles são
+    lidos em paralelo e consolidados, sem negociações repetidas, antes do cruzamento.
+    `uf` aceita uma UF ou várias separadas por vírgula (RS,SC); `dataset` é PREVIDENCIARIO, NAO_PREVIDENCIARIO ou FGTS.
+    Com `?modo=delta`, o resultado traz só os leads que entraram, saíram ou mudaram desde o trimestre anterior.
+    O formulário é lido em streaming e os arquivos vão direto para o disco (até PGFN_UPLOAD_MAX_MB no total, senão 413
+    assim que o limite é passado); o job recebe só os caminhos.
+    """
+    try:
+        campos, recebidos = await receber_formulario(request)
+    except ArquivoMuitoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        resultado = processar_dados(valor_minimo, file_bytes)
-        jobs[job_id]["status"] = "concluido"
-        jobs[job_id]["result"] = resultado
-    except Exception as e:
-        jobs[job_id]["status"] = "erro"
-        jobs[job_id]["result"] = str(e)
+        valor_minimo = float(_campo_obrigatorio(campos, "valor_minimo"))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="valor_minimo deve ser um número.")
+    if not recebidos:
+        raise HTTPException(status_code=422, detail=f"Campo obrigatório ausente: {CAMPO_ARQUIVOS}.")
 
-@app.post("/processar", status_code=202)
-async def iniciar_processamento(background_tasks: BackgroundTasks, valor_minimo: float = Form(...), file: UploadFile = File(...)):
-    job_id = str(uuid.uuid4())
-    file_bytes = await file.read()
-    jobs[job_id] = {"status": "processando"}
-    background_tasks.add_task(run_processing_task, job_id, valor_minimo, file_bytes)
+    try:
+        job_id, reaproveitado = agendador.submeter(valor_minimo, [recebido.caminho for recebido in recebidos],
+                                                   ler_termos_excluir(campos.get("termos_excluir")), _campo_booleano(campos.get("perfil", "")),
+                                                   campos.get("uf", UF_DESEJADA), campos.get("dataset", DATASET_PADRAO), modo,
+                                                   hashes=[recebido.sha256 for recebido in recebidos])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if reaproveitado:
+        return {"job_id": job_id, "message": "Processamento idêntico já existente; reaproveitando o job."}
     return {"job_id": job_id, "message": "Processamento iniciado."}
 
 @app.get("/status/{job_id}")
 async def get_status(job_id: str):
-    job = jobs.get(job_id)
+    job = jobs.obter(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if job["status"] == "erro":
+        return {"job_id": job_id, "status": job["status"], "erro": job["erro"]}
+    if job["status"] == "na_fila":
+        return {"job_id": job_id, "status": job["status"], "posicao_fila": job["posicao_fila"]}
+    if job["status"] == "concluido":
+        # Tempo, CPU, pico de memória e linhas de cada etapa do processamento
+        return {"job_id": job_id, "status": job["status"], "metricas": job["metricas"]}
     return {"job_id": job_id, "status": job["status"]}
 
-@app.get("/resultado/{job_id}")
-async def get_resultado(job_id: str):
-    job = jobs.get(job_id)
+@app.get("/perfil/{job_id}", response_class=PlainTextResponse)
+def get_perfil(job_id: str):
+    """Relatório do cProfile de um job enviado com perfil=true."""
+    job = jobs.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if not job["perfil"]:
+        raise HTTPException(status_code=404, detail="Job sem relatório de perfil. Envie o processamento com perfil=true.")
+    return job["perfil"]
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Métricas acumuladas das etapas e contagem de jobs no formato de exposição do Prometheus."""
+    return PlainTextResponse(formatar_prometheus(jobs.metricas_agregadas(), jobs.contar_jobs_por_status()),
+                             media_type="text/plain; version=0.0.4")
+
+@app.get("/eventos/{job_id}")
+async def get_eventos(job_id: str, request: Request):
+    """
+    Stream (Server-Sent Events) com o progresso do job: na_fila, processando, baixando, lendo_base, lendo_membro, filtrando,
+    agregando, lendo_trimestre_anterior e comparando (modo delta), lendo_painel, cruzando, serializando e, por fim,
+    concluido, erro ou cancelado, quando o stream termina.
+    Os eventos já ocorridos são reenviados; com o cabeçalho Last-Event-ID, só os posteriores a ele.
+    """
+    if not jobs.obter(job_id):
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    try:
+        ultimo_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        ultimo_id = 0
+
+    async def gerar():
+        nonlocal ultimo_id
+        ultimo_envio = time.monotonic()
+        while not await request.is_disconnected():
+            eventos = await run_in_threadpool(jobs.listar_eventos, job_id, ultimo_id)
+            if not eventos:
+                job = await run_in_threadpool(jobs.obter, job_id)
+                if job is None or job["status"] in STATUS_FINALIZADOS:
+                    # O evento final pode ainda estar a caminho; se não chegar, é montado a partir do status
+                    eventos = await run_in_threadpool(jobs.listar_eventos, job_id, ultimo_id)
+                    if not any(evento_finaliza_job(e) for e in eventos):
+                        etapa = job["status"] if job else "erro"
+                        detalhes = {"erro": job["erro"] if job else "Job expirou e foi removido."} if etapa == "erro" else {}
+                        eventos.append({"id": ultimo_id, "etapa": etapa, "detalhes": detalhes})
+            for evento in eventos:
+                ultimo_id = evento["id"]
+                yield formatar_evento_sse(evento)
+                ultimo_envio = time.monotonic()
+                if evento_finaliza_job(evento):
+                    return
+            if time.monotonic() - ultimo_envio > INTERVALO_HEARTBEAT_SSE:
+                yield ": heartbeat\n\n"
+                ultimo_envio = time.monotonic()
+            await asyncio.sleep(INTERVALO_CONSULTA_EVENTOS)
+
+    return StreamingResponse(gerar(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/cancelar/{job_id}")
+def cancelar_job(job_id: str):
+    if not jobs.obter(job_id):
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if not agendador.cancelar(job_id):
+        raise HTTPException(status_code=409, detail="Job já finalizado; não há o que cancelar.")
+    return {"job_id": job_id, "message": "Cancelamento solicitado."}
+
+def obter_job_concluido(job_id: str):
+    job = jobs.obter(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job não encontrado.")
     if job["status"] != "concluido":
         raise HTTPException(status_code=400, detail=f"Job ainda não concluído. Status atual: {job['status']}")
-    return {"job_id": job_id, "resultado": job["result"]}
\ No newline at end of file
+    return job
+
+def obter_resultado_concluido(job_id: str):
+    obter_job_concluido(job_id)
+    resultado = obter_resultado_em_memoria(jobs, job_id)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Resultado do job expirou e foi removido.")
+    return resultado
+
+@app.get("/resultado/{job_id}")
+def get_resultado(job_id: str, request: Request, formato: str = "registros"):
+    """Resultado completo. O JSON (e cada versão comprimida) é gerado uma única vez por job e formato."""
+    obter_job_concluido(job_id)
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido. Use um de: {', '.join(FORMATOS)}.")
+    def gerar():
+        resultado = obter_resultado_concluido(job_id)
+        return {"job_id": job_id, "resultado": {particao: tabela_no_formato(df, formato) for particao, df in resultado.items()}}
+    return responder_json(request, ("resultado", job_id, formato), gerar)
+
+@app.get("/resultado/{job_id}/export")
+def exportar_resultado(job_id: str, format: str = "xlsx", particao: Optional[str] = None):
+    """
+    Baixa o resultado como arquivo: `xlsx` (as duas abas da planilha usada pelo time comercial), `csv` ou `parquet`.
+    CSV e Parquet exportam uma partição, `com_parcelamento` por padrão. O arquivo é gerado uma vez por job e reaproveitado.
+    """
+    resultado = obter_resultado_concluido(job_id)
+    if format != "xlsx" and particao is None:
+        particao = "com_parcelamento"
+    try:
+        caminho = exportar(job_id, resultado, format, particao)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FileResponse(caminho, media_type=FORMATOS_EXPORTACAO[format], filename=nome_exportacao(job_id, format, particao))
+
+@app.get("/resultado/{job_id}/query")
+def consultar_resultado(job_id: str, request: Request, particao: str = "com_parcelamento", filtro: List[str] = Query([]),
+                        top: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO_PAGINA), ordenar: str = "VALOR_TOTAL_DIVIDA",
+                        decrescente: bool = True, agrupar: Optional[str] = None, somar: Optional[str] = None, colunas: Optional[str] = None,
+                        offset: int = Query(0, ge=0), limite: int = Query(LIMITE_PADRAO_PAGINA, ge=1, le=LIMITE_MAXIMO_PAGINA),
+                        formato: str = "registros"):
+    """
+    Consulta sobre o resultado já calculado, sem reprocessar o job. `filtro` (repetível) é coluna:operador:valor, como
+    "Situação da Negociação:contem:RESCIND" ou "Qtde de Parcelas em Atraso:gt:3"; operadores eq, ne, gt, ge, lt, le,
+    contem e em (valores separados por |). `top=200` traz as 200 linhas com maior `ordenar` (VALOR_TOTAL_DIVIDA por padrão);
+    `agrupar` resume por uma coluna (linhas, CNPJs distintos e a soma das colunas em `somar`, separadas por vírgula).
+    """
+    if particao not in PARTICOES:
+        raise HTTPException(status_code=404, detail=f"Partição inexistente. Use uma de: {', '.join(PARTICOES)}.")
+    obter_job_concluido(job_id)
+    lista_colunas = [c.strip() for c in colunas.split(",") if c.strip()] if colunas else None
+    lista_somar = [c.strip() for c in somar.split(",") if c.strip()] if somar else None
+    try:
+        filtros = [interpretar_filtro(f) for f in filtro]
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato inválido. Use um de: {', '.join(FORMATOS)}.")
+        def gerar():
+            tabela = obter_tabela_consultavel(job_id, particao, obter_resultado_concluido(job_id)[particao])
+            df, total = consultar(tabela, filtros, top, ordenar, decrescente, agrupar, lista_somar, lista_colunas, offset, limite)
+            chave_dados = "grupos" if agrupar else "dados" if formato == "colunar" else "registros"
+            conteudo = tabela_no_formato(df, formato)
+            return {"job_id": job_id, "particao": particao, "total": total, "colunas": list(df.columns),
+                    chave_dados: conteudo["dados"] if formato == "colunar" else conteudo}
+        chave = ("query", job_id, particao, tuple(filtros), top, ordenar, decrescente, agrupar, tuple(lista_somar or ()),
+                 tuple(lista_colunas or ()), offset, limite, formato)
+        return responder_json(request, chave, gerar)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/resultado/{job_id}/{particao}")
+def get_resultado_particao(job_id: str, particao: str, request: Request, offset: int = Query(0, ge=0), limite: int = Query(LIMITE_PADRAO_PAGINA, ge=1),
+                           cursor: Optional[str] = None, colunas: Optional[str] = None, ordenar: Optional[str] = None,
+                           decrescente: bool = True, formato: str = "registros"):
+    """
+    Uma partição do resultado, paginada. `cursor` (devolvido como `proximo_cursor`) substitui offset e ordenação;
+    `colunas` é uma lista separada por vírgula; `ordenar` aceita qualquer coluna, como VALOR_TOTAL_DIVIDA.
+    `formato` é "registros" (padrão), "colunar" ou "ndjson", que envia a partição inteira em streaming, um registro por linha.
+    """
+    if particao not in PARTICOES:
+        raise HTTPException(status_code=404, detail=f"Partição inexistente. Use uma de: {', '.join(PARTICOES)}.")
+    obter_job_concluido(job_id)
+    lista_colunas = [c.strip() for c in colunas.split(",") if c.strip()] if colunas else None
+    try:
+        if cursor:
+            offset, ordenar, decrescente = decodificar_cursor(cursor)
+        if formato == "ndjson":
+            df = obter_resultado_concluido(job_id)[particao]
+            selecionado = selecionar(job_id, particao, df, lista_colunas, ordenar, decrescente)
+            return StreamingResponse(linhas_ndjson(selecionado), media_type="application/x-ndjson")
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato inválido. Use um de: {', '.join(FORMATOS + ('ndjson',))}.")
+        chave = ("pagina", job_id, particao, offset, limite, tuple(lista_colunas or ()), ordenar, decrescente, formato)
+        return responder_json(request, chave, lambda: pagina(job_id, particao, obter_resultado_concluido(job_id)[particao],
+                                                            offset, limite, lista_colunas, ordenar, decrescente, formato))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/limiares")
+def get_limiares(valores: List[float] = Query(...), termos_excluir: Optional[str] = None, uf: str = UF_DESEJADA, dataset: str = DATASET_PADRAO):
+    """
+    Quantidade de leads para cada valor mínimo candidato, calculada sobre o índice da Fase 1.
+    Enquanto a base do conjunto de dados não foi baixada e particionada, responde 202 (com Retry-After) e
+    deixa a preparação com o agendador, num processo do pool, em vez de prender a requisição por minutos.
+    """
+    try:
+        return {"limiares": contar_leads_por_limiar(valores, ler_termos_excluir(termos_excluir), uf, dataset, somente_preparada=True)}
+    except BaseNaoPreparada as e:
+        agendador.preparar(dataset)
+        return JSONResponse(status_code=202, content={"detail": str(e)}, headers={"Retry-After": str(INTERVALO_RETRY_LIMIARES)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
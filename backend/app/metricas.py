@@ -0,0 +1,152 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de memória (fica 0) e com o tempo de CPU só do próprio processo
+    resource = None
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Limites (em segundos) dos buckets do histograma de duração das etapas exportado em /metrics.
+BUCKETS_DURACAO_SEGUNDOS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+# Quantidade de funções listadas no relatório do modo de perfil.
+LINHAS_RELATORIO_PERFIL = 60
+
+
+def _zerar_pico_rss():
+    """No Linux, zera o pico de memória do processo (VmHWM) para medir o pico de cada etapa separadamente."""
+    if not os.path.exists("/proc/self/clear_refs"):
+        return
+    try:
+        with open("/proc/self/clear_refs", "w") as arquivo:
+            arquivo.write("5")
+    except OSError:
+        pass
+
+
+def pico_rss_bytes() -> int:
+    """
+    Pico de memória residente do processo desde o último _zerar_pico_rss (ou desde o início, fora do Linux).
+    Sem o módulo resource (Windows), devolve 0.
+    """
+    try:
+        with open("/proc/self/status") as arquivo:
+            for linha in arquivo:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo if sys.platform == "darwin" else maximo * 1024
+
+
+def _tempo_cpu() -> float:
+    if resource is None:
+        return time.process_time()
+    # Inclui os processos filhos já finalizados, como o pool que lê os CSVs da PGFN
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return proprio.ru_utime + proprio.ru_stime + filhos.ru_utime + filhos.ru_stime
+
+
+class MedidorDeEtapas:
+    """
+    Mede cada etapa da pipeline (tempo de relógio, tempo de CPU, pico de memória e linhas de entrada/saída)
+    e acrescenta o registro de cada uma em `metricas`. Ao iniciar uma etapa também chama `progresso(etapa)`.
+    """
+
+    def __init__(self, progresso: Optional[Callable[..., None]] = None, metricas: Optional[List[Dict]] = None):
+        self.progresso = progresso
+        self.metricas = metricas if metricas is not None else []
+
+    @contextmanager
+    def etapa(self, nome: str, linhas_entrada: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Uso: `with medidor.etapa("cruzando", linhas_entrada=n) as etapa: ...; etapa["linhas_saida"] = m`.
+        A etapa que termina com exceção (inclusive o cancelamento do job) também é registrada, com `erro` verdadeiro.
+        """
+        if self.progresso:
+            self.progresso(nome)
+        registro = {"etapa": nome, "linhas_entrada": linhas_entrada, "linhas_saida": None, "erro": False}
+        _zerar_pico_rss()
+        inicio_relogio, inicio_cpu = time.perf_counter(), _tempo_cpu()
+        try:
+            yield registro
+        except BaseException:
+            registro["erro"] = True
+            raise
+        finally:
+            registro["duracao_segundos"] = round(time.perf_counter() - inicio_relogio, 4)
+            registro["cpu_segundos"] = round(_tempo_cpu() - inicio_cpu, 4)
+            registro["pico_rss_bytes"] = pico_rss_bytes()
+            self.metricas.append(registro)
+            print(f"[MÉTRICAS] {nome}{' (com erro)' if registro['erro'] else ''}: {registro['duracao_segundos']:.2f} s, "
+                  f"CPU {registro['cpu_segundos']:.2f} s, pico {registro['pico_rss_bytes'] / 1024 ** 2:.0f} MB, "
+                  f"linhas {linhas_entrada} -> {registro['linhas_saida']}")
+
+
+@contextmanager
+def perfilar(ativo: bool) -> Iterator[Dict]:
+    """
+    Com `ativo`, executa o bloco sob o cProfile e deixa o relatório (funções ordenadas por tempo acumulado)
+    em `relatorio["texto"]`. Só o processo atual é perfilado; a leitura paralela dos CSVs aparece como espera.
+    """
+    relatorio = {"texto": None}
+    if not ativo:
+        yield relatorio
+        return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield relatorio
+    finally:
+        perfil.disable()
+        saida = io.StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(LINHAS_RELATORIO_PERFIL)
+        relatorio["texto"] = saida.getvalue()
+
+
+def _rotulos(**rotulos) -> str:
+    return "{" + ",".join(f'{nome}="{valor}"' for nome, valor in rotulos.items()) + "}"
+
+
+def formatar_prometheus(agregados: Dict[str, Dict], jobs_por_status: Dict[str, int]) -> str:
+    """
+    Monta o texto no formato de exposição do Prometheus a partir das métricas acumuladas no armazenamento
+    de jobs (compartilhado entre os workers), e não da memória de um processo só.
+    """
+    linhas = [
+        "# HELP pgfn_jobs Jobs existentes no armazenamento, por status.",
+        "# TYPE pgfn_jobs gauge",
+    ]
+    linhas += [f"pgfn_jobs{_rotulos(status=status)} {quantidade}" for status, quantidade in sorted(jobs_por_status.items())]
+
+    linhas += [
+        "# HELP pgfn_etapa_duracao_segundos Duração (tempo de relógio) de cada etapa da pipeline.",
+        "# TYPE pgfn_etapa_duracao_segundos histogram",
+    ]
+    for etapa, valores in sorted(agregados.items()):
+        for limite in BUCKETS_DURACAO_SEGUNDOS:
+            linhas.append(f"pgfn_etapa_duracao_segundos_bucket{_rotulos(etapa=etapa, le=limite)} {valores['buckets'].get(limite, 0)}")
+        linhas.append(f"pgfn_etapa_duracao_segundos_bucket{_rotulos(etapa=etapa, le='+Inf')} {valores['execucoes']}")
+        linhas.append(f"pgfn_etapa_duracao_segundos_sum{_rotulos(etapa=etapa)} {valores['duracao_segundos']}")
+        linhas.append(f"pgfn_etapa_duracao_segundos_count{_rotulos(etapa=etapa)} {valores['execucoes']}")
+
+    for metrica, tipo, campo, descricao in [
+        ("pgfn_etapa_cpu_segundos_total", "counter", "cpu_segundos", "Tempo de CPU gasto em cada etapa, incluindo processos filhos."),
+        ("pgfn_etapa_linhas_entrada_total", "counter", "linhas_entrada", "Linhas recebidas por cada etapa."),
+        ("pgfn_etapa_linhas_saida_total", "counter", "linhas_saida", "Linhas produzidas por cada etapa."),
+        ("pgfn_etapa_pico_rss_bytes", "gauge", "pico_rss_bytes", "Maior pico de memória residente já observado em cada etapa."),
+    ]:
+        linhas += [f"# HELP {metrica} {descricao}", f"# TYPE {metrica} {tipo}"]
+        linhas += [f"{metrica}{_rotulos(etapa=etapa)} {valores[campo]}" for etapa, valores in sorted(agregados.items())]
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,233 @@
+import io
+import os
+import glob
+import json
+import shutil
+import hashlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+from openpyxl import load_workbook
+
+from .cache import DIRETORIO_CACHE
+from .cnpj import CNPJ_INVALIDO, normalizar_cnpj
+
+try:
+    import python_calamine  # noqa: F401  (habilita o engine 'calamine' do pandas, bem mais rápido que o openpyxl)
+    ENGINE_CALAMINE_DISPONIVEL = True
+except ImportError:
+    ENGINE_CALAMINE_DISPONIVEL = False
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Os painéis exportados têm duas linhas de título antes do cabeçalho (o header=2 do pd.read_excel).
+LINHA_CABECALHO_PAINEL = 2
+DIRETORIO_PAINEIS = os.path.join(DIRETORIO_CACHE, "paineis")
+# Número de processos usados para ler vários painéis ao mesmo tempo (um painel por processo).
+WORKERS_PAINEL = int(os.environ.get("PGFN_WORKERS_PAINEL", os.cpu_count() or 1))
+
+# Limites de um ZIP de painéis: soma dos tamanhos descompactados das planilhas (o mesmo limite dos uploads,
+# PGFN_UPLOAD_MAX_MB) e quantidade de arquivos dentro dele, para que um ZIP pequeno não se expanda sem limite.
+TAMANHO_MAXIMO_PAINEIS_ZIP = int(float(os.environ.get("PGFN_UPLOAD_MAX_MB", "200")) * 1024 * 1024)
+MAXIMO_ARQUIVOS_ZIP = 1_000
+
+# Um painel chega como os bytes da planilha ou como o caminho dela em disco (uploads da API).
+Painel = Union[bytes, str]
+
+
+def preparar_parcelamentos(df_parcelamentos: pd.DataFrame, coluna_cnpj: str, colunas_manter: List[str]) -> pd.DataFrame:
+    """Mantém só a chave e as colunas usadas no cruzamento, com o CNPJ já convertido para chave int64."""
+    df = df_parcelamentos[[coluna_cnpj] + colunas_manter].rename(columns={coluna_cnpj: 'CPF_CNPJ'}).copy()
+    df['CPF_CNPJ'] = normalizar_cnpj(df['CPF_CNPJ'])
+    return df[df['CPF_CNPJ'] != CNPJ_INVALIDO]
+
+
+def _conferir_cabecalho(cabecalho: List, colunas: List[str]):
+    faltando = [c for c in colunas if c not in cabecalho]
+    if faltando:
+        raise ValueError(f"Colunas não encontradas na planilha de parcelamentos: {faltando}")
+
+
+def _ler_planilha_openpyxl(arquivo, colunas: List[str]) -> pd.DataFrame:
+    """
+    Lê a primeira aba no modo read-only do openpyxl, que percorre o XML em streaming em vez de montar
+    a planilha inteira na memória, guardando apenas as colunas pedidas.
+    """
+    workbook = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = workbook.worksheets[0].iter_rows(values_only=True)
+        for _ in range(LINHA_CABECALHO_PAINEL):
+            next(linhas, None)
+        cabecalho = [str(c).strip() if c is not None else None for c in next(linhas, ())]
+        _conferir_cabecalho(cabecalho, colunas)
+        posicoes = [cabecalho.index(c) for c in colunas]
+
+        dados = {c: [] for c in colunas}
+        for linha in linhas:
+            valores = [linha[p] if p < len(linha) else None for p in posicoes]
+            if all(v is None for v in valores):
+                continue
+            for coluna, valor in zip(colunas, valores):
+                dados[coluna].append(valor)
+    finally:
+        workbook.close()
+    return pd.DataFrame(dados)
+
+
+def _abrir(painel: Painel):
+    # Caminhos são lidos direto do disco; bytes, de um buffer em memória
+    return painel if isinstance(painel, str) else io.BytesIO(painel)
+
+
+def _ler_planilha(painel: Painel, colunas: List[str]) -> pd.DataFrame:
+    if ENGINE_CALAMINE_DISPONIVEL:
+        df = pd.read_excel(_abrir(painel), header=LINHA_CABECALHO_PAINEL, engine='calamine', usecols=lambda c: str(c).strip() in colunas)
+        # Com usecols em função, colunas ausentes não dão erro na leitura: a conferência é feita aqui
+        df = df.rename(columns=lambda c: str(c).strip())
+        _conferir_cabecalho(list(df.columns), colunas)
+        return df[colunas]
+    return _ler_planilha_openpyxl(_abrir(painel), colunas)
+
+
+def sha256_do_painel(painel: Painel) -> str:
+    """SHA-256 do painel; de um caminho, lido em blocos, sem carregar o arquivo inteiro."""
+    if isinstance(painel, bytes):
+        return hashlib.sha256(painel).hexdigest()
+    resumo = hashlib.sha256()
+    with open(painel, "rb") as arquivo:
+        while bloco := arquivo.read(1024 * 1024):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def _caminho_painel_em_cache(painel: Painel, coluna_cnpj: str, colunas_manter: List[str]) -> str:
+    configuracao = hashlib.sha1(json.dumps([coluna_cnpj, colunas_manter]).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(DIRETORIO_PAINEIS, f"{sha256_do_painel(painel)}_{configuracao}.arrow")
+
+
+def ler_painel(conteudo: Painel, coluna_cnpj: str, colunas_manter: List[str]) -> pd.DataFrame:
+    """
+    Lê a planilha de parcelamentos (painel), dada pelos bytes ou pelo caminho do arquivo, só com as colunas
+    usadas no cruzamento e já com a chave de CNPJ normalizada. O resultado fica em cache pelo SHA-256 do
+    arquivo, então reenviar a mesma planilha não custa uma nova leitura.
+    """
+    destino = _caminho_painel_em_cache(conteudo, coluna_cnpj, colunas_manter)
+    if os.path.exists(destino):
+        print("[FASE 2] Planilha de parcelamentos já lida antes; usando a versão em cache.")
+        with pa.memory_map(destino, "r") as origem:
+            return pa.ipc.open_file(origem).read_all().to_pandas()
+
+    df_parcelamentos = preparar_parcelamentos(_ler_planilha(conteudo, [coluna_cnpj] + colunas_manter), coluna_cnpj, colunas_manter)
+    _gravar_painel_em_cache(df_parcelamentos, destino)
+    return df_parcelamentos
+
+
+def _caminho_extraido(caminho_zip: str, indice: int) -> str:
+    return f"{os.path.splitext(caminho_zip)[0]}_{indice:03d}.xlsx"
+
+
+def planilhas_extraidas(caminho_zip: str) -> List[str]:
+    """Planilhas já extraídas de um ZIP de painéis em disco; elas vivem e expiram junto com o ZIP."""
+    return sorted(glob.glob(glob.escape(os.path.splitext(caminho_zip)[0]) + "_[0-9][0-9][0-9].xlsx"))
+
+
+def _conferir_zip(z: zipfile.ZipFile, planilhas: List[str]):
+    """Recusa o ZIP pelos tamanhos declarados antes de descompactar qualquer coisa (o zipfile não lê além deles)."""
+    if len(z.infolist()) > MAXIMO_ARQUIVOS_ZIP:
+        raise ValueError(f"O ZIP enviado tem mais de {MAXIMO_ARQUIVOS_ZIP} arquivos.")
+    if sum(z.getinfo(nome).file_size for nome in planilhas) > TAMANHO_MAXIMO_PAINEIS_ZIP:
+        raise ValueError(f"As planilhas do ZIP enviado passam de {TAMANHO_MAXIMO_PAINEIS_ZIP // (1024 * 1024)} MB descompactadas.")
+
+
+def expandir_paineis(conteudos: Union[Painel, List[Painel]]) -> List[Painel]:
+    """
+    Aceita um painel, uma lista de painéis ou ZIPs com painéis dentro (como bytes ou caminhos) e devolve a
+    lista de planilhas XLSX. Um XLSX também é um ZIP; ele é reconhecido pelo [Content_Types].xml na raiz.
+    As planilhas de um ZIP em disco são extraídas ao lado dele, para seguirem como caminhos e não como bytes.
+    ZIPs que passam de MAXIMO_ARQUIVOS_ZIP arquivos ou de TAMANHO_MAXIMO_PAINEIS_ZIP descompactados levantam ValueError.
+    """
+    paineis = []
+    for conteudo in [conteudos] if isinstance(conteudos, (bytes, str)) else conteudos:
+        if not zipfile.is_zipfile(_abrir(conteudo)):
+            paineis.append(conteudo)
+            continue
+        with zipfile.ZipFile(_abrir(conteudo)) as z:
+            nomes = z.namelist()
+            if "[Content_Types].xml" in nomes:
+                paineis.append(conteudo)
+                continue
+            planilhas = sorted(n for n in nomes if n.lower().endswith('.xlsx') and not os.path.basename(n).startswith(('~$', '.')))
+            if not planilhas:
+                raise ValueError("O ZIP enviado não contém nenhuma planilha .xlsx de parcelamentos.")
+            _conferir_zip(z, planilhas)
+            if isinstance(conteudo, bytes):
+                paineis.extend(z.read(nome) for nome in planilhas)
+                continue
+            for indice, nome in enumerate(planilhas):
+                destino = _caminho_extraido(conteudo, indice)
+                if os.path.exists(destino):
+                    # Renova a data junto com a do ZIP, para a planilha não expirar enquanto o job a usa
+                    os.utime(destino)
+                else:
+                    with z.open(nome) as origem, open(destino + ".tmp", "wb") as arquivo:
+                        shutil.copyfileobj(origem, arquivo)
+                    os.replace(destino + ".tmp", destino)
+                paineis.append(destino)
+    return paineis
+
+
+def ler_paineis(conteudos: Union[Painel, List[Painel]], coluna_cnpj: str, colunas_manter: List[str],
+                workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Lê um ou vários painéis (ou ZIPs de painéis) e consolida numa única tabela. Com mais de um painel,
+    cada um é lido num processo, então o tempo total acompanha o painel mais lento e não a soma deles;
+    painéis já lidos antes saem do cache. A mesma negociação exportada em mais de um painel (mesmo CNPJ
+    e mesmas colunas mantidas) fica uma vez só, na ordem em que os arquivos foram enviados.
+    """
+    paineis = expandir_paineis(conteudos)
+    if len(paineis) == 1:
+        return ler_painel(paineis[0], coluna_cnpj, colunas_manter)
+
+    workers = min(workers or WORKERS_PAINEL, len(paineis))
+    print(f"[FASE 2] Lendo {len(paineis)} planilhas de parcelamentos em {workers} processos...")
+    if workers <= 1:
+        partes = [ler_painel(painel, coluna_cnpj, colunas_manter) for painel in paineis]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partes = list(executor.map(ler_painel, paineis, [coluna_cnpj] * len(paineis), [colunas_manter] * len(paineis)))
+    df_parcelamentos = pd.concat(partes, ignore_index=True)
+    total = len(df_parcelamentos)
+    df_parcelamentos = df_parcelamentos.drop_duplicates(subset=['CPF_CNPJ'] + colunas_manter, ignore_index=True)
+    print(f"[FASE 2] {total - len(df_parcelamentos)} negociações repetidas entre as planilhas foram descartadas.")
+    return df_parcelamentos
+
+
+def _gravar_painel_em_cache(df_parcelamentos: pd.DataFrame, destino: str):
+    try:
+        tabela = pa.Table.from_pandas(df_parcelamentos, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # Colunas com tipos misturados (texto e número na mesma coluna) não cabem num arquivo Arrow
+        print(f"[FASE 2] Planilha não foi guardada em cache: {e}")
+        return
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with pa.OSFile(temporario, "wb") as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    os.replace(temporario, destino)
+
+
+def cruzar_com_parcelamentos(df_leads: pd.DataFrame, df_parcelamentos: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Cruza os leads com os parcelamentos pela chave int64 do CNPJ numa única junção (left join com indicador),
+    separando de uma vez as linhas com parcelamento (uma por negociação) e os leads sem parcelamento.
+    """
+    df_cruzado = df_leads.merge(df_parcelamentos, on='CPF_CNPJ', how='left', indicator=True)
+    encontrado = (df_cruzado['_merge'] == 'both').to_numpy()
+    df_cruzado = df_cruzado.drop(columns='_merge')
+    # O left join promove colunas inteiras a float por causa das linhas sem correspondência; nas linhas
+    # com parcelamento os tipos originais da planilha podem ser restaurados
+    df_com_parcelamento = df_cruzado[encontrado].astype(df_parcelamentos.dtypes.to_dict()).reset_index(drop=True)
+    df_sem_parcelamento = df_cruzado.loc[~encontrado, list(df_leads.columns)].reset_index(drop=True)
+    return df_com_parcelamento, df_sem_parcelamento
@@ -0,0 +1,112 @@
+"""
+Etapas da geração de leads, na ordem em que são encadeadas: buscar (ZIP da PGFN em cache), ler (partições
+por UF em Arrow), filtrar (índice com os termos de exclusão), agregar (um lead por CNPJ), cruzar (com os
+painéis de parcelamento) e exportar. Cada etapa recebe e devolve tabelas em memória (DataFrames ou tabelas
+Arrow), então a API, a CLI em lote e os scripts de 0.OUTROS montam o mesmo fluxo sem gravar e reler
+planilhas intermediárias.
+"""
+import os
+import re
+import zipfile
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+
+from .cache import obter_arquivo
+from .cnpj import formatar_cnpj
+from .delta import comparar_trimestres
+from .exportacao import gravar_planilha
+from .indice import IndiceLimiar, obter_indice
+from .parcelamentos import Painel, cruzar_com_parcelamentos, ler_paineis
+from .snapshot import obter_snapshot
+
+
+class BasePGFN(NamedTuple):
+    caminho_zip: str
+    nomes_csv: List[str]
+
+
+def _sem_progresso(etapa: str, **detalhes):
+    pass
+
+
+def listar_csvs(caminho_zip: str, prefixo: str) -> List[str]:
+    """CSVs dentro do ZIP encontrados pelo prefixo, em ordem numérica (PREV_2 antes de PREV_10)."""
+    with zipfile.ZipFile(caminho_zip) as z:
+        nomes = [n for n in z.namelist() if os.path.basename(n).startswith(prefixo) and n.lower().endswith('.csv')]
+    if not nomes:
+        raise ValueError(f"Nenhum CSV '{prefixo}*.csv' encontrado no ZIP '{os.path.basename(caminho_zip)}'.")
+    return sorted(nomes, key=lambda n: [int(parte) if parte.isdigit() else parte for parte in re.split(r'(\d+)', n)])
+
+
+def buscar(url: str, prefixo_csv: str, progresso: Callable[..., None] = _sem_progresso, **detalhes) -> BasePGFN:
+    """
+    Etapa buscar: o ZIP fica em cache local e só é baixado de novo quando muda no servidor.
+    Cada bloco baixado é relatado como "baixando" (com baixados/total em bytes e os `detalhes` extras).
+    """
+    caminho_zip = obter_arquivo(url, progresso=lambda baixados, total: progresso("baixando", baixados=baixados, total=total, **detalhes))
+    return BasePGFN(caminho_zip, listar_csvs(caminho_zip, prefixo_csv))
+
+
+def ler(base: BasePGFN, ufs: List[str], progresso: Optional[Callable[..., None]] = None) -> pa.Table:
+    """
+    Etapa ler: os débitos de matrizes das UFs pedidas, numa tabela Arrow mapeada das partições por UF.
+    As partições são montadas uma vez por versão do ZIP (relatando "lendo_membro" a cada CSV lido).
+    """
+    return obter_snapshot(base.caminho_zip, base.nomes_csv, ufs, progresso)
+
+
+def filtrar(base: BasePGFN, ufs: List[str], termos_excluir: List[str], progresso: Optional[Callable[..., None]] = None) -> IndiceLimiar:
+    """Etapa filtrar: índice sobre os débitos sem os termos de exclusão, que responde a qualquer valor mínimo."""
+    return obter_indice(base.caminho_zip, base.nomes_csv, ufs, termos_excluir, progresso)
+
+
+def agregar(indice: IndiceLimiar, valor_minimo: float) -> pd.DataFrame:
+    """Etapa agregar: um lead por CNPJ com a soma dos débitos acima de `valor_minimo`."""
+    return indice.totalizar(valor_minimo)
+
+
+def detalhar(indice: IndiceLimiar, valor_minimo: float) -> pd.DataFrame:
+    """Os débitos individuais acima de `valor_minimo`, que dão origem ao relatório por dívida."""
+    return indice.debitos(valor_minimo)
+
+
+def comparar(df_atual: pd.DataFrame, df_anterior: pd.DataFrame) -> pd.DataFrame:
+    """Etapa do modo delta: só os leads que entraram, saíram ou mudaram entre os dois agregados."""
+    return comparar_trimestres(df_atual, df_anterior)
+
+
+def ler_parcelamentos(paineis: Union[Painel, List[Painel]], coluna_cnpj: str, colunas_manter: List[str]) -> pd.DataFrame:
+    """Lê e consolida os painéis de parcelamento (bytes ou caminhos, XLSX ou ZIPs de painéis)."""
+    return ler_paineis(paineis, coluna_cnpj, colunas_manter)
+
+
+def cruzar(df_leads: pd.DataFrame, df_parcelamentos: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Etapa cruzar: separa os leads com parcelamento (uma linha por negociação) dos sem parcelamento,
+    já com o CNPJ no formato XX.XXX.XXX/XXXX-XX.
+    """
+    df_com_parcelamento, df_sem_parcelamento = cruzar_com_parcelamentos(df_leads, df_parcelamentos)
+    df_com_parcelamento['CPF_CNPJ'] = formatar_cnpj(df_com_parcelamento['CPF_CNPJ'])
+    df_sem_parcelamento['CPF_CNPJ'] = formatar_cnpj(df_sem_parcelamento['CPF_CNPJ'])
+    return {"com_parcelamento": df_com_parcelamento, "sem_parcelamento": df_sem_parcelamento}
+
+
+def exportar(abas: Dict[str, pd.DataFrame], destino: str) -> str:
+    """
+    Etapa exportar: grava uma planilha com uma aba por tabela (título -> DataFrame). Chaves de CNPJ
+    ainda numéricas (como as da Fase 1) são gravadas no formato XX.XXX.XXX/XXXX-XX.
+    """
+    abas = {titulo: _com_cnpj_formatado(df) for titulo, df in abas.items()}
+    temporario = destino + ".tmp"
+    gravar_planilha(abas, temporario)
+    os.replace(temporario, destino)
+    return destino
+
+
+def _com_cnpj_formatado(df: pd.DataFrame) -> pd.DataFrame:
+    if 'CPF_CNPJ' in df and pd.api.types.infer_dtype(df['CPF_CNPJ'], skipna=True) == 'integer':
+        return df.assign(CPF_CNPJ=formatar_cnpj(df['CPF_CNPJ']))
+    return df
+
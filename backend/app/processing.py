@@ -1,98 +1,203 @@
-import pandas as pd
-import requests
-import io
-import zipfile
+import os
 import warnings
+from typing import Callable, Dict, List, Optional, Union
+
+from . import pipeline
+from .cache import caminho_no_cache, obter_arquivo
+from .delta import url_trimestre_anterior
+from .indice import obter_indice
+from .metricas import MedidorDeEtapas
+from .parcelamentos import Painel
+from .snapshot import diretorio_particoes
 
 # Ignora avisos de estilo do openpyxl
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
 # --- CONSTANTES DE CONFIGURAÇÃO ---
-# OBS: Em uma aplicação real, considere tornar a URL e os nomes dos arquivos dinâmicos ou configuráveis.
-URL_DADOS_PGFN = "https://dadosabertos.pgfn.gov.br/2025_trimestre_02/Dados_abertos_Previdenciario.zip"
-SUBPASTA_DENTRO_DO_ZIP = '' 
-NOMES_ARQUIVOS_CSV = ['arquivo_lai_PREV_1_202506.csv', 'arquivo_lai_PREV_2_202506.csv', 'arquivo_lai_PREV_3_202506.csv', 'arquivo_lai_PREV_4_202506.csv', 'arquivo_lai_PREV_5_202506.csv', 'arquivo_lai_PREV_6_202506.csv']
+URL_BASE_DADOS_PGFN = "https://dadosabertos.pgfn.gov.br/2025_trimestre_02/"
+# Conjuntos de dados abertos da PGFN: ZIP de cada um e prefixo dos CSVs dentro dele (os CSVs são descobertos
+# pelo prefixo, então a quantidade de arquivos e o trimestre no nome podem mudar). A URL de cada conjunto pode
+# ser trocada pela variável de ambiente PGFN_URL_DADOS_<CONJUNTO>; PGFN_URL_DADOS continua valendo para o Previdenciário.
+# No modo delta, o trimestre anterior vem de PGFN_URL_DADOS_ANTERIOR_<CONJUNTO> ou, sem ela, da mesma URL com o
+# trimestre anterior no caminho.
+DATASETS = {
+    "PREVIDENCIARIO": {
+        "url": os.environ.get("PGFN_URL_DADOS_PREVIDENCIARIO", os.environ.get("PGFN_URL_DADOS", URL_BASE_DADOS_PGFN + "Dados_abertos_Previdenciario.zip")),
+        "url_anterior": os.environ.get("PGFN_URL_DADOS_ANTERIOR_PREVIDENCIARIO"),
+        "prefixo_csv": "arquivo_lai_PREV_",
+    },
+    "NAO_PREVIDENCIARIO": {
+        "url": os.environ.get("PGFN_URL_DADOS_NAO_PREVIDENCIARIO", URL_BASE_DADOS_PGFN + "Dados_abertos_Nao_Previdenciario.zip"),
+        "url_anterior": os.environ.get("PGFN_URL_DADOS_ANTERIOR_NAO_PREVIDENCIARIO"),
+        "prefixo_csv": "arquivo_lai_SIDA_",
+    },
+    "FGTS": {
+        "url": os.environ.get("PGFN_URL_DADOS_FGTS", URL_BASE_DADOS_PGFN + "Dados_abertos_FGTS.zip"),
+        "url_anterior": os.environ.get("PGFN_URL_DADOS_ANTERIOR_FGTS"),
+        "prefixo_csv": "arquivo_lai_FGTS_",
+    },
+}
+DATASET_PADRAO = "PREVIDENCIARIO"
+URL_DADOS_PGFN = DATASETS[DATASET_PADRAO]["url"]
 UF_DESEJADA = 'RS'
-TERMOS_EXCLUIR = ['MUNICIPIO', 'MUNICÍPIO', 'CONTABILIDADE', 'CONTÁBIL', 'CONTABIL', 'CONTADOR', 'CONTADORA', 'CONTADORES', 'FALENCIA', 'FALÊNCIA', 'MASSA FALIDA', 'FALIDA', 'FALIDO', 'FILIAL', 'RECUPERACAO JUDICIAL', 'RECUPERAÇÃO JUDICIAL', 'EM LIQUIDACAO', 'EM LIQUIDAÇÃO']
-COLUNAS_PARA_REMOVER_FASE1 = ['TIPO_PESSOA', 'TIPO_DEVEDOR', 'UNIDADE_RESPONSAVEL', 'NUMERO_INSCRICAO', 'TIPO_CREDITO', 'DATA_INSCRICAO', 'INDICADOR_AJUIZADO']
+# completo: todos os leads do trimestre. delta: só os leads que entraram, saíram ou mudaram desde o trimestre anterior.
+MODOS = ("completo", "delta")
+MODO_PADRAO = "completo"
+UFS_VALIDAS = ('AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO')
+# Os nomes são comparados sem acento e em maiúsculas, então não é preciso repetir as variações acentuadas
+TERMOS_EXCLUIR = ['MUNICIPIO', 'CONTABILIDADE', 'CONTABIL', 'CONTADOR', 'CONTADORA', 'CONTADORES', 'FALENCIA', 'MASSA FALIDA', 'FALIDA', 'FALIDO', 'FILIAL', 'RECUPERACAO JUDICIAL', 'EM LIQUIDACAO']
 COLUNAS_PARA_MANTER_FASE2 = ["Tipo de Negociação", "Modalidade da Negociação", "Situação da Negociação", "Qtde de Parcelas Concedidas", "Qtde de Parcelas em Atraso", "Valor Consolidado", "Valor do Principal", "Valor da Multa", "Valor dos Juros", "Valor do Encargo Legal"]
 NOME_DA_COLUNA_CNPJ_NO_ARQUIVO = "CPF/CNPJ do Optante"
 
-def processar_dados(valor_minimo: float, arquivo_parcelamento_bytes: bytes):
+def normalizar_ufs(uf: Union[str, List[str]]) -> List[str]:
+    """Aceita 'RS', 'rs, sc' ou ['RS', 'SC'] e devolve as UFs em maiúsculas, sem repetição e em ordem alfabética."""
+    ufs = uf.split(',') if isinstance(uf, str) else uf
+    ufs = sorted({u.strip().upper() for u in ufs if u.strip()})
+    invalidas = [u for u in ufs if u not in UFS_VALIDAS]
+    if not ufs or invalidas:
+        raise ValueError(f"UF inválida: '{', '.join(invalidas) or uf}'. Use siglas como RS ou RS,SC.")
+    return ufs
+
+def normalizar_dataset(dataset: str) -> str:
+    chave = dataset.strip().upper().replace('-', '_').replace(' ', '_')
+    if chave not in DATASETS:
+        raise ValueError(f"Conjunto de dados inválido: '{dataset}'. Use um de: {', '.join(DATASETS)}.")
+    return chave
+
+def url_anterior_do_dataset(dataset: str) -> str:
+    return DATASETS[dataset]["url_anterior"] or url_trimestre_anterior(DATASETS[dataset]["url"])
+
+def normalizar_modo(modo: str, dataset: str) -> str:
+    """Valida o modo; no modo delta também confere se há como saber qual é o trimestre anterior do conjunto."""
+    modo = modo.strip().lower()
+    if modo not in MODOS:
+        raise ValueError(f"Modo inválido: '{modo}'. Use um de: {', '.join(MODOS)}.")
+    if modo == "delta":
+        url_anterior_do_dataset(dataset)
+    return modo
+
+def csvs_do_dataset(caminho_zip: str, dataset: str) -> List[str]:
+    """CSVs do conjunto de dados dentro do ZIP, encontrados pelo prefixo e em ordem numérica (PREV_2 antes de PREV_10)."""
+    return pipeline.listar_csvs(caminho_zip, DATASETS[dataset]["prefixo_csv"])
+
+def _sem_progresso(etapa: str, **detalhes):
+    pass
+
+class BaseNaoPreparada(Exception):
+    """O ZIP do conjunto de dados ainda não foi baixado e particionado por este servidor."""
+
+def base_preparada(dataset: str) -> Optional[str]:
+    """
+    Caminho do ZIP do conjunto de dados no cache, se ele já foi baixado e particionado por UF; senão None.
+    Não consulta o servidor da PGFN: vale a última versão baixada por um job ou por `preparar_base`.
+    """
+    caminho_zip = caminho_no_cache(DATASETS[dataset]["url"])
+    if os.path.exists(caminho_zip) and os.path.isdir(diretorio_particoes(caminho_zip, csvs_do_dataset(caminho_zip, dataset))):
+        return caminho_zip
+    return None
+
+def preparar_base(dataset: str = DATASET_PADRAO, progresso: Optional[Callable[..., None]] = None):
+    """Baixa (ou revalida) o ZIP do conjunto de dados e monta as partições por UF, se ainda não existirem."""
+    dataset = normalizar_dataset(dataset)
+    base = pipeline.buscar(DATASETS[dataset]["url"], DATASETS[dataset]["prefixo_csv"], progresso or _sem_progresso)
+    # Qualquer UF serve: a primeira leitura particiona o ZIP inteiro
+    pipeline.ler(base, [UF_DESEJADA], progresso)
+
+def contar_leads_por_limiar(limiares: List[float], termos_excluir: Optional[List[str]] = None,
+                            uf: Union[str, List[str]] = UF_DESEJADA, dataset: str = DATASET_PADRAO,
+                            somente_preparada: bool = False) -> List[Dict]:
+    """
+    Informa quantos leads a Fase 1 geraria para cada valor mínimo candidato, sem montar as tabelas.
+    Com `somente_preparada`, usa só a base já particionada (ver `base_preparada`) e levanta BaseNaoPreparada
+    em vez de baixar e particionar o ZIP, o que levaria minutos.
+    """
+    ufs, dataset = normalizar_ufs(uf), normalizar_dataset(dataset)
+    if somente_preparada:
+        caminho_zip = base_preparada(dataset)
+        if caminho_zip is None:
+            raise BaseNaoPreparada(f"A base do conjunto {dataset} ainda está sendo preparada. Tente novamente em alguns minutos.")
+    else:
+        caminho_zip = obter_arquivo(DATASETS[dataset]["url"])
+    indice = obter_indice(caminho_zip, csvs_do_dataset(caminho_zip, dataset), ufs, TERMOS_EXCLUIR if termos_excluir is None else termos_excluir)
+    return [{"valor_minimo": limiar, "leads": leads} for limiar, leads in zip(limiares, indice.contar_leads(limiares))]
+
+def processar_dados(valor_minimo: float, arquivo_parcelamento: Union[Painel, List[Painel]], termos_excluir: Optional[List[str]] = None,
+                    progresso: Callable[..., None] = _sem_progresso, metricas: Optional[List[Dict]] = None,
+                    uf: Union[str, List[str]] = UF_DESEJADA, dataset: str = DATASET_PADRAO, modo: str = MODO_PADRAO):
     """
     Função principal que executa toda a lógica de download, filtragem e cruzamento de dados.
-    Recebe o valor mínimo e os bytes do arquivo de parcelamento enviado pelo usuário.
+    Recebe o valor mínimo e o arquivo de parcelamento enviado pelo usuário, em bytes ou pelo caminho em disco
+    (ou uma lista de arquivos, cada um podendo ser um painel XLSX ou um ZIP de painéis, que são consolidados).
+    `termos_excluir` substitui a lista padrão TERMOS_EXCLUIR quando informado.
+    `progresso(etapa, **detalhes)` é chamado no início de cada etapa, a cada bloco baixado ("baixando",
+    com baixados/total em bytes) e a cada CSV lido ("lendo_membro"); quem executa o job pode usá-lo
+    para acompanhar o andamento ou para interromper o processamento levantando uma exceção.
+    Se `metricas` for informada, recebe um registro por etapa com tempo, CPU, pico de memória e linhas.
+    `uf` (uma UF ou várias, como 'RS,SC') e `dataset` (PREVIDENCIARIO, NAO_PREVIDENCIARIO ou FGTS)
+    escolhem quais devedores entram na Fase 1. Com `modo="delta"`, o agregado por CNPJ é comparado com o do
+    trimestre anterior e só os leads que mudaram seguem para a Fase 2, com as colunas SITUACAO_DELTA e
+    VALOR_TOTAL_DIVIDA_ANTERIOR (etapas extras "lendo_trimestre_anterior" e "comparando").
     """
+    ufs, dataset = normalizar_ufs(uf), normalizar_dataset(dataset)
+    modo = normalizar_modo(modo, dataset)
+    termos = TERMOS_EXCLUIR if termos_excluir is None else termos_excluir
+    medidor = MedidorDeEtapas(progresso, metricas)
     try:
         # =================================================================================
         # FASE 1: GERAÇÃO DA LISTA DE LEADS A PARTIR DOS DADOS BRUTOS DA PGFN
         # =================================================================================
-        print("[FASE 1] Baixando e consolidando dados da PGFN...")
-        response = requests.get(URL_DADOS_PGFN, stream=True)
-        response.raise_for_status()
-        lista_de_dataframes = []
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-            # Pega apenas os nomes de arquivo que existem no ZIP
-            nomes_validos = [nome for nome in NOMES_ARQUIVOS_CSV if nome in z.namelist()]
-            for nome_arquivo in nomes_validos:
-                with z.open(nome_arquivo) as f:
-                    df_temp = pd.read_csv(f, sep=';', encoding='latin-1', low_memory=False, dtype={'CPF_CNPJ': str}, on_bad_lines='warn')
-                    lista_de_dataframes.append(df_temp)
-
-        if not lista_de_dataframes:
-            raise ValueError("Nenhum dos arquivos CSV especificados foi encontrado no ZIP da PGFN.")
-
-        df = pd.concat(lista_de_dataframes, ignore_index=True)
-        del lista_de_dataframes
-        print(f"[FASE 1] Dados carregados. Total de {len(df)} registros.")
-
-        print("[FASE 1] Iniciando tratamento e filtragem dos dados...")
-        df = df[df['CPF_CNPJ'].str.contains('/0001-', na=False)]
-        df = df[df['UF_DEVEDOR'] == UF_DESEJADA]
-        mascara_exclusao = df['NOME_DEVEDOR'].str.contains('|'.join(TERMOS_EXCLUIR), case=False, na=False)
-        df = df[~mascara_exclusao]
-        df = df[df['VALOR_CONSOLIDADO'] > valor_minimo]
-        df_tratado = df.drop(columns=COLUNAS_PARA_REMOVER_FASE1, errors='ignore')
-        del df 
-
-        df_totalizado = df_tratado.groupby('CPF_CNPJ').agg(NOME_DEVEDOR=('NOME_DEVEDOR', 'first'), UF_DEVEDOR=('UF_DEVEDOR', 'first'), VALOR_TOTAL_DIVIDA=('VALOR_CONSOLIDADO', 'sum')).reset_index()
-        df_totalizado['VALOR_TOTAL_DIVIDA'] = df_totalizado['VALOR_TOTAL_DIVIDA'].round(2)
+        with medidor.etapa("baixando"):
+            print("[FASE 1] Baixando e consolidando dados da PGFN...")
+            base = pipeline.buscar(DATASETS[dataset]["url"], DATASETS[dataset]["prefixo_csv"], progresso)
+
+        # Os filtros que não dependem do valor mínimo são aplicados uma única vez por versão do ZIP, que é
+        # lido inteiro e guardado em partições por UF; aqui só são abertas as partições das UFs pedidas.
+        # Se as partições ainda não existirem, a leitura de cada CSV do ZIP é relatada como "lendo_membro"
+        with medidor.etapa("lendo_base") as etapa:
+            snapshot = pipeline.ler(base, ufs, progresso)
+            etapa["linhas_saida"] = snapshot.num_rows
+        with medidor.etapa("filtrando", linhas_entrada=snapshot.num_rows) as etapa:
+            indice = pipeline.filtrar(base, ufs, termos, progresso)
+            etapa["linhas_saida"] = len(indice.valores)
+        with medidor.etapa("agregando", linhas_entrada=len(indice.valores)) as etapa:
+            df_totalizado = pipeline.agregar(indice, valor_minimo)
+            etapa["linhas_saida"] = len(df_totalizado)
         print(f"[FASE 1] Concluída. {len(df_totalizado)} leads gerados.")
+
+        if modo == "delta":
+            # O trimestre anterior passa pelas mesmas etapas (ZIP em cache, partições por UF e índice), então só é
+            # baixado e particionado na primeira comparação; depois o agregado dele sai do índice como o do atual
+            with medidor.etapa("lendo_trimestre_anterior") as etapa:
+                base_anterior = pipeline.buscar(url_anterior_do_dataset(dataset), DATASETS[dataset]["prefixo_csv"], progresso, trimestre="anterior")
+                df_anterior = pipeline.agregar(pipeline.filtrar(base_anterior, ufs, termos, progresso), valor_minimo)
+                etapa["linhas_saida"] = len(df_anterior)
+            with medidor.etapa("comparando", linhas_entrada=len(df_totalizado) + len(df_anterior)) as etapa:
+                df_totalizado = pipeline.comparar(df_totalizado, df_anterior)
+                etapa["linhas_saida"] = len(df_totalizado)
+            print(f"[FASE 1] Modo delta: {len(df_totalizado)} leads mudaram desde o trimestre anterior.")
         
         # =================================================================================
         # FASE 2: CRUZAMENTO DA LISTA DE LEADS COM OS DADOS DE PARCELAMENTO
         # =================================================================================
         print("[FASE 2] Iniciando cruzamento com dados de parcelamento...")
-        df_leads = df_totalizado
         
-        # Lê o arquivo de parcelamento que veio da requisição web (em bytes)
-        df_parcelamentos = pd.read_excel(io.BytesIO(arquivo_parcelamento_bytes), header=2)
+        # Lê os painéis de parcelamento enviados (gravados em disco), só com as colunas usadas e com a chave
+        # de CNPJ já normalizada; a mesma planilha reenviada sai do cache
+        with medidor.etapa("lendo_painel") as etapa:
+            df_parcelamentos = pipeline.ler_parcelamentos(arquivo_parcelamento, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2)
+            etapa["linhas_saida"] = len(df_parcelamentos)
         print(f"[FASE 2] Base de parcelamentos carregada com {len(df_parcelamentos)} registros.")
         
-        print("[FASE 2] Preparando dados para o cruzamento...")
-        df_parcelamentos = df_parcelamentos.rename(columns={NOME_DA_COLUNA_CNPJ_NO_ARQUIVO: 'CPF_CNPJ'})
-        df_leads['CPF_CNPJ'] = df_leads['CPF_CNPJ'].astype(str)
-        df_parcelamentos['CPF_CNPJ'] = df_parcelamentos['CPF_CNPJ'].astype(str)
-        
-        colunas_essenciais = ['CPF_CNPJ'] + COLUNAS_PARA_MANTER_FASE2
-        df_parcelamentos_filtrado = df_parcelamentos[colunas_essenciais]
-        
-        print("[FASE 2] Realizando o cruzamento das bases de dados pelo CNPJ...")
-        df_com_parcelamento = pd.merge(df_leads, df_parcelamentos_filtrado, on='CPF_CNPJ', how='inner')
-        cnpjs_com_parcelamento = df_com_parcelamento['CPF_CNPJ'].unique()
-        df_sem_parcelamento = df_leads[~df_leads['CPF_CNPJ'].isin(cnpjs_com_parcelamento)]
+        with medidor.etapa("cruzando", linhas_entrada=len(df_totalizado)) as etapa:
+            print("[FASE 2] Realizando o cruzamento das bases de dados pelo CNPJ...")
+            resultado = pipeline.cruzar(df_totalizado, df_parcelamentos)
+            etapa["linhas_saida"] = len(resultado["com_parcelamento"]) + len(resultado["sem_parcelamento"])
         print("[FASE 2] Cruzamento concluído.")
 
-        # Converte os dataframes para listas de dicionários para serem enviados como JSON
-        resultado_com_parcelamento = df_com_parcelamento.to_dict(orient='records')
-        resultado_sem_parcelamento = df_sem_parcelamento.to_dict(orient='records')
-
-        return {
-            "com_parcelamento": resultado_com_parcelamento,
-            "sem_parcelamento": resultado_sem_parcelamento
-        }
+        # Os DataFrames são devolvidos como estão; a serialização fica a cargo de quem guarda o resultado
+        return resultado
 
     except Exception as e:
         print(f"ERRO CRÍTICO no processamento: {e}")
         # Propaga o erro para que a API possa tratá-lo
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,122 @@
+import json
+import base64
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .jobs import JobStore
+from .serializacao import codificar_json, tabela_em_registros, tabela_no_formato
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+PARTICOES = ("com_parcelamento", "sem_parcelamento")
+# Quantidade de resultados (já desserializados) mantidos em memória por processo.
+MAXIMO_RESULTADOS_EM_MEMORIA = 4
+LIMITE_PADRAO_PAGINA = 100
+LIMITE_MAXIMO_PAGINA = 5_000
+# Linhas convertidas por vez no modo NDJSON.
+LINHAS_POR_BLOCO_NDJSON = 2_000
+
+_resultados: "OrderedDict[str, Dict[str, pd.DataFrame]]" = OrderedDict()
+# Permutações de ordenação já calculadas, por (job, partição, coluna, decrescente)
+_ordenacoes: Dict[Tuple[str, str, str, bool], np.ndarray] = {}
+_trava_resultados = threading.Lock()
+
+
+def obter_resultado_em_memoria(jobs: JobStore, job_id: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Lê o resultado do armazenamento de jobs só na primeira consulta deste processo; as páginas
+    seguintes do mesmo job são recortadas do DataFrame já carregado.
+    """
+    with _trava_resultados:
+        resultado = _resultados.get(job_id)
+        if resultado is not None:
+            _resultados.move_to_end(job_id)
+            return resultado
+
+    resultado = jobs.obter_resultado(job_id)
+    if resultado is None:
+        return None
+    with _trava_resultados:
+        _resultados[job_id] = resultado
+        while len(_resultados) > MAXIMO_RESULTADOS_EM_MEMORIA:
+            descartado, _ = _resultados.popitem(last=False)
+            for chave in [c for c in _ordenacoes if c[0] == descartado]:
+                del _ordenacoes[chave]
+    return resultado
+
+
+def codificar_cursor(offset: int, ordenar: Optional[str], decrescente: bool) -> str:
+    """Cursor opaco com a posição da próxima página e a ordenação usada, para que ela não mude no meio da navegação."""
+    dados = json.dumps({"offset": offset, "ordenar": ordenar, "decrescente": decrescente}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[int, Optional[str], bool]:
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(dados["offset"]), dados["ordenar"], bool(dados["decrescente"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Cursor inválido.") from e
+
+
+def _ordem(job_id: str, particao: str, df: pd.DataFrame, ordenar: Optional[str], decrescente: bool) -> Optional[np.ndarray]:
+    if ordenar is None:
+        return None
+    chave = (job_id, particao, ordenar, decrescente)
+    with _trava_resultados:
+        ordem = _ordenacoes.get(chave)
+    if ordem is None:
+        # Ordenação estável: empates mantêm a ordem original do resultado; nulos ficam sempre no fim
+        ordem = df[ordenar].reset_index(drop=True).sort_values(ascending=not decrescente, kind="stable", na_position="last").index.to_numpy()
+        with _trava_resultados:
+            _ordenacoes[chave] = ordem
+    return ordem
+
+
+def selecionar(job_id: str, particao: str, df: pd.DataFrame, colunas: Optional[List[str]] = None,
+               ordenar: Optional[str] = None, decrescente: bool = True) -> pd.DataFrame:
+    """Aplica a projeção de colunas e a ordenação pedidas, validando os nomes das colunas."""
+    desconhecidas = [c for c in (colunas or []) + ([ordenar] if ordenar else []) if c not in df.columns]
+    if desconhecidas:
+        raise ValueError(f"Colunas inexistentes em '{particao}': {', '.join(desconhecidas)}")
+    ordem = _ordem(job_id, particao, df, ordenar, decrescente)
+    if ordem is not None:
+        df = df.iloc[ordem]
+    return df[colunas] if colunas else df
+
+
+def pagina(job_id: str, particao: str, df: pd.DataFrame, offset: int = 0, limite: int = LIMITE_PADRAO_PAGINA,
+           colunas: Optional[List[str]] = None, ordenar: Optional[str] = None, decrescente: bool = True,
+           formato: str = "registros") -> Dict:
+    """
+    Uma página da partição, com o total de linhas e o cursor da próxima página (None na última).
+    No formato "registros" as linhas vêm em `registros`; no "colunar", uma lista por coluna em `dados`.
+    """
+    limite = max(1, min(limite, LIMITE_MAXIMO_PAGINA))
+    selecionado = selecionar(job_id, particao, df, colunas, ordenar, decrescente)
+    fim = offset + limite
+    conteudo = tabela_no_formato(selecionado.iloc[offset:fim], formato)
+    resposta = {
+        "job_id": job_id,
+        "particao": particao,
+        "total": len(selecionado),
+        "offset": offset,
+        "limite": limite,
+        "colunas": list(selecionado.columns),
+        "proximo_cursor": codificar_cursor(fim, ordenar, decrescente) if fim < len(selecionado) else None,
+    }
+    if formato == "colunar":
+        resposta["dados"] = conteudo["dados"]
+    else:
+        resposta["registros"] = conteudo
+    return resposta
+
+
+def linhas_ndjson(df: pd.DataFrame) -> Iterator[bytes]:
+    """Gera a partição como NDJSON (um objeto por linha), convertendo um bloco de linhas por vez."""
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO_NDJSON):
+        registros = tabela_em_registros(df.iloc[inicio:inicio + LINHAS_POR_BLOCO_NDJSON])
+        yield b"".join(codificar_json(registro) + b"\n" for registro in registros)
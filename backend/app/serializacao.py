@@ -0,0 +1,148 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import Request, Response
+
+try:
+    import brotli
+    BROTLI_DISPONIVEL = True
+except ImportError:
+    BROTLI_DISPONIVEL = False
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# "registros": lista de objetos, um por linha (formato original); "colunar": nomes das colunas e uma lista de valores por coluna.
+FORMATOS = ("registros", "colunar")
+# Respostas menores que isso não compensam a compressão.
+TAMANHO_MINIMO_COMPRESSAO = 1024
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+# Limite da soma das respostas já codificadas (e comprimidas) guardadas por processo.
+TAMANHO_MAXIMO_CACHE_RESPOSTAS = int(float(os.environ.get("PGFN_CACHE_RESPOSTAS_MB", "128")) * 1024 * 1024)
+
+# Sufixo da ETag de cada compressão: representações diferentes do mesmo conteúdo não podem ter a mesma ETag.
+SUFIXOS_ETAG = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+# Por (chave, compressão pedida): a compressão de fato usada (respostas pequenas vão sem compressão) e os bytes.
+_respostas: "OrderedDict[Tuple[Hashable, str], Tuple[str, bytes]]" = OrderedDict()
+_tamanho_respostas = 0
+_trava_respostas = threading.Lock()
+
+
+def valores_da_coluna(serie: pd.Series) -> Union[np.ndarray, List]:
+    """
+    Valores de uma coluna prontos para o orjson: colunas numéricas vão como array NumPy (NaN vira null
+    no próprio orjson) e as demais como lista Python, com os nulos do pandas (NaN, NA, None) como None.
+    """
+    if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in "biuf":
+        return serie.to_numpy()
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def tabela_em_registros(df: pd.DataFrame) -> List[Dict]:
+    colunas = [valores_da_coluna(df[c]) for c in df.columns]
+    colunas = [c.tolist() if isinstance(c, np.ndarray) else c for c in colunas]
+    return [dict(zip(df.columns, linha)) for linha in zip(*colunas)]
+
+
+def tabela_em_colunas(df: pd.DataFrame) -> Dict:
+    return {"colunas": list(df.columns), "dados": [valores_da_coluna(df[c]) for c in df.columns]}
+
+
+def tabela_no_formato(df: pd.DataFrame, formato: str = "registros") -> Union[List[Dict], Dict]:
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: '{formato}'. Use um de: {', '.join(FORMATOS)}.")
+    return tabela_em_colunas(df) if formato == "colunar" else tabela_em_registros(df)
+
+
+def codificar_json(conteudo) -> bytes:
+    return orjson.dumps(conteudo, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def escolher_codificacao(accept_encoding: Optional[str]) -> str:
+    """Escolhe a compressão aceita pelo cliente: brotli (se instalado), depois gzip, senão nenhuma."""
+    aceitas = set()
+    for item in (accept_encoding or "").split(","):
+        nome, _, parametros = item.strip().partition(";")
+        if parametros.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        aceitas.add(nome.strip().lower())
+    if BROTLI_DISPONIVEL and "br" in aceitas:
+        return "br"
+    if "gzip" in aceitas:
+        return "gzip"
+    return "identity"
+
+
+def comprimir(dados: bytes, codificacao: str) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(dados, quality=QUALIDADE_BROTLI)
+    if codificacao == "gzip":
+        return gzip.compress(dados, compresslevel=NIVEL_GZIP)
+    return dados
+
+
+def _guardar_resposta(chave: Tuple[Hashable, str], codificacao: str, dados: bytes):
+    global _tamanho_respostas
+    if len(dados) > TAMANHO_MAXIMO_CACHE_RESPOSTAS:
+        return
+    with _trava_respostas:
+        if chave in _respostas:
+            return
+        _respostas[chave] = (codificacao, dados)
+        _tamanho_respostas += len(dados)
+        while _tamanho_respostas > TAMANHO_MAXIMO_CACHE_RESPOSTAS:
+            _, (_, descartada) = _respostas.popitem(last=False)
+            _tamanho_respostas -= len(descartada)
+
+
+def _resposta_guardada(chave: Tuple[Hashable, str]) -> Optional[Tuple[str, bytes]]:
+    with _trava_respostas:
+        guardada = _respostas.get(chave)
+        if guardada is not None:
+            _respostas.move_to_end(chave)
+        return guardada
+
+
+def etag_da_resposta(chave: Hashable, codificacao: str) -> str:
+    return '"' + hashlib.sha1(repr(chave).encode("utf-8")).hexdigest() + SUFIXOS_ETAG[codificacao] + '"'
+
+
+def responder_json(request: Request, chave: Optional[Hashable], gerar: Callable[[], object]) -> Response:
+    """
+    Responde com o JSON de `gerar()`, comprimido conforme o Accept-Encoding. Com `chave` (que deve mudar
+    sempre que o conteúdo mudar), os bytes já codificados e comprimidos são reaproveitados nas próximas
+    requisições e o cliente pode revalidar com If-None-Match, recebendo 304 sem corpo. A ETag é a da
+    compressão realmente enviada, para que caches intermediários não troquem uma representação por outra.
+    """
+    pedida = escolher_codificacao(request.headers.get("accept-encoding"))
+    guardada = _resposta_guardada((chave, pedida)) if chave is not None else None
+    if guardada is not None:
+        codificacao, corpo = guardada
+    else:
+        guardada = _resposta_guardada((chave, "identity")) if chave is not None else None
+        json_puro = guardada[1] if guardada is not None else None
+        if json_puro is None:
+            json_puro = codificar_json(gerar())
+            if chave is not None:
+                _guardar_resposta((chave, "identity"), "identity", json_puro)
+        codificacao = "identity" if len(json_puro) < TAMANHO_MINIMO_COMPRESSAO else pedida
+        corpo = comprimir(json_puro, codificacao)
+        if chave is not None:
+            _guardar_resposta((chave, pedida), codificacao, corpo)
+
+    cabecalhos = {"Vary": "Accept-Encoding"}
+    if chave is not None:
+        etag = etag_da_resposta(chave, codificacao)
+        cabecalhos["ETag"] = etag
+        if etag in [e.strip() for e in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=cabecalhos)
+    if codificacao != "identity":
+        cabecalhos["Content-Encoding"] = codificacao
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
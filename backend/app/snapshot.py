@@ -0,0 +1,97 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+import pyarrow as pa
+
+from .cache import DIRETORIO_CACHE, ler_metadados, trava_arquivo
+from .devedores import ESQUEMA_PARTICAO, particionar_por_uf
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+DIRETORIO_SNAPSHOTS = os.path.join(DIRETORIO_CACHE, "snapshots")
+# Incrementar quando o formato ou a lógica de filtragem do snapshot mudar, para invalidar os antigos.
+VERSAO_SNAPSHOT = 5
+
+_particoes_abertas: Dict[str, pa.Table] = {}
+_trava_snapshots = threading.Lock()
+
+
+def identidade_arquivo(caminho_zip: str) -> str:
+    """Identifica a versão do ZIP da PGFN pelos metadados do cache (ETag/Last-Modified/tamanho)."""
+    metadados = ler_metadados(caminho_zip) or {}
+    identidade = [metadados.get("etag"), metadados.get("last_modified"), os.path.getsize(caminho_zip)]
+    if not metadados.get("etag") and not metadados.get("last_modified"):
+        identidade.append(os.path.getmtime(caminho_zip))
+    return hashlib.sha1(json.dumps(identidade).encode("utf-8")).hexdigest()[:16]
+
+
+def diretorio_particoes(caminho_zip: str, nomes_arquivos: List[str]) -> str:
+    """
+    Diretório com as partições por UF desta versão do ZIP e desta lista de CSVs.
+    O prefixo identifica a configuração e o sufixo a versão do arquivo de origem.
+    """
+    configuracao = json.dumps([VERSAO_SNAPSHOT, os.path.basename(caminho_zip), nomes_arquivos])
+    prefixo = hashlib.sha1(configuracao.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(DIRETORIO_SNAPSHOTS, f"{prefixo}_{identidade_arquivo(caminho_zip)}")
+
+
+def construir_particoes(caminho_zip: str, nomes_arquivos: List[str], destino: str,
+                        progresso: Optional[Callable[..., None]] = None):
+    """
+    Executa, numa única leitura do arquivo nacional, a parte da Fase 1 que não depende da requisição
+    (CNPJ matriz e projeção de colunas) e grava os débitos resultantes em um arquivo Arrow IPC sem
+    compressão por UF, que pode ser aberto via mmap. Qualquer UF ou combinação de UFs é atendida
+    depois lendo só as suas partições. Os termos de exclusão ficam de fora porque podem variar por
+    requisição; eles são aplicados sobre os nomes únicos do snapshot, o que é barato.
+    """
+    print("[SNAPSHOT] Particionando por UF a base da PGFN...")
+    temporario = destino + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    totais = particionar_por_uf(caminho_zip, nomes_arquivos, temporario, progresso=progresso)
+    os.replace(temporario, destino)
+
+    # Partições da mesma configuração geradas a partir de versões antigas do ZIP não servem mais
+    prefixo = os.path.basename(destino).split("_", 1)[0]
+    for antigo in glob.glob(os.path.join(os.path.dirname(destino), f"{prefixo}_*")):
+        if antigo != destino and os.path.isdir(antigo) and not antigo.endswith(".tmp"):
+            shutil.rmtree(antigo, ignore_errors=True)
+    print(f"[SNAPSHOT] {sum(totais.values())} débitos gravados em {len(totais)} partições em '{destino}'.")
+
+
+def _abrir_particao(diretorio: str, uf: str) -> pa.Table:
+    caminho = os.path.join(diretorio, f"{uf}.arrow")
+    with _trava_snapshots:
+        tabela = _particoes_abertas.get(caminho)
+    if tabela is not None:
+        return tabela
+    if not os.path.exists(caminho):
+        # Nenhum débito de CNPJ matriz nessa UF
+        return ESQUEMA_PARTICAO.empty_table()
+    tabela = pa.ipc.open_file(pa.memory_map(caminho, "r")).read_all()
+    with _trava_snapshots:
+        # Mantém abertas só as partições da versão mais recente de cada configuração
+        prefixo = os.path.basename(diretorio).split("_", 1)[0]
+        for antigo in [c for c in _particoes_abertas if os.path.basename(os.path.dirname(c)).startswith(prefixo + "_")
+                       and os.path.dirname(c) != diretorio]:
+            del _particoes_abertas[antigo]
+        _particoes_abertas[caminho] = tabela
+    return tabela
+
+
+def obter_snapshot(caminho_zip: str, nomes_arquivos: List[str], ufs: List[str],
+                   progresso: Optional[Callable[..., None]] = None) -> pa.Table:
+    """
+    Retorna os débitos das UFs pedidas (partições mapeadas em memória e concatenadas sem cópia),
+    particionando o ZIP apenas na primeira vez que esta versão dele é usada. Jobs seguintes do mesmo
+    trimestre, de qualquer UF, só abrem os arquivos.
+    """
+    destino = diretorio_particoes(caminho_zip, nomes_arquivos)
+    with trava_arquivo(destino):
+        if not os.path.isdir(destino):
+            construir_particoes(caminho_zip, nomes_arquivos, destino, progresso)
+    return pa.concat_tables([_abrir_particao(destino, uf) for uf in ufs])
@@ -0,0 +1,195 @@
+import os
+import time
+import hashlib
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from .cache import DIRETORIO_CACHE
+from .jobs import TTL_JOBS_SEGUNDOS
+from .parcelamentos import planilhas_extraidas
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+DIRETORIO_UPLOADS = os.path.join(DIRETORIO_CACHE, "uploads")
+# Tamanho máximo (somando todos os arquivos) aceito por envio para /processar.
+TAMANHO_MAXIMO_UPLOAD = int(float(os.environ.get("PGFN_UPLOAD_MAX_MB", "200")) * 1024 * 1024)
+# Campo do formulário de /processar com os arquivos (pode ser repetido).
+CAMPO_ARQUIVOS = "file"
+# Folga para o envelope multipart (delimitadores e campos do formulário) na checagem do tamanho do corpo;
+# também é o limite da soma dos campos que não são arquivos.
+FOLGA_MULTIPART = 64 * 1024
+
+
+class ArquivoMuitoGrande(ValueError):
+    pass
+
+
+class ArquivoRecebido(NamedTuple):
+    caminho: str
+    sha256: str
+    tamanho: int
+    nome: str
+
+
+def conferir_tamanho_declarado(content_length: str) -> None:
+    """Recusa logo de início um envio cujo Content-Length já passa do limite, antes de ler o corpo."""
+    if content_length and content_length.isdigit() and int(content_length) > TAMANHO_MAXIMO_UPLOAD + FOLGA_MULTIPART:
+        raise ArquivoMuitoGrande(f"Envio maior que o limite de {TAMANHO_MAXIMO_UPLOAD // (1024 * 1024)} MB.")
+
+
+def _remover_uploads_expirados():
+    """
+    Apaga os arquivos enviados há mais tempo que o TTL dos jobs (que já não podem ser reaproveitados).
+    As planilhas extraídas de um ZIP saem junto com ele.
+    """
+    limite = time.time() - TTL_JOBS_SEGUNDOS
+    for nome in os.listdir(DIRETORIO_UPLOADS):
+        caminho = os.path.join(DIRETORIO_UPLOADS, nome)
+        try:
+            if os.path.getmtime(caminho) >= limite:
+                continue
+            for extraida in planilhas_extraidas(caminho) if nome.lower().endswith(".zip") else []:
+                os.remove(extraida)
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+class _ReceptorMultipart:
+    """
+    Recebe um corpo multipart/form-data bloco a bloco, na ordem em que chega da conexão: cada arquivo vai direto
+    para um temporário em DIRETORIO_UPLOADS, com o SHA-256 calculado no caminho, e os demais campos ficam em `campos`.
+    O limite é conferido a cada bloco, então um envio grande é interrompido assim que passa dele.
+    """
+
+    def __init__(self, delimitador: bytes):
+        self.campos: Dict[str, str] = {}
+        self.recebidos: List[ArquivoRecebido] = []
+        self._total_corpo = 0
+        self._total_arquivos = 0
+        self._total_campos = 0
+        self._cabecalho_nome, self._cabecalho_valor = b"", b""
+        self._cabecalhos: Dict[bytes, bytes] = {}
+        self._parte: Optional[dict] = None
+        self._parser = MultipartParser(delimitador, {
+            "on_part_begin": self._inicio_parte,
+            "on_header_field": lambda dados, inicio, fim: self._acumular_cabecalho(dados[inicio:fim], valor=False),
+            "on_header_value": lambda dados, inicio, fim: self._acumular_cabecalho(dados[inicio:fim], valor=True),
+            "on_header_end": self._fim_cabecalho,
+            "on_headers_finished": self._fim_cabecalhos,
+            "on_part_data": lambda dados, inicio, fim: self._dados_parte(dados[inicio:fim]),
+            "on_part_end": self._fim_parte,
+        })
+
+    def escrever(self, bloco: bytes):
+        self._total_corpo += len(bloco)
+        if self._total_corpo > TAMANHO_MAXIMO_UPLOAD + FOLGA_MULTIPART:
+            raise ArquivoMuitoGrande(f"Envio maior que o limite de {TAMANHO_MAXIMO_UPLOAD // (1024 * 1024)} MB.")
+        self._parser.write(bloco)
+
+    def finalizar(self):
+        self._parser.finalize()
+        if self._parte is not None:
+            raise ValueError("Corpo multipart incompleto.")
+
+    def descartar(self):
+        """Apaga o temporário do arquivo que estava sendo recebido quando o envio foi interrompido."""
+        if self._parte is not None and self._parte.get("arquivo"):
+            self._parte["arquivo"].close()
+            os.remove(self._parte["arquivo"].name)
+        self._parte = None
+
+    def _inicio_parte(self):
+        self._cabecalhos = {}
+        self._cabecalho_nome, self._cabecalho_valor = b"", b""
+
+    def _acumular_cabecalho(self, dados: bytes, valor: bool):
+        if valor:
+            self._cabecalho_valor += dados
+        else:
+            self._cabecalho_nome += dados
+
+    def _fim_cabecalho(self):
+        self._cabecalhos[self._cabecalho_nome.strip().lower()] = self._cabecalho_valor.strip()
+        self._cabecalho_nome, self._cabecalho_valor = b"", b""
+
+    def _fim_cabecalhos(self):
+        _, opcoes = parse_options_header(self._cabecalhos.get(b"content-disposition", b""))
+        nome = opcoes.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" not in opcoes:
+            self._parte = {"nome": nome, "valor": bytearray()}
+            return
+        self._parte = {"nome": nome, "arquivo": tempfile.NamedTemporaryFile(dir=DIRETORIO_UPLOADS, suffix=".tmp", delete=False),
+                       "nome_arquivo": opcoes[b"filename"].decode("utf-8", "replace"), "resumo": hashlib.sha256(), "tamanho": 0}
+
+    def _dados_parte(self, dados: bytes):
+        parte = self._parte
+        if "valor" in parte:
+            self._total_campos += len(dados)
+            if self._total_campos > FOLGA_MULTIPART:
+                raise ArquivoMuitoGrande("Campos do formulário maiores que o permitido.")
+            parte["valor"] += dados
+            return
+        self._total_arquivos += len(dados)
+        if self._total_arquivos > TAMANHO_MAXIMO_UPLOAD:
+            raise ArquivoMuitoGrande(f"Envio maior que o limite de {TAMANHO_MAXIMO_UPLOAD // (1024 * 1024)} MB.")
+        parte["resumo"].update(dados)
+        parte["arquivo"].write(dados)
+        parte["tamanho"] += len(dados)
+
+    def _fim_parte(self):
+        parte, self._parte = self._parte, None
+        if "valor" in parte:
+            self.campos[parte["nome"]] = parte["valor"].decode("utf-8", "replace")
+            return
+        parte["arquivo"].close()
+        if parte["nome"] != CAMPO_ARQUIVOS:
+            os.remove(parte["arquivo"].name)
+            return
+        destino = _guardar_upload(parte["arquivo"].name, parte["resumo"].hexdigest(), parte["nome_arquivo"])
+        self.recebidos.append(ArquivoRecebido(destino, parte["resumo"].hexdigest(), parte["tamanho"], parte["nome_arquivo"]))
+
+
+def _guardar_upload(temporario: str, sha256: str, nome_arquivo: str) -> str:
+    """Move o arquivo recebido para o nome definitivo, o SHA-256 do conteúdo com a extensão original."""
+    extensao = os.path.splitext(nome_arquivo)[1].lower()
+    destino = os.path.join(DIRETORIO_UPLOADS, sha256 + extensao)
+    if os.path.exists(destino):
+        os.remove(temporario)
+        # Renova a data para o arquivo (e as planilhas já extraídas dele) não expirar enquanto um job novo ainda depende dele
+        for caminho in [destino] + planilhas_extraidas(destino):
+            os.utime(caminho)
+    else:
+        os.replace(temporario, destino)
+    return destino
+
+
+async def receber_formulario(request: Request) -> Tuple[Dict[str, str], List[ArquivoRecebido]]:
+    """
+    Lê o formulário multipart de /processar direto da conexão (request.stream()), sem o arquivo temporário
+    intermediário do Starlette: os arquivos do campo `file` são gravados bloco a bloco em DIRETORIO_UPLOADS e
+    o envio é interrompido com ArquivoMuitoGrande no primeiro bloco que passa de TAMANHO_MAXIMO_UPLOAD, mesmo
+    sem Content-Length (envio em chunks). Os arquivos são nomeados pelo SHA-256, então reenviar a mesma
+    planilha não ocupa espaço de novo. Devolve os demais campos do formulário e os arquivos recebidos.
+    """
+    tipo, opcoes = parse_options_header(request.headers.get("content-type"))
+    if tipo != b"multipart/form-data" or not opcoes.get(b"boundary"):
+        raise ValueError("Envie o formulário como multipart/form-data.")
+    os.makedirs(DIRETORIO_UPLOADS, exist_ok=True)
+    receptor = _ReceptorMultipart(opcoes[b"boundary"])
+    try:
+        async for bloco in request.stream():
+            # A escrita em disco roda fora do loop de eventos, como a cópia de arquivos no restante da API
+            await run_in_threadpool(receptor.escrever, bloco)
+        receptor.finalizar()
+    except MultipartParseError as e:
+        receptor.descartar()
+        raise ValueError(f"Corpo multipart inválido: {e}")
+    except BaseException:
+        receptor.descartar()
+        raise
+    _remover_uploads_expirados()
+    return receptor.campos, receptor.recebidos
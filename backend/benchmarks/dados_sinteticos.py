@@ -0,0 +1,204 @@
+"""
+Gera uma base sintética no formato dos dados abertos da PGFN (ZIP com os CSVs arquivo_lai_PREV_*.csv em
+latin-1 separados por ';') e um painel de parcelamentos em XLSX, para medir a pipeline sem depender de
+dadosabertos.pgfn.gov.br nem de exportações reais do painel.
+
+As distribuições imitam a base real: devedores repetidos em várias inscrições, UFs com pesos próximos aos
+da base, matrizes e filiais, CPFs misturados aos CNPJs, valores com cauda longa (lognormal) e uma fração
+de nomes com os termos de exclusão (municípios, contabilidades, massas falidas...).
+
+Uso, a partir da pasta backend:  python -m benchmarks.dados_sinteticos <pasta_destino> [escala]
+"""
+import os
+import sys
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+# Escala -> (linhas por CSV da PGFN, devedores distintos, linhas do painel de parcelamentos)
+ESCALAS: Dict[str, Tuple[int, int, int]] = {
+    "pequena": (20_000, 15_000, 5_000),
+    "media": (200_000, 120_000, 50_000),
+    "grande": (1_000_000, 500_000, 200_000),
+}
+NOMES_MEMBROS_PADRAO = [f"arquivo_lai_PREV_{n}_202506.csv" for n in range(1, 7)]
+COLUNAS_CSV_PGFN = ['CPF_CNPJ', 'TIPO_PESSOA', 'TIPO_DEVEDOR', 'NOME_DEVEDOR', 'UF_DEVEDOR', 'UNIDADE_RESPONSAVEL', 'NUMERO_INSCRICAO',
+                    'TIPO_SITUACAO_INSCRICAO', 'SITUACAO_INSCRICAO', 'RECEITA_PRINCIPAL', 'TIPO_CREDITO', 'DATA_INSCRICAO', 'INDICADOR_AJUIZADO', 'VALOR_CONSOLIDADO']
+# Receitas mais comuns da dívida previdenciária, no formato "código - descrição" dos dados abertos
+RECEITAS_PRINCIPAIS = ['2141 - CONTRIB. EMPRESA/EMPREGADOR', '2158 - CONTRIB. SEGURADOS', '2164 - CONTRIB. TERCEIROS',
+                       '3551 - MULTA POR ATRASO NA GFIP', '4133 - CONTRIB. SUBSTITUTIVA SOBRE A RECEITA BRUTA']
+# Mesmas colunas (e o mesmo título nas duas primeiras linhas) do export do painel de parcelamentos
+COLUNAS_PAINEL = ['CPF/CNPJ do Optante', 'Nome do Optante', 'Tipo de Negociação', 'Modalidade da Negociação', 'Situação da Negociação',
+                  'Qtde de Parcelas Concedidas', 'Qtde de Parcelas em Atraso', 'Valor Consolidado', 'Valor do Principal', 'Valor da Multa',
+                  'Valor dos Juros', 'Valor do Encargo Legal', 'Data do Deferimento']
+# Participação aproximada de cada UF na base de devedores
+PESOS_UF = {'SP': 28, 'RJ': 10, 'MG': 10, 'RS': 7, 'PR': 7, 'SC': 5, 'BA': 5, 'GO': 4, 'PE': 4, 'DF': 3, 'CE': 3, 'ES': 2, 'PA': 2,
+            'MT': 2, 'MS': 2, 'AM': 1, 'MA': 1, 'RN': 1, 'PB': 1, 'AL': 1, 'PI': 1, 'SE': 1, 'RO': 1, 'TO': 1, 'AC': 1, 'AP': 1, 'RR': 1}
+PALAVRAS = ['COMERCIO', 'INDUSTRIA', 'TRANSPORTES', 'ALIMENTOS', 'METALURGICA', 'CONSTRUTORA', 'SERVIÇOS', 'AGROPECUÁRIA', 'DISTRIBUIDORA',
+            'CALÇADOS', 'CONFECÇÕES', 'MADEIREIRA', 'PANIFICADORA', 'FARMÁCIA', 'AUTO PEÇAS', 'SUPERMERCADO', 'TECNOLOGIA', 'ENGENHARIA']
+SUFIXOS = ['LTDA', 'S/A', 'EIRELI', 'ME', 'EPP', 'LTDA - ME', 'S.A.']
+NOMES_EXCLUIDOS = ['MUNICÍPIO DE {cidade}', 'MUNICIPIO DE {cidade}', 'CONTABILIDADE {palavra}', 'ESCRITÓRIO CONTÁBIL {palavra}',
+                   'MASSA FALIDA DE {palavra}', '{palavra} - EM RECUPERAÇÃO JUDICIAL', '{palavra} EM LIQUIDAÇÃO', 'CONTADORES ASSOCIADOS {palavra}']
+CIDADES = ['PORTO ALEGRE', 'CAXIAS DO SUL', 'PELOTAS', 'CANOAS', 'SANTA MARIA', 'SÃO PAULO', 'CAMPINAS', 'CURITIBA', 'JOINVILLE', 'SALVADOR']
+# Fração dos devedores que são pessoas físicas (CPF) e fração dos nomes com algum termo de exclusão
+FRACAO_CPF = 0.2
+FRACAO_NOMES_EXCLUIDOS = 0.04
+# Fração dos estabelecimentos de pessoa jurídica que são filiais (ordem diferente de 0001)
+FRACAO_FILIAIS = 0.15
+LINHAS_POR_BLOCO_CSV = 100_000
+
+
+def digitos_verificadores_cnpj(base12: np.ndarray) -> np.ndarray:
+    """Calcula os dois dígitos verificadores de um vetor de bases de CNPJ com 12 dígitos."""
+    digitos = np.stack([(base12 // 10 ** (11 - i)) % 10 for i in range(12)], axis=1)
+    pesos1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    pesos2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    resto = (digitos * pesos1).sum(axis=1) % 11
+    dv1 = np.where(resto < 2, 0, 11 - resto)
+    resto = (np.column_stack([digitos, dv1]) * pesos2).sum(axis=1) % 11
+    dv2 = np.where(resto < 2, 0, 11 - resto)
+    return dv1 * 10 + dv2
+
+
+def _formatar(digitos: np.ndarray, largura: int) -> List[str]:
+    """Formata CNPJs (largura 14) como 'XX.XXX.XXX/XXXX-XX' e CPFs (largura 11) como 'XXX.XXX.XXX-XX'."""
+    textos = pd.Series(digitos).astype(str).str.zfill(largura)
+    if largura == 14:
+        return (textos.str[:2] + '.' + textos.str[2:5] + '.' + textos.str[5:8] + '/' + textos.str[8:12] + '-' + textos.str[12:]).tolist()
+    return (textos.str[:3] + '.' + textos.str[3:6] + '.' + textos.str[6:9] + '-' + textos.str[9:]).tolist()
+
+
+def gerar_devedores(quantidade: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Cadastro de devedores distintos: documento formatado, chave numérica, tipo de pessoa, nome e UF."""
+    cpf = rng.random(quantidade) < FRACAO_CPF
+    raizes = rng.choice(10 ** 8, size=quantidade, replace=False)
+    ordens = np.where(rng.random(quantidade) < FRACAO_FILIAIS, rng.integers(2, 60, quantidade), 1)
+    base12 = raizes * 10_000 + ordens
+    cnpjs = base12 * 100 + digitos_verificadores_cnpj(base12)
+    cpfs = rng.integers(10 ** 9, 10 ** 11, quantidade)
+    documentos = np.where(cpf, cpfs, cnpjs)
+    formatados = np.where(cpf, _formatar(cpfs, 11), _formatar(cnpjs, 14))
+
+    palavras = np.array(PALAVRAS, dtype=object)
+    nomes = (pd.Series(palavras[rng.integers(0, len(PALAVRAS), quantidade)]) + ' '
+             + pd.Series(palavras[rng.integers(0, len(PALAVRAS), quantidade)]).str.title() + ' '
+             + pd.Series(np.arange(quantidade)).astype(str) + ' '
+             + pd.Series(np.array(SUFIXOS, dtype=object)[rng.integers(0, len(SUFIXOS), quantidade)]))
+    excluidos = np.flatnonzero(rng.random(quantidade) < FRACAO_NOMES_EXCLUIDOS)
+    for posicao in excluidos:
+        modelo = NOMES_EXCLUIDOS[rng.integers(0, len(NOMES_EXCLUIDOS))]
+        nomes[posicao] = modelo.format(cidade=CIDADES[rng.integers(0, len(CIDADES))], palavra=nomes[posicao])
+    # Uma parte dos nomes vem em caixa mista, como acontece na base
+    caixa_mista = rng.random(quantidade) < 0.05
+    nomes[caixa_mista] = nomes[caixa_mista].str.title()
+
+    ufs = np.array(list(PESOS_UF), dtype=object)
+    pesos = np.array(list(PESOS_UF.values()), dtype=float)
+    return pd.DataFrame({
+        'CPF_CNPJ': formatados,
+        'CHAVE': documentos,
+        'TIPO_PESSOA': np.where(cpf, 'Pessoa física', 'Pessoa jurídica'),
+        'NOME_DEVEDOR': nomes.to_numpy(dtype=object),
+        'UF_DEVEDOR': rng.choice(ufs, size=quantidade, p=pesos / pesos.sum()),
+    })
+
+
+def _bloco_inscricoes(devedores: pd.DataFrame, linhas: int, inicio: int, rng: np.random.Generator) -> pd.DataFrame:
+    # Alguns devedores concentram muitas inscrições (distribuição de Zipf truncada)
+    escolhidos = (rng.zipf(1.3, linhas) - 1) % len(devedores)
+    escolhidos = np.where(rng.random(linhas) < 0.5, escolhidos, rng.integers(0, len(devedores), linhas))
+    bloco = devedores.iloc[escolhidos].reset_index(drop=True)
+    return pd.DataFrame({
+        'CPF_CNPJ': bloco['CPF_CNPJ'],
+        'TIPO_PESSOA': bloco['TIPO_PESSOA'],
+        'TIPO_DEVEDOR': np.where(rng.random(linhas) < 0.9, 'PRINCIPAL', 'CORRESPONSAVEL'),
+        'NOME_DEVEDOR': bloco['NOME_DEVEDOR'],
+        'UF_DEVEDOR': bloco['UF_DEVEDOR'],
+        'UNIDADE_RESPONSAVEL': 'PROCURADORIA-REGIONAL DA FAZENDA NACIONAL',
+        'NUMERO_INSCRICAO': [f"{n:014d}" for n in range(inicio, inicio + linhas)],
+        'TIPO_SITUACAO_INSCRICAO': 'Em cobrança',
+        'SITUACAO_INSCRICAO': np.where(rng.random(linhas) < 0.7, 'ATIVA EM COBRANCA', 'ATIVA AJUIZADA'),
+        'RECEITA_PRINCIPAL': rng.choice(RECEITAS_PRINCIPAIS, size=linhas),
+        'TIPO_CREDITO': 'Contribuição previdenciária',
+        'DATA_INSCRICAO': pd.to_datetime(rng.integers(946684800, 1748736000, linhas), unit='s').strftime('%d/%m/%Y'),
+        'INDICADOR_AJUIZADO': np.where(rng.random(linhas) < 0.4, 'SIM', 'NAO'),
+        'VALOR_CONSOLIDADO': np.round(rng.lognormal(mean=9.5, sigma=1.8, size=linhas), 2),
+    })
+
+
+def gerar_zip_pgfn(destino: str, linhas_por_membro: int, devedores: pd.DataFrame, nomes_membros: Optional[List[str]] = None,
+                   semente: int = 42):
+    """Grava o ZIP com os CSVs em blocos, sem montar nenhum CSV inteiro em memória."""
+    rng = np.random.default_rng(semente)
+    nomes_membros = nomes_membros or NOMES_MEMBROS_PADRAO
+    temporario = destino + ".tmp"
+    with zipfile.ZipFile(temporario, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+        inicio = 0
+        for nome in nomes_membros:
+            with z.open(nome, "w", force_zip64=True) as arquivo:
+                for gravadas in range(0, linhas_por_membro, LINHAS_POR_BLOCO_CSV):
+                    linhas = min(LINHAS_POR_BLOCO_CSV, linhas_por_membro - gravadas)
+                    bloco = _bloco_inscricoes(devedores, linhas, inicio, rng)
+                    inicio += linhas
+                    arquivo.write(bloco.to_csv(sep=';', index=False, header=gravadas == 0).encode('latin-1', errors='replace'))
+    os.replace(temporario, destino)
+
+
+def gerar_painel(destino: str, linhas: int, devedores: pd.DataFrame, semente: int = 42):
+    """
+    Grava um painel de parcelamentos com o cabeçalho na terceira linha, como o export real. A maior parte
+    dos optantes vem da base (para o cruzamento ter resultado) e o restante são CNPJs que não estão nela.
+    """
+    rng = np.random.default_rng(semente + 1)
+    pessoas_juridicas = devedores[devedores['TIPO_PESSOA'] == 'Pessoa jurídica']
+    da_base = pessoas_juridicas.iloc[rng.integers(0, len(pessoas_juridicas), linhas)]['CPF_CNPJ'].to_numpy()
+    base12 = rng.integers(10 ** 11, 10 ** 12, linhas) // 10_000 * 10_000 + 1
+    de_fora = np.array(_formatar(base12 * 100 + digitos_verificadores_cnpj(base12), 14), dtype=object)
+    cnpjs = np.where(rng.random(linhas) < 0.7, da_base, de_fora)
+    situacoes = np.array(['Em dia', 'Em atraso', 'Rescindida', 'Liquidada', 'Suspensa'], dtype=object)
+    modalidades = np.array(['Transação Excepcional', 'Transação Extraordinária', 'Parcelamento Simplificado', 'Parcelamento Convencional'], dtype=object)
+
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("Parcelamentos")
+    aba.append(["Painel dos Parcelamentos"])
+    aba.append([])
+    aba.append(COLUNAS_PAINEL)
+    concedidas = rng.choice([12, 24, 60, 120, 145], size=linhas).tolist()
+    em_atraso = rng.integers(0, 12, linhas).tolist()
+    situacao = situacoes[rng.integers(0, len(situacoes), linhas)]
+    principal = np.round(rng.lognormal(10, 1.5, linhas), 2).tolist()
+    for i in range(linhas):
+        aba.append([
+            cnpjs[i], f"OPTANTE {i}", "Transação" if i % 3 else "Parcelamento", modalidades[i % len(modalidades)],
+            situacao[i], concedidas[i], em_atraso[i],
+            round(principal[i] * 1.6, 2), principal[i], round(principal[i] * 0.2, 2), round(principal[i] * 0.3, 2),
+            None if i % 7 == 0 else round(principal[i] * 0.1, 2), "01/02/2024",
+        ])
+    planilha.save(destino)
+
+
+def gerar_conjunto(pasta: str, escala: str = "pequena", nomes_membros: Optional[List[str]] = None, semente: int = 42) -> Tuple[str, str]:
+    """Gera (ou reaproveita, se já existirem) o ZIP da PGFN e o painel da escala pedida. Retorna os dois caminhos."""
+    linhas_por_membro, quantidade_devedores, linhas_painel = ESCALAS[escala]
+    os.makedirs(pasta, exist_ok=True)
+    caminho_zip = os.path.join(pasta, f"pgfn_{escala}_{semente}.zip")
+    caminho_painel = os.path.join(pasta, f"painel_{escala}_{semente}.xlsx")
+    if os.path.exists(caminho_zip) and os.path.exists(caminho_painel):
+        return caminho_zip, caminho_painel
+
+    print(f"[DADOS] Gerando base sintética '{escala}' ({linhas_por_membro:,} linhas por CSV)...")
+    devedores = gerar_devedores(quantidade_devedores, np.random.default_rng(semente))
+    gerar_zip_pgfn(caminho_zip, linhas_por_membro, devedores, nomes_membros, semente)
+    gerar_painel(caminho_painel, linhas_painel, devedores, semente)
+    return caminho_zip, caminho_painel
+
+
+if __name__ == "__main__":
+    pasta = sys.argv[1] if len(sys.argv) > 1 else "dados_benchmark"
+    escala = sys.argv[2] if len(sys.argv) > 2 else "pequena"
+    for caminho in gerar_conjunto(pasta, escala):
+        print(f"{caminho}: {os.path.getsize(caminho) / 1024 ** 2:.1f} MB")
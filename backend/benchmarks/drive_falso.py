@@ -0,0 +1,128 @@
+"""
+Drive falso local, que implementa só o upload retomável da API do Google Drive (o mesmo protocolo usado por
+app/drive.py): POST /upload/drive/v3/files?uploadType=resumable abre a sessão e os PUTs com Content-Range
+enviam os blocos ou consultam quanto já chegou. Falhas podem ser injetadas para exercitar a retomada.
+
+Uso, a partir da pasta backend:  python -m benchmarks.drive_falso [porta]
+e depois PGFN_DRIVE_ENDPOINT=http://127.0.0.1:<porta> para os scripts enviarem para ele.
+"""
+import re
+import sys
+import json
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+PADRAO_CONTENT_RANGE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+class _Sessao:
+    def __init__(self, nome: str, pastas: List[str], tamanho: int):
+        self.nome, self.pastas, self.tamanho = nome, pastas, tamanho
+        self.conteudo = bytearray()
+
+
+class _Tratador(BaseHTTPRequestHandler):
+    drive: "DriveFalso" = None
+
+    def log_message(self, formato, *argumentos):
+        pass
+
+    def _responder(self, status: int, corpo: bytes = b"", cabecalhos: Dict[str, str] = None):
+        self.send_response(status)
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        endereco = urlparse(self.path)
+        corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if endereco.path != "/upload/drive/v3/files" or parse_qs(endereco.query).get("uploadType") != ["resumable"]:
+            self._responder(404)
+            return
+        if self.drive._falhar("iniciar"):
+            self._responder(503)
+            return
+        metadados = json.loads(corpo or b"{}")
+        id_sessao = uuid.uuid4().hex
+        with self.drive.trava:
+            self.drive.sessoes[id_sessao] = _Sessao(metadados.get("name"), metadados.get("parents", []),
+                                                    int(self.headers.get("X-Upload-Content-Length", -1)))
+        self._responder(200, cabecalhos={"Location": f"http://{self.headers['Host']}/upload/sessao/{id_sessao}"})
+
+    def do_PUT(self):
+        corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        sessao = self.drive.sessoes.get(self.path.rsplit("/", 1)[-1])
+        faixa = PADRAO_CONTENT_RANGE.fullmatch(self.headers.get("Content-Range", ""))
+        if sessao is None:
+            self._responder(404)
+            return
+        if not faixa:
+            self._responder(400)
+            return
+        if corpo and self.drive._falhar("bloco"):
+            # Simula uma queda no meio do bloco: só a metade dele chega ao servidor
+            if int(faixa.group(1)) == len(sessao.conteudo):
+                sessao.conteudo.extend(corpo[:len(corpo) // 2])
+            self._responder(503)
+            return
+        if corpo and int(faixa.group(1)) == len(sessao.conteudo):
+            sessao.conteudo.extend(corpo)
+        if faixa.group(3) != "*" and len(sessao.conteudo) == int(faixa.group(3)):
+            with self.drive.trava:
+                id_arquivo = uuid.uuid4().hex[:16]
+                self.drive.arquivos[id_arquivo] = {"nome": sessao.nome, "pastas": sessao.pastas, "conteudo": bytes(sessao.conteudo)}
+            self._responder(200, json.dumps({"id": id_arquivo}).encode("utf-8"), {"Content-Type": "application/json"})
+            return
+        cabecalhos = {"Range": f"bytes=0-{len(sessao.conteudo) - 1}"} if sessao.conteudo else {}
+        self._responder(308, cabecalhos=cabecalhos)
+
+
+class DriveFalso:
+    """
+    Publica o Drive falso em http://127.0.0.1:<porta> numa thread (porta 0: uma porta livre qualquer).
+    `falhas` diz quantas vezes cada operação ('iniciar' ou 'bloco') deve falhar com 503 antes de funcionar.
+    Os arquivos recebidos ficam em `arquivos` (ID -> nome, pastas e conteúdo).
+    Uso: `with DriveFalso(falhas={"bloco": 2}) as drive: ... drive.endpoint ...`.
+    """
+
+    def __init__(self, porta: int = 0, falhas: Dict[str, int] = None):
+        self.trava = threading.Lock()
+        self.sessoes: Dict[str, _Sessao] = {}
+        self.arquivos: Dict[str, Dict] = {}
+        self.falhas = dict(falhas or {})
+        tratador = type("Tratador", (_Tratador,), {"drive": self})
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", porta), tratador)
+        self._servidor.daemon_threads = True
+        self.endpoint = f"http://127.0.0.1:{self._servidor.server_address[1]}"
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+
+    def _falhar(self, operacao: str) -> bool:
+        with self.trava:
+            if self.falhas.get(operacao, 0) > 0:
+                self.falhas[operacao] -= 1
+                return True
+            return False
+
+    def __enter__(self) -> "DriveFalso":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+if __name__ == "__main__":
+    with DriveFalso(int(sys.argv[1]) if len(sys.argv) > 1 else 8001) as drive:
+        print(f"Drive falso em {drive.endpoint} (Ctrl+C para parar)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            for id_arquivo, arquivo in drive.arquivos.items():
+                print(f"{id_arquivo}: {arquivo['nome']} ({len(arquivo['conteudo'])} bytes) em {arquivo['pastas']}")
@@ -0,0 +1,339 @@
+"""
+Benchmarks de cada fase da pipeline e do fluxo completo pela API, sobre a base sintética gerada por
+benchmarks.dados_sinteticos e servida localmente por benchmarks.servidor no lugar de URL_DADOS_PGFN.
+O resultado (melhor tempo e média de cada medição, volumes, ambiente e commit) vai para um relatório
+JSON; com --comparar, as medições são confrontadas com um relatório anterior e as que ficaram mais
+lentas que a tolerância são apontadas como regressão (código de saída 1).
+
+Uso, a partir da pasta backend:
+    python -m benchmarks.executar [--escala pequena|media|grande] [--repeticoes 3] [--saida relatorio.json]
+                                  [--comparar relatorio_anterior.json] [--sem-api]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import platform
+import argparse
+import itertools
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.dados_sinteticos import ESCALAS, gerar_conjunto
+from benchmarks.servidor import ServidorArquivo
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+PASTA_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+VALOR_MINIMO_PADRAO = 10_000.0
+# Uma medição é regressão quando fica mais lenta que o relatório anterior além desta fração
+TOLERANCIA_REGRESSAO = 0.15
+# ...e quando a diferença absoluta passa disto (medições de milissegundos variam demais para comparar só a fração)
+DIFERENCA_MINIMA_REGRESSAO_SEGUNDOS = 0.05
+TIMEOUT_JOB_API = 30 * 60
+
+
+def _resumir(tempos: List[float]) -> Dict:
+    return {"melhor_segundos": round(min(tempos), 4), "media_segundos": round(sum(tempos) / len(tempos), 4),
+            "execucoes": [round(t, 4) for t in tempos]}
+
+
+def medir(funcao: Callable[[], object], repeticoes: int = 3, preparar: Optional[Callable[[], None]] = None) -> Dict:
+    """Executa `funcao` algumas vezes (chamando `preparar` antes de cada uma, fora do tempo medido)."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _resumir(tempos)
+
+
+def _remover(*caminhos: str):
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            shutil.rmtree(caminho, ignore_errors=True)
+        elif os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def medir_fases(url: str, caminho_painel: str, repeticoes: int, valor_minimo: float, medicoes: Dict, volumes: Dict):
+    """Mede as fases isoladamente, no mesmo processo (os módulos do app só são importados aqui, depois do ambiente configurado)."""
+    from app.cache import caminho_no_cache, obter_arquivo
+    from app.exclusao import obter_filtro
+    from app.exportacao import exportar
+    from app.indice import IndiceLimiar
+    from app.parcelamentos import DIRETORIO_PAINEIS, cruzar_com_parcelamentos, ler_painel, ler_paineis
+    from app.processing import DATASET_PADRAO, COLUNAS_PARA_MANTER_FASE2, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, TERMOS_EXCLUIR, UF_DESEJADA, csvs_do_dataset
+    from app.serializacao import codificar_json, comprimir, tabela_em_colunas, tabela_em_registros
+    from app.snapshot import construir_particoes, diretorio_particoes, obter_snapshot
+
+    print("[BENCHMARK] Download e revalidação do ZIP...")
+    caminho_zip = caminho_no_cache(url)
+    medicoes["download_frio"] = medir(lambda: obter_arquivo(url), repeticoes, preparar=lambda: _remover(caminho_zip, caminho_zip + ".json"))
+    medicoes["download_revalidacao"] = medir(lambda: obter_arquivo(url, ttl=0), repeticoes)
+    volumes["bytes_zip"] = os.path.getsize(caminho_zip)
+
+    print("[BENCHMARK] Partições por UF e índice por valor...")
+    nomes_csv = csvs_do_dataset(caminho_zip, DATASET_PADRAO)
+    destino = diretorio_particoes(caminho_zip, nomes_csv)
+    medicoes["snapshot"] = medir(lambda: construir_particoes(caminho_zip, nomes_csv, destino), repeticoes,
+                                 preparar=lambda: _remover(destino))
+    tabela = obter_snapshot(caminho_zip, nomes_csv, [UF_DESEJADA])
+    filtro = obter_filtro(TERMOS_EXCLUIR)
+    medicoes["indice"] = medir(lambda: IndiceLimiar(tabela, filtro), repeticoes)
+    indice = IndiceLimiar(tabela, filtro)
+    medicoes["totalizar"] = medir(lambda: indice.totalizar(valor_minimo), repeticoes)
+    df_leads = indice.totalizar(valor_minimo)
+    volumes["linhas_snapshot"] = tabela.num_rows
+    volumes["leads"] = len(df_leads)
+
+    print("[BENCHMARK] Leitura do painel e cruzamento...")
+    with open(caminho_painel, "rb") as arquivo:
+        painel = arquivo.read()
+
+    def ler():
+        return ler_painel(painel, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2)
+
+    medicoes["ler_painel_frio"] = medir(ler, repeticoes, preparar=lambda: _remover(DIRETORIO_PAINEIS))
+    medicoes["ler_painel_cache"] = medir(ler, repeticoes)
+    # Quatro painéis lidos em paralelo: com núcleos livres, deve ficar perto do tempo de um só
+    medicoes["ler_4_paineis_frio"] = medir(lambda: ler_paineis([painel] * 4, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2),
+                                           repeticoes, preparar=lambda: _remover(DIRETORIO_PAINEIS))
+    df_parcelamentos = ler()
+    medicoes["cruzar"] = medir(lambda: cruzar_com_parcelamentos(df_leads, df_parcelamentos), repeticoes)
+    df_com, df_sem = cruzar_com_parcelamentos(df_leads, df_parcelamentos)
+    resultado = {"com_parcelamento": df_com, "sem_parcelamento": df_sem}
+    volumes["linhas_painel"] = len(df_parcelamentos)
+    volumes["linhas_com_parcelamento"] = len(df_com)
+    volumes["linhas_sem_parcelamento"] = len(df_sem)
+
+    print("[BENCHMARK] Serialização e exportação...")
+    medicoes["json_registros"] = medir(lambda: codificar_json(tabela_em_registros(df_com)), repeticoes)
+    medicoes["json_colunar"] = medir(lambda: codificar_json(tabela_em_colunas(df_com)), repeticoes)
+    dados = codificar_json(tabela_em_registros(df_com))
+    medicoes["gzip"] = medir(lambda: comprimir(dados, "gzip"), repeticoes)
+    volumes["bytes_json_registros"] = len(dados)
+    numeros = itertools.count()
+    # Cada repetição usa um job_id novo (o nome do arquivo usa os 8 primeiros caracteres), porque a exportação já gerada é reaproveitada
+    medicoes["exportar_xlsx"] = medir(lambda: exportar(f"{next(numeros):08d}-benchmark", resultado, "xlsx"), repeticoes)
+    medicoes["exportar_parquet"] = medir(lambda: exportar(f"{next(numeros):08d}-benchmark", resultado, "parquet", "com_parcelamento"), repeticoes)
+
+
+def _processar_em_processo_novo(valor_minimo: float, caminho_painel: str) -> float:
+    # Executado num processo novo, para que nenhum cache em memória (snapshot, índice, filtro) venha de medições anteriores
+    from app.processing import processar_dados
+    with open(caminho_painel, "rb") as arquivo:
+        painel = arquivo.read()
+    inicio = time.perf_counter()
+    processar_dados(valor_minimo, painel)
+    return time.perf_counter() - inicio
+
+
+def medir_processar_dados(caminho_painel: str, repeticoes: int, valor_minimo: float, medicoes: Dict):
+    """processar_dados de ponta a ponta: sem nada em cache, só com o ZIP em cache e com tudo em cache."""
+    from app.cache import DIRETORIO_CACHE
+    from app.parcelamentos import DIRETORIO_PAINEIS
+    from app.snapshot import DIRETORIO_SNAPSHOTS
+
+    print("[BENCHMARK] processar_dados de ponta a ponta...")
+    contexto = multiprocessing.get_context("spawn")
+
+    def em_processo_novo():
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+            return pool.submit(_processar_em_processo_novo, valor_minimo, caminho_painel).result()
+
+    for nome, limpar in [
+        ("processar_dados_frio", lambda: _remover(os.path.join(DIRETORIO_CACHE, "downloads"), DIRETORIO_SNAPSHOTS, DIRETORIO_PAINEIS)),
+        ("processar_dados_zip_em_cache", lambda: _remover(DIRETORIO_SNAPSHOTS, DIRETORIO_PAINEIS)),
+        ("processar_dados_quente", None),
+    ]:
+        tempos = []
+        for _ in range(repeticoes):
+            if limpar:
+                limpar()
+            tempos.append(em_processo_novo())
+        medicoes[nome] = _resumir(tempos)
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _aguardar_job(base: str, job_id: str) -> Dict:
+    """Acompanha o job pelo stream SSE até o evento final e devolve esse evento."""
+    import requests
+    with requests.get(f"{base}/eventos/{job_id}", stream=True, timeout=TIMEOUT_JOB_API) as resposta:
+        resposta.raise_for_status()
+        for linha in resposta.iter_lines(decode_unicode=True):
+            if linha and linha.startswith("data: "):
+                evento = json.loads(linha[len("data: "):])
+                if evento["etapa"] in ("concluido", "erro", "cancelado"):
+                    return evento
+    raise RuntimeError(f"Stream de eventos do job {job_id} terminou sem evento final.")
+
+
+def medir_api(caminho_painel: str, repeticoes: int, valor_minimo: float, medicoes: Dict, pasta_trabalho: str):
+    """
+    Fluxo completo pela API num uvicorn de verdade (com o pool de processos do agendador): envio, eventos
+    até a conclusão, resultado JSON com gzip e exportação XLSX. O primeiro job encontra o cache vazio.
+    """
+    import requests
+    print("[BENCHMARK] Fluxo completo pela API...")
+    porta = _porta_livre()
+    ambiente = dict(os.environ, PGFN_CACHE_DIR=os.path.join(pasta_trabalho, "cache_api"),
+                    PGFN_JOB_STORE="sqlite:///" + os.path.join(pasta_trabalho, "jobs_api.db"))
+    _remover(ambiente["PGFN_CACHE_DIR"], os.path.join(pasta_trabalho, "jobs_api.db"))
+    base = f"http://127.0.0.1:{porta}"
+    servidor = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta), "--log-level", "warning"],
+                                env=ambiente, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(300):
+            try:
+                requests.get(f"{base}/status/inexistente", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        with open(caminho_painel, "rb") as arquivo:
+            painel = arquivo.read()
+        tempos: Dict[str, List[float]] = {"api_job": [], "api_resultado_gzip": [], "api_exportar_xlsx": []}
+        for repeticao in range(repeticoes + 1):
+            # Valores mínimos diferentes para que o agendador não reaproveite o job anterior
+            valor = valor_minimo + repeticao
+            inicio = time.perf_counter()
+            resposta = requests.post(f"{base}/processar", data={"valor_minimo": valor},
+                                     files={"file": ("painel.xlsx", painel)}, timeout=60)
+            resposta.raise_for_status()
+            job_id = resposta.json()["job_id"]
+            evento = _aguardar_job(base, job_id)
+            if evento["etapa"] != "concluido":
+                raise RuntimeError(f"Job {job_id} terminou com '{evento['etapa']}': {evento.get('erro')}")
+            duracao_job = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            requests.get(f"{base}/resultado/{job_id}", headers={"Accept-Encoding": "gzip"}, timeout=60).raise_for_status()
+            duracao_resultado = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            requests.get(f"{base}/resultado/{job_id}/export", params={"format": "xlsx"}, timeout=600).raise_for_status()
+            duracao_exportacao = time.perf_counter() - inicio
+
+            if repeticao == 0:
+                medicoes["api_job_frio"] = _resumir([duracao_job])
+            else:
+                tempos["api_job"].append(duracao_job)
+            tempos["api_resultado_gzip"].append(duracao_resultado)
+            tempos["api_exportar_xlsx"].append(duracao_exportacao)
+        for nome, valores in tempos.items():
+            medicoes[nome] = _resumir(valores)
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+
+def _commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _ambiente() -> Dict:
+    import numpy
+    import pandas
+    import pyarrow
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "pyarrow": pyarrow.__version__,
+    }
+
+
+def comparar(atual: Dict, anterior: Dict) -> List[str]:
+    """Imprime a variação de cada medição em relação ao relatório anterior e retorna as que regrediram."""
+    if atual["escala"] != anterior.get("escala"):
+        print(f"[BENCHMARK] Atenção: comparando escalas diferentes ({atual['escala']} x {anterior.get('escala')}).")
+    regressoes = []
+    print(f"{'medição':<30} {'anterior':>10} {'atual':>10} {'variação':>10}")
+    for nome, medicao in atual["medicoes"].items():
+        referencia = anterior.get("medicoes", {}).get(nome)
+        if not referencia or not referencia["melhor_segundos"]:
+            print(f"{nome:<30} {'-':>10} {medicao['melhor_segundos']:>10.3f} {'nova':>10}")
+            continue
+        variacao = medicao["melhor_segundos"] / referencia["melhor_segundos"] - 1
+        diferenca = medicao["melhor_segundos"] - referencia["melhor_segundos"]
+        regrediu = variacao > TOLERANCIA_REGRESSAO and diferenca > DIFERENCA_MINIMA_REGRESSAO_SEGUNDOS
+        marcador = "  <- REGRESSÃO" if regrediu else ""
+        print(f"{nome:<30} {referencia['melhor_segundos']:>10.3f} {medicao['melhor_segundos']:>10.3f} {variacao:>+9.0%}{marcador}")
+        if marcador:
+            regressoes.append(nome)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks da pipeline de leads da PGFN sobre uma base sintética.")
+    parser.add_argument("--escala", choices=list(ESCALAS), default="pequena")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--valor-minimo", type=float, default=VALOR_MINIMO_PADRAO)
+    parser.add_argument("--dados", default=PASTA_DADOS, help="Pasta onde a base sintética é gerada (e reaproveitada).")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON do relatório (padrão: benchmark_<escala>_<data>.json).")
+    parser.add_argument("--comparar", default=None, help="Relatório anterior para detectar regressões.")
+    parser.add_argument("--sem-api", action="store_true", help="Não mede o fluxo completo pela API (uvicorn).")
+    argumentos = parser.parse_args()
+
+    caminho_zip, caminho_painel = gerar_conjunto(argumentos.dados, argumentos.escala)
+    pasta_trabalho = os.path.join(argumentos.dados, f"trabalho_{argumentos.escala}")
+    _remover(pasta_trabalho)
+    os.makedirs(pasta_trabalho)
+
+    with ServidorArquivo(caminho_zip) as servidor:
+        # Precisa vir antes de importar os módulos do app, que leem a configuração ao serem carregados
+        os.environ["PGFN_URL_DADOS"] = servidor.url
+        os.environ["PGFN_CACHE_DIR"] = os.path.join(pasta_trabalho, "cache")
+        os.environ["PGFN_JOB_STORE"] = "sqlite:///" + os.path.join(pasta_trabalho, "jobs.db")
+
+        medicoes: Dict[str, Dict] = {}
+        volumes: Dict[str, int] = {}
+        medir_fases(servidor.url, caminho_painel, argumentos.repeticoes, argumentos.valor_minimo, medicoes, volumes)
+        medir_processar_dados(caminho_painel, argumentos.repeticoes, argumentos.valor_minimo, medicoes)
+        if not argumentos.sem_api:
+            medir_api(caminho_painel, argumentos.repeticoes, argumentos.valor_minimo, medicoes, pasta_trabalho)
+
+    relatorio = {
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _commit_atual(),
+        "escala": argumentos.escala,
+        "repeticoes": argumentos.repeticoes,
+        "valor_minimo": argumentos.valor_minimo,
+        "ambiente": _ambiente(),
+        "volumes": volumes,
+        "medicoes": medicoes,
+    }
+    saida = argumentos.saida or f"benchmark_{argumentos.escala}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"[BENCHMARK] Relatório gravado em '{saida}'.")
+
+    for nome, medicao in medicoes.items():
+        print(f"{nome:<30} {medicao['melhor_segundos']:>10.3f} s")
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(relatorio, json.load(arquivo))
+        if regressoes:
+            print(f"[BENCHMARK] Regressões acima de {TOLERANCIA_REGRESSAO:.0%}: {', '.join(regressoes)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Servidor HTTP local que publica um único arquivo (o ZIP sintético da PGFN) no lugar de URL_DADOS_PGFN,
+com os mesmos cabeçalhos de que o cache de downloads depende: ETag, Last-Modified, If-None-Match,
+If-Modified-Since, Range e If-Range.
+
+Uso, a partir da pasta backend:  python -m benchmarks.servidor <arquivo> [porta]
+"""
+import os
+import sys
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+# --- CONSTANTES DE CONFIGURAÇÃO ---
+TAMANHO_BLOCO_ENVIO = 1024 * 1024
+
+
+def _etag(caminho: str) -> str:
+    estado = os.stat(caminho)
+    return f'"{estado.st_size:x}-{estado.st_mtime_ns:x}"'
+
+
+def _intervalo(cabecalho: Optional[str], tamanho: int) -> Optional[Tuple[int, int]]:
+    """Interpreta 'bytes=inicio-[fim]' (um único intervalo, que é o que o cliente de download pede)."""
+    if not cabecalho or not cabecalho.startswith("bytes=") or "," in cabecalho:
+        return None
+    inicio, _, fim = cabecalho[len("bytes="):].partition("-")
+    if not inicio:
+        return None
+    inicio, fim = int(inicio), min(int(fim), tamanho - 1) if fim else tamanho - 1
+    return (inicio, fim) if inicio <= fim else None
+
+
+class _Tratador(BaseHTTPRequestHandler):
+    caminho_arquivo = ""
+    nome_publicado = ""
+
+    def log_message(self, formato, *argumentos):
+        pass
+
+    def do_HEAD(self):
+        self._responder(enviar_corpo=False)
+
+    def do_GET(self):
+        self._responder(enviar_corpo=True)
+
+    def _responder(self, enviar_corpo: bool):
+        if self.path.split("?", 1)[0].lstrip("/") != self.nome_publicado:
+            self.send_error(404)
+            return
+        tamanho = os.path.getsize(self.caminho_arquivo)
+        etag = _etag(self.caminho_arquivo)
+        modificado = os.path.getmtime(self.caminho_arquivo)
+        ultima_modificacao = formatdate(modificado, usegmt=True)
+
+        if self.headers.get("If-None-Match") == etag or self._nao_modificado_desde(modificado):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        intervalo = _intervalo(self.headers.get("Range"), tamanho)
+        if_range = self.headers.get("If-Range")
+        if intervalo and if_range and if_range not in (etag, ultima_modificacao):
+            # O arquivo mudou desde o download parcial: manda o arquivo inteiro
+            intervalo = None
+
+        inicio, fim = intervalo or (0, tamanho - 1)
+        self.send_response(206 if intervalo else 200)
+        if intervalo:
+            self.send_header("Content-Range", f"bytes {inicio}-{fim}/{tamanho}")
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(fim - inicio + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", ultima_modificacao)
+        self.end_headers()
+        if not enviar_corpo:
+            return
+        with open(self.caminho_arquivo, "rb") as arquivo:
+            arquivo.seek(inicio)
+            restante = fim - inicio + 1
+            while restante > 0:
+                bloco = arquivo.read(min(TAMANHO_BLOCO_ENVIO, restante))
+                if not bloco:
+                    break
+                self.wfile.write(bloco)
+                restante -= len(bloco)
+
+    def _nao_modificado_desde(self, modificado: float) -> bool:
+        cabecalho = self.headers.get("If-Modified-Since")
+        if not cabecalho or self.headers.get("If-None-Match"):
+            return False
+        try:
+            return int(modificado) <= parsedate_to_datetime(cabecalho).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+class ServidorArquivo:
+    """
+    Publica `caminho` em http://127.0.0.1:<porta>/<nome do arquivo> numa thread. Com porta 0 o sistema
+    escolhe uma porta livre. Uso: `with ServidorArquivo(caminho_zip) as servidor: ... servidor.url ...`.
+    """
+
+    def __init__(self, caminho: str, porta: int = 0):
+        tratador = type("Tratador", (_Tratador,), {"caminho_arquivo": caminho, "nome_publicado": os.path.basename(caminho)})
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", porta), tratador)
+        self._servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._servidor.server_address[1]}/{os.path.basename(caminho)}"
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+
+    def __enter__(self) -> "ServidorArquivo":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+if __name__ == "__main__":
+    with ServidorArquivo(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 8000) as servidor:
+        print(f"Servindo {servidor.url} (Ctrl+C para parar)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+# O cache e o armazenamento de jobs são lidos do ambiente na importação dos módulos de app:
+# os testes usam uma pasta temporária e o armazenamento em memória, sem tocar no cache real.
+os.environ.setdefault("PGFN_CACHE_DIR", tempfile.mkdtemp(prefix="pgfn_testes_"))
+os.environ.setdefault("PGFN_JOB_STORE", "memoria")
+
+import numpy as np
+import pytest
+
+from benchmarks.dados_sinteticos import gerar_devedores, gerar_zip_pgfn
+
+# Base sintética pequena o bastante para a suíte, com os mesmos formatos da base real
+LINHAS_POR_MEMBRO_TESTES = 3_000
+DEVEDORES_TESTES = 1_500
+MEMBROS_TESTES = [f"arquivo_lai_PREV_{n}_202506.csv" for n in (1, 2, 10)]
+
+
+@pytest.fixture(scope="session")
+def zip_pgfn(tmp_path_factory) -> str:
+    """ZIP sintético no formato dos dados abertos da PGFN, gerado uma vez por execução da suíte."""
+    caminho = str(tmp_path_factory.mktemp("pgfn") / "Dados_abertos_Previdenciario.zip")
+    devedores = gerar_devedores(DEVEDORES_TESTES, np.random.default_rng(7))
+    gerar_zip_pgfn(caminho, LINHAS_POR_MEMBRO_TESTES, devedores, MEMBROS_TESTES, semente=7)
+    return caminho
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import agendador as modulo_agendador
+from app.agendador import Agendador
+from app.jobs import MemoriaJobStore
+
+
+class PoolFalso:
+    """Pool que registra os envios e os desligamentos; `quebrado` simula um worker morto."""
+
+    def __init__(self, quebrado: bool = False):
+        self.quebrado = quebrado
+        self.envios = []
+        self.desligamentos = []
+
+    def submit(self, funcao, *argumentos):
+        if self.quebrado:
+            raise BrokenProcessPool("um processo do pool morreu")
+        self.envios.append(funcao)
+        return Future()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.desligamentos.append((wait, cancel_futures))
+
+
+@pytest.fixture
+def agendador(monkeypatch):
+    """Agendador com os threads e o gerenciador reais, mas com pools falsos no lugar dos processos."""
+    pools = []
+    monkeypatch.setattr(modulo_agendador, "ProcessPoolExecutor", lambda **k: pools.append(PoolFalso()) or pools[-1])
+    instancia = Agendador(MemoriaJobStore(), maximo_simultaneos=1)
+    instancia._iniciar()
+    instancia.pools = pools
+    yield instancia
+    instancia.encerrar()
+
+
+def _submeter(agendador: Agendador, valor_minimo: float):
+    return agendador.submeter(valor_minimo, ["/nao/usado.xlsx"], hashes=["00" * 32])
+
+
+def test_pool_quebrado_e_desligado_e_trocado(agendador):
+    quebrado = agendador.pools[0]
+    quebrado.quebrado = True
+    job_id, _ = _submeter(agendador, 1000.0)
+    assert quebrado.desligamentos == [(False, True)]
+    assert agendador._pool is agendador.pools[1] and len(agendador._pool.envios) == 1
+    assert agendador.jobs.obter(job_id)["status"] == "processando"
+
+
+def test_job_que_nao_inicia_nem_no_pool_novo_vira_erro(agendador, monkeypatch):
+    agendador.pools[0].quebrado = True
+    monkeypatch.setattr(modulo_agendador, "ProcessPoolExecutor", lambda **k: agendador.pools.append(PoolFalso(quebrado=True)) or agendador.pools[-1])
+    job_id, reaproveitado = _submeter(agendador, 1000.0)
+    job = agendador.jobs.obter(job_id)
+    assert not reaproveitado and job["status"] == "erro" and "iniciar" in job["erro"]
+    assert job_id not in agendador._em_execucao
+
+    # O pool novo volta a funcionar: o próximo job é despachado normalmente
+    agendador.pools[-1].quebrado = False
+    outro_id, _ = _submeter(agendador, 2000.0)
+    assert agendador.jobs.obter(outro_id)["status"] == "processando"
+
+
+def test_metricas_de_job_que_falhou_sao_guardadas(agendador):
+    job_id, _ = _submeter(agendador, 1000.0)
+    futuro = agendador._em_execucao[job_id]
+    excecao = ValueError("painel sem a coluna do CNPJ")
+    excecao.metricas = [{"etapa": "lendo_painel", "linhas_entrada": None, "linhas_saida": None, "erro": True,
+                         "duracao_segundos": 0.2, "cpu_segundos": 0.1, "pico_rss_bytes": 0}]
+    futuro.set_exception(excecao)  # o finalizador recebe o future pelo callback, como no pool real
+    limite = time.monotonic() + 10
+    while agendador.jobs.obter(job_id)["status"] == "processando" and time.monotonic() < limite:
+        time.sleep(0.01)
+    job = agendador.jobs.obter(job_id)
+    assert job["status"] == "erro" and job["metricas"] == excecao.metricas
+    assert agendador.jobs.metricas_agregadas()["lendo_painel"]["execucoes"] == 1
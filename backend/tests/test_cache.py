@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from app import cache
+from benchmarks import servidor
+from benchmarks.servidor import ServidorArquivo
+
+
+@pytest.fixture
+def arquivo(tmp_path, monkeypatch) -> str:
+    monkeypatch.setattr(cache, "DIRETORIO_CACHE", str(tmp_path / "cache"))
+    caminho = tmp_path / "origem" / "Dados_abertos_Previdenciario.zip"
+    caminho.parent.mkdir()
+    caminho.write_bytes(os.urandom(300_000))
+    return str(caminho)
+
+
+def _conteudo(caminho: str) -> bytes:
+    with open(caminho, "rb") as f:
+        return f.read()
+
+
+def _download_interrompido(url: str, bytes_recebidos: bytes):
+    """Deixa no cache um .part como o de um download que caiu depois de `bytes_recebidos`."""
+    parcial = cache.caminho_no_cache(url) + ".part"
+    os.makedirs(os.path.dirname(parcial), exist_ok=True)
+    with open(parcial, "wb") as f:
+        f.write(bytes_recebidos)
+    return parcial
+
+
+def test_baixa_uma_vez_e_depois_revalida(arquivo, monkeypatch):
+    with ServidorArquivo(arquivo) as publicado:
+        local = cache.obter_arquivo(publicado.url)
+        assert _conteudo(local) == _conteudo(arquivo)
+        metadados = cache.ler_metadados(local)
+        assert metadados["etag"] and metadados["tamanho"] == os.path.getsize(arquivo)
+
+        baixar = cache.baixar_arquivo
+        respostas = []
+        monkeypatch.setattr(cache, "baixar_arquivo", lambda *a, **k: respostas.append(baixar(*a, **k)) or respostas[-1])
+        assert cache.obter_arquivo(publicado.url) == local
+        assert respostas == [None]  # 304: nada foi baixado de novo
+
+
+def test_dentro_do_ttl_nem_consulta_o_servidor(arquivo):
+    with ServidorArquivo(arquivo) as publicado:
+        local = cache.obter_arquivo(publicado.url)
+        url = publicado.url
+    # Com o servidor fora do ar, a cópia local ainda é usada
+    assert cache.obter_arquivo(url, ttl=3600) == local
+
+
+def test_retoma_download_interrompido(arquivo):
+    with ServidorArquivo(arquivo) as publicado:
+        cache.obter_arquivo(publicado.url)
+        local = cache.caminho_no_cache(publicado.url)
+        metadados = cache.ler_metadados(local)
+        os.remove(local)
+        os.remove(local + ".json")
+
+        parcial = _download_interrompido(publicado.url, _conteudo(arquivo)[:100_000])
+        cache._gravar_metadados(parcial, {"etag": metadados["etag"], "last_modified": metadados["last_modified"]})
+        progresso = []
+        cache.obter_arquivo(publicado.url, progresso=lambda baixados, total: progresso.append(baixados))
+    assert _conteudo(local) == _conteudo(arquivo)
+    assert progresso[0] > 100_000 and not os.path.exists(parcial)
+
+
+def test_intervalo_diferente_do_pedido_descarta_o_parcial(arquivo, monkeypatch):
+    # Servidor que responde 206 com um intervalo que começa antes do pedido
+    intervalo = servidor._intervalo
+    monkeypatch.setattr(servidor, "_intervalo", lambda cabecalho, tamanho: intervalo(cabecalho, tamanho) and (10_000, tamanho - 1))
+    with ServidorArquivo(arquivo) as publicado:
+        parcial = _download_interrompido(publicado.url, b"x" * 50_000)
+        cache._gravar_metadados(parcial, {"etag": servidor._etag(arquivo), "last_modified": None})
+        local = cache.obter_arquivo(publicado.url)
+    assert _conteudo(local) == _conteudo(arquivo)
+    assert cache.ler_metadados(local)["tamanho"] == os.path.getsize(arquivo)
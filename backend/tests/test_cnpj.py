@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from app.cnpj import CNPJ_INVALIDO, digitos_verificadores_validos, e_matriz, formatar_cnpj, normalizar_cnpj
+
+# CNPJs com dígitos verificadores válidos
+CNPJ = 12345678000195
+CNPJ_COM_ZEROS = 191  # 00.000.000/0001-91
+
+
+def test_cnpj_com_mascara_e_so_digitos():
+    valores = pd.Series(['12.345.678/0001-95', '12345678000195', ' 12345678000195 ', '12345678000195.0'])
+    assert normalizar_cnpj(valores).tolist() == [CNPJ] * 4
+
+
+def test_cnpj_numerico_do_excel_recupera_os_zeros():
+    valores = pd.Series([12345678000195.0, 191.0])
+    chaves = normalizar_cnpj(valores)
+    assert chaves.tolist() == [CNPJ, CNPJ_COM_ZEROS]
+    assert formatar_cnpj(chaves).tolist() == ['12.345.678/0001-95', '00.000.000/0001-91']
+
+
+def test_cpf_com_mascara_e_descartado():
+    chaves = normalizar_cnpj(pd.Series(['123.450.001-12', '123.456.789-09']))
+    assert (chaves == CNPJ_INVALIDO).all()
+    assert not e_matriz(chaves).any()
+
+
+def test_onze_digitos_sao_tratados_como_cpf():
+    assert normalizar_cnpj(pd.Series(['12345000112'])).tolist() == [CNPJ_INVALIDO]
+    assert normalizar_cnpj(pd.Series([12345000112.0])).tolist() == [CNPJ_INVALIDO]
+
+
+def test_numero_curto_so_com_digitos_verificadores_validos():
+    valores = pd.Series([191.0, 192.0, 9.0])
+    assert normalizar_cnpj(valores).tolist() == [CNPJ_COM_ZEROS, CNPJ_INVALIDO, CNPJ_INVALIDO]
+    assert normalizar_cnpj(pd.Series(['191', '192'])).tolist() == [CNPJ_COM_ZEROS, CNPJ_INVALIDO]
+
+
+def test_doze_ou_treze_digitos_sem_mascara_sao_cnpj():
+    assert normalizar_cnpj(pd.Series(['1234567800019'])).tolist() == [1234567800019]
+    assert normalizar_cnpj(pd.Series([1234567800019.0])).tolist() == [1234567800019]
+
+
+def test_mascara_incompleta_e_descartada():
+    assert normalizar_cnpj(pd.Series(['2.345.678/0001-95'])).tolist() == [CNPJ_INVALIDO]
+
+
+def test_valores_invalidos():
+    texto = pd.Series([None, '', 'abc', '123456789012345'], dtype=object)
+    assert (normalizar_cnpj(texto) == CNPJ_INVALIDO).all()
+    numeros = pd.Series([np.nan, -5.0, 0.0, 1e15])
+    assert (normalizar_cnpj(numeros) == CNPJ_INVALIDO).all()
+
+
+def test_somente_cnpj_completo():
+    valores = pd.Series(['12.345.678/0001-95', '191', '123.456.789-09'])
+    assert normalizar_cnpj(valores, somente_cnpj_completo=True).tolist() == [CNPJ, CNPJ_INVALIDO, CNPJ_INVALIDO]
+
+
+def test_digitos_verificadores():
+    assert digitos_verificadores_validos(np.array([CNPJ, CNPJ_COM_ZEROS, CNPJ + 1])).tolist() == [True, True, False]
@@ -0,0 +1,150 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.consultas import Filtro, TabelaConsultavel, consultar, interpretar_filtro
+
+SITUACAO, ATRASO = 'Situação da Negociação', 'Qtde de Parcelas em Atraso'
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'CPF_CNPJ': ['01', '01', '02', '03', '04', '05'],
+        'VALOR_TOTAL_DIVIDA': [500.0, 500.0, 300.0, np.nan, 900.0, 300.0],
+        SITUACAO: ['Rescindida', 'Em dia', 'RESCINDIDA', 'Em atraso', None, 'Suspensa'],
+        ATRASO: [5, 0, 2, 7, 4, 1],
+    })
+
+
+def test_interpretar_filtro():
+    assert interpretar_filtro(f'{ATRASO}:gt:3') == Filtro(ATRASO, 'gt', '3')
+    # O valor pode conter ':'
+    assert interpretar_filtro('Nome:eq:A:B') == Filtro('Nome', 'eq', 'A:B')
+    for invalido in ('abc', 'coluna:maior:3', 'coluna:gt'):
+        with pytest.raises(ValueError):
+            interpretar_filtro(invalido)
+
+
+def test_filtros_numericos_e_de_texto(df):
+    tabela = TabelaConsultavel(df)
+    assert tabela.filtrar([Filtro(ATRASO, 'gt', '3')]).tolist() == [0, 3, 4]
+    assert tabela.filtrar([Filtro(ATRASO, 'le', '1,5')]).tolist() == [1, 5]
+    # Texto: sem diferenciar maiúsculas e acentos; nulos nunca passam em eq/contem
+    assert tabela.filtrar([Filtro(SITUACAO, 'eq', 'rescindida')]).tolist() == [0, 2]
+    assert tabela.filtrar([Filtro(SITUACAO, 'contem', 'RESCIND')]).tolist() == [0, 2]
+    assert tabela.filtrar([Filtro(SITUACAO, 'em', 'em dia|suspensa')]).tolist() == [1, 5]
+    assert tabela.filtrar([Filtro(SITUACAO, 'ne', 'Rescindida')]).tolist() == [1, 3, 4, 5]
+    # Vários filtros se combinam com E
+    assert tabela.filtrar([Filtro(SITUACAO, 'contem', 'rescind'), Filtro(ATRASO, 'gt', '3')]).tolist() == [0]
+
+
+def test_top_k(df):
+    tabela = TabelaConsultavel(df)
+    linhas = tabela.filtrar([])
+    # Empates mantêm a ordem original e nulos ficam por último nos dois sentidos
+    assert tabela.top(linhas, 'VALOR_TOTAL_DIVIDA', 3).tolist() == [4, 0, 1]
+    assert tabela.top(linhas, 'VALOR_TOTAL_DIVIDA', 2, decrescente=False).tolist() == [2, 5]
+    assert tabela.top(linhas, 'VALOR_TOTAL_DIVIDA', 10).tolist() == [4, 0, 1, 2, 5, 3]
+    assert tabela.top(linhas, 'VALOR_TOTAL_DIVIDA', 10, decrescente=False).tolist() == [2, 5, 0, 1, 4, 3]
+
+
+def test_top_k_confere_com_ordenacao_completa():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'VALOR_TOTAL_DIVIDA': rng.integers(0, 50, 1_000).astype(float)})
+    tabela = TabelaConsultavel(df)
+    esperado = df['VALOR_TOTAL_DIVIDA'].sort_values(ascending=False, kind='stable').index[:37].tolist()
+    assert tabela.top(tabela.filtrar([]), 'VALOR_TOTAL_DIVIDA', 37).tolist() == esperado
+
+
+def test_agrupar(df):
+    tabela = TabelaConsultavel(df)
+    grupos = tabela.agrupar(tabela.filtrar([]), SITUACAO, ['VALOR_TOTAL_DIVIDA'])
+    por_situacao = {linha[SITUACAO]: linha for linha in grupos.dropna(subset=[SITUACAO]).to_dict('records')}
+    assert sum(grupos['linhas']) == len(df)
+    assert por_situacao['Rescindida']['linhas'] == 1
+    # Os nulos formam um grupo próprio
+    assert grupos[grupos[SITUACAO].isna()]['soma_VALOR_TOTAL_DIVIDA'].tolist() == [900.0]
+    assert por_situacao['Em atraso']['soma_VALOR_TOTAL_DIVIDA'] == 0.0
+
+    por_cnpj = tabela.agrupar(tabela.filtrar([]), 'CPF_CNPJ', [])
+    assert por_cnpj.iloc[0].to_dict() == {'CPF_CNPJ': '01', 'linhas': 2, 'cnpjs': 1}
+
+
+def test_agrupar_nao_conta_cnpj_nulo_como_distinto(df):
+    df = pd.concat([df, pd.DataFrame({'CPF_CNPJ': [None, None], 'VALOR_TOTAL_DIVIDA': [10.0, 20.0],
+                                      SITUACAO: ['Em dia', 'Em dia'], ATRASO: [0, 0]})], ignore_index=True)
+    tabela = TabelaConsultavel(df)
+    grupos = tabela.agrupar(tabela.filtrar([]), SITUACAO, []).set_index(SITUACAO, drop=False)
+    assert grupos.loc['Em dia', 'linhas'] == 3 and grupos.loc['Em dia', 'cnpjs'] == 1
+    por_cnpj = tabela.agrupar(tabela.filtrar([]), 'CPF_CNPJ', [])
+    assert por_cnpj[por_cnpj['CPF_CNPJ'].isna()][['linhas', 'cnpjs']].values.tolist() == [[2, 0]]
+
+
+def test_consultar(df):
+    tabela = TabelaConsultavel(df)
+    resposta, total = consultar(tabela, [Filtro(ATRASO, 'ge', '1')], top=2, colunas=['CPF_CNPJ'])
+    assert total == 5 and resposta['CPF_CNPJ'].tolist() == ['04', '01']
+    resposta, total = consultar(tabela, offset=4, limite=10)
+    assert total == 6 and len(resposta) == 2
+    resposta, total = consultar(tabela, [Filtro(SITUACAO, 'contem', 'rescind')], agrupar='CPF_CNPJ', somar=[ATRASO])
+    assert total == 2 and resposta['soma_' + ATRASO].tolist() == [5.0, 2.0]
+
+
+def test_erros_de_consulta(df):
+    tabela = TabelaConsultavel(df)
+    with pytest.raises(ValueError, match='inexistentes'):
+        tabela.filtrar([Filtro('X', 'eq', '1')])
+    with pytest.raises(ValueError, match='precisa de um número'):
+        tabela.filtrar([Filtro(ATRASO, 'gt', 'muitas')])
+    with pytest.raises(ValueError, match='não é numérica'):
+        tabela.top(tabela.filtrar([]), SITUACAO, 3)
+    with pytest.raises(ValueError, match='inexistentes'):
+        consultar(tabela, colunas=['X'])
+
+
+@pytest.fixture
+def cliente_com_job(df):
+    from app.main import app, jobs
+    job_id = str(uuid.uuid4())
+    jobs.criar(job_id, status="concluido")
+    jobs.gravar_resultado(job_id, {"com_parcelamento": df, "sem_parcelamento": df.iloc[:0]})
+    return TestClient(app), job_id
+
+
+def test_rota_de_consulta(cliente_com_job):
+    cliente, job_id = cliente_com_job
+    resposta = cliente.get(f"/resultado/{job_id}/query", params={"filtro": [f"{SITUACAO}:contem:rescind"], "top": 1})
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["total"] == 2 and [r["CPF_CNPJ"] for r in corpo["registros"]] == ["01"]
+
+    resposta = cliente.get(f"/resultado/{job_id}/query", params={"agrupar": SITUACAO, "formato": "colunar"})
+    assert resposta.status_code == 200 and "grupos" in resposta.json()
+
+    etag = resposta.headers["etag"]
+    repetida = cliente.get(f"/resultado/{job_id}/query", params={"agrupar": SITUACAO, "formato": "colunar"},
+                           headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+
+
+@pytest.mark.parametrize("parametros, status", [
+    ({"filtro": "X:gt:1"}, 400),
+    ({"filtro": "sem_operador"}, 400),
+    ({"filtro": f"{ATRASO}:gt:muitas"}, 400),
+    ({"ordenar": SITUACAO, "top": 3}, 400),
+    ({"formato": "xml"}, 400),
+    ({"particao": "outra"}, 404),
+    ({"top": 0}, 422),
+])
+def test_rota_de_consulta_com_erros(cliente_com_job, parametros, status):
+    cliente, job_id = cliente_com_job
+    assert cliente.get(f"/resultado/{job_id}/query", params=parametros).status_code == status
+
+
+def test_rota_de_consulta_sem_job():
+    from app.main import app
+    assert TestClient(app).get(f"/resultado/{uuid.uuid4()}/query").status_code == 404
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import delta
+from app.delta import comparar_trimestres, url_trimestre_anterior
+
+
+def _agregado(linhas):
+    return pd.DataFrame(linhas, columns=['CPF_CNPJ', 'NOME_DEVEDOR', 'UF_DEVEDOR', 'VALOR_TOTAL_DIVIDA'])
+
+
+def test_comparar_trimestres():
+    anterior = _agregado([(1, 'A', 'RS', 100.0), (2, 'B', 'RS', 200.0), (3, 'C', 'RS', 300.0),
+                          (4, 'D', 'RS', 400.0), (5, 'E', 'RS', 500.0)])
+    atual = _agregado([(1, 'A', 'RS', 100.0), (2, 'B', 'RS', 250.0), (3, 'C', 'RS', 280.0),
+                       (4, 'D LTDA', 'RS', 400.0), (6, 'F', 'SC', 600.0)])
+    delta = comparar_trimestres(atual, anterior).set_index('CPF_CNPJ')
+
+    assert delta['SITUACAO_DELTA'].to_dict() == {2: 'AUMENTOU', 3: 'REDUZIU', 4: 'ALTERADO', 6: 'NOVO', 5: 'SAIU'}
+    assert delta.loc[2, 'VALOR_TOTAL_DIVIDA_ANTERIOR'] == 200.0
+    assert pd.isna(delta.loc[6, 'VALOR_TOTAL_DIVIDA_ANTERIOR'])
+    # Quem saiu aparece com os dados do trimestre anterior e sem valor atual
+    assert delta.loc[5, 'NOME_DEVEDOR'] == 'E' and pd.isna(delta.loc[5, 'VALOR_TOTAL_DIVIDA'])
+    assert list(delta.reset_index().columns) == list(atual.columns) + ['VALOR_TOTAL_DIVIDA_ANTERIOR', 'SITUACAO_DELTA']
+
+
+def test_trimestres_iguais_nao_tem_mudancas():
+    agregado = _agregado([(1, 'A', 'RS', 100.0), (2, 'B', 'RS', 200.0)])
+    assert comparar_trimestres(agregado, agregado.copy()).empty
+
+
+def test_url_trimestre_anterior():
+    assert url_trimestre_anterior("https://x/2025_trimestre_02/Dados.zip") == "https://x/2025_trimestre_01/Dados.zip"
+    assert url_trimestre_anterior("https://x/2025_trimestre_01/Dados.zip") == "https://x/2024_trimestre_04/Dados.zip"
+    with pytest.raises(ValueError):
+        url_trimestre_anterior("https://x/dados.zip")
+
+
+def test_hashes_que_so_diferem_alem_da_precisao_do_float64(monkeypatch):
+    # 2**63 e 2**63 + 1 viram o mesmo float64 quando o merge externo (com um lead novo) introduz nulos
+    hashes = iter([np.array([2 ** 63, 7, 9], dtype='uint64'), np.array([2 ** 63 + 1, 7], dtype='uint64')])
+    monkeypatch.setattr(delta, "hash_das_linhas", lambda df: next(hashes))
+    anterior = _agregado([(1, 'A', 'RS', 100.0), (2, 'B', 'RS', 200.0)])
+    atual = _agregado([(1, 'A', 'RS', 100.0), (2, 'B', 'RS', 200.0), (3, 'C', 'RS', 300.0)])
+    assert comparar_trimestres(atual, anterior)['CPF_CNPJ'].tolist() == [1, 3]
@@ -0,0 +1,88 @@
+import functools
+import os
+
+import numpy as np
+import pytest
+from openpyxl import load_workbook
+
+from app import cli, drive
+from app.drive import ErroDrive, FilaDeUploads, enviar_arquivo
+from benchmarks.dados_sinteticos import gerar_devedores, gerar_painel
+from benchmarks.drive_falso import DriveFalso
+
+# Múltiplo de 256 KB, como o Drive exige, mas pequeno para o arquivo de teste ir em vários blocos
+BLOCO_TESTE = 256 * 1024
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(drive, "_esperar", lambda tentativa: None)
+
+
+@pytest.fixture
+def arquivo(tmp_path) -> str:
+    caminho = tmp_path / "relatorio.xlsx"
+    caminho.write_bytes(os.urandom(3 * BLOCO_TESTE + 1000))
+    return str(caminho)
+
+
+def _conteudo(caminho: str) -> bytes:
+    with open(caminho, "rb") as f:
+        return f.read()
+
+
+def test_upload_retomavel_continua_de_onde_parou(arquivo):
+    with DriveFalso(falhas={"iniciar": 1, "bloco": 2}) as falso:
+        enviados = []
+        id_arquivo = enviar_arquivo(arquivo, "pasta", endpoint=falso.endpoint, tamanho_bloco=BLOCO_TESTE,
+                                    progresso=lambda enviados_ate_agora, total: enviados.append(enviados_ate_agora))
+    criado = falso.arquivos[id_arquivo]
+    assert criado["conteudo"] == _conteudo(arquivo)
+    assert criado["nome"] == "relatorio.xlsx" and criado["pastas"] == ["pasta"]
+    # O bloco que caiu pela metade foi retomado do último byte confirmado, sem recomeçar o arquivo
+    assert enviados[0] == BLOCO_TESTE // 2 and enviados == sorted(enviados)
+
+
+def test_upload_desiste_depois_das_tentativas(arquivo):
+    with DriveFalso(falhas={"iniciar": drive.TENTATIVAS_UPLOAD_DRIVE + 1}) as falso:
+        with pytest.raises(ErroDrive, match="tentativas"):
+            enviar_arquivo(arquivo, "pasta", endpoint=falso.endpoint, tamanho_bloco=BLOCO_TESTE)
+    assert falso.arquivos == {}
+
+
+def test_fila_envia_em_paralelo_e_relata_falhas(arquivo, tmp_path):
+    with DriveFalso() as falso:
+        with FilaDeUploads("pasta", endpoint=falso.endpoint, workers=2) as fila:
+            fila.enviar(arquivo)
+            fila.enviar(arquivo, nome="copia.xlsx")
+            fila.enviar(str(tmp_path / "nao_existe.xlsx"))
+        resultados = fila.aguardar()
+    assert resultados["nao_existe.xlsx"] is None
+    assert {falso.arquivos[resultados[nome]]["nome"] for nome in ("relatorio.xlsx", "copia.xlsx")} == {"relatorio.xlsx", "copia.xlsx"}
+
+
+def test_cli_envia_os_relatorios_para_o_drive(tmp_path, monkeypatch):
+    devedores = gerar_devedores(400, np.random.default_rng(5))
+    painel = str(tmp_path / "painel do RS.xlsx")
+    gerar_painel(painel, 200, devedores)
+    leads = devedores[['CPF_CNPJ', 'NOME_DEVEDOR', 'UF_DEVEDOR']].assign(VALOR_TOTAL_DIVIDA=1000.0)
+    leads.to_excel(str(tmp_path / "leads.xlsx"), index=False)
+
+    with DriveFalso(falhas={"bloco": 1}) as falso:
+        monkeypatch.setattr(cli, "FilaDeUploads", functools.partial(FilaDeUploads, endpoint=falso.endpoint))
+        codigo = cli.main(["--leads", str(tmp_path / "leads.xlsx"), "--paineis", painel, "--pasta-saida", str(tmp_path / "saida"),
+                           "--drive-pasta", "pasta"])
+    assert codigo == 0
+    enviado, = falso.arquivos.values()
+    local = tmp_path / "saida" / cli.NOME_RELATORIO_FINAL.format(conjunto="previdenciario")
+    assert enviado["nome"] == local.name and enviado["conteudo"] == local.read_bytes()
+    assert load_workbook(str(local), read_only=True).sheetnames
+
+
+def test_cli_sem_google_auth_falha_antes_de_processar(monkeypatch, capsys):
+    monkeypatch.setattr(cli, "GOOGLE_AUTH_DISPONIVEL", False)
+    with pytest.raises(SystemExit) as saida:
+        cli.ler_argumentos(["--valor-minimo", "1000", "--drive-pasta", "pasta", "--drive-credenciais", "conta.json"])
+    assert saida.value.code == 2 and "google-auth" in capsys.readouterr().err
+    # Sem credenciais (Drive falso local) o pacote não é necessário
+    assert cli.ler_argumentos(["--valor-minimo", "1000", "--drive-pasta", "pasta"]).drive_pasta == "pasta"
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from app import exclusao
+from app.exclusao import FiltroExclusao, normalizar_nome, normalizar_nomes, obter_filtro
+
+TERMOS = ['MUNICÍPIO', 'MUNICIPIO', 'CONTABILIDADE', 'CONTÁBIL', 'MASSA FALIDA', 'FALIDA', 'EM LIQUIDAÇÃO']
+NOMES = ['Município de Porto Alegre', 'ESCRITORIO CONTABIL LTDA', 'Massa Falida de X', 'Comércio de Calçados LTDA',
+         None, 'Indústria Em Liquidacao', 'ALIMENTOS SUL LTDA', 'município de porto alegre']
+ESPERADO = [True, True, True, False, False, True, False, True]
+
+
+def test_termos_normalizados_e_sem_redundancia():
+    assert normalizar_nome('Falência') == 'FALENCIA'
+    assert FiltroExclusao(TERMOS).termos == ['CONTABIL', 'EM LIQUIDACAO', 'FALIDA', 'MUNICIPIO']
+
+
+@pytest.mark.parametrize("tipo", [object, "string", "str"])
+def test_mascara_ignora_acentos_e_maiusculas(tipo):
+    nomes = pd.Series(NOMES, dtype=tipo)
+    assert FiltroExclusao(TERMOS).mascara(nomes).tolist() == ESPERADO
+
+
+@pytest.mark.parametrize("tipo", [object, "str"])
+def test_mascara_vazia(tipo):
+    assert FiltroExclusao(TERMOS).mascara(pd.Series([], dtype=tipo)).tolist() == []
+    assert FiltroExclusao([]).mascara(pd.Series(['MUNICIPIO'], dtype=tipo)).tolist() == [False]
+
+
+def test_veredictos_em_cache_sao_limitados(monkeypatch):
+    monkeypatch.setattr(exclusao, "MAXIMO_VEREDICTOS_EXCLUSAO", 3)
+    filtro = FiltroExclusao(TERMOS)
+    for inicio in range(0, 20, 2):
+        nomes = pd.Series([f'EMPRESA {i}' for i in range(inicio, inicio + 2)], dtype=object)
+        assert not filtro.mascara(nomes).any()
+        assert len(filtro._veredictos) <= 3
+    assert filtro.mascara(pd.Series(NOMES, dtype=object)).tolist() == ESPERADO
+
+
+def test_obter_filtro_reaproveita_listas_equivalentes():
+    assert obter_filtro(['Falida', 'MASSA FALIDA']) is obter_filtro(['FALIDA'])
+
+
+def test_normalizar_nomes_sem_str_isascii(monkeypatch):
+    # Series.str.isascii só existe a partir do pandas 3; a normalização não pode depender dele
+    monkeypatch.delattr(pd.core.strings.accessor.StringMethods, "isascii")
+    nomes = pd.Series(['Falência', 'MUNICIPIO', None, 'Ação Ltda'], dtype=object)
+    assert normalizar_nomes(nomes).tolist()[:2] == ['FALENCIA', 'MUNICIPIO']
+    assert normalizar_nomes(nomes).tolist()[3] == 'ACAO LTDA'
+    assert FiltroExclusao(TERMOS).mascara(pd.Series(NOMES, dtype=object)).tolist() == ESPERADO
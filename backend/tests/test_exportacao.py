@@ -0,0 +1,67 @@
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from app import exportacao
+from app.exportacao import ABAS_PLANILHA, exportar, nome_exportacao
+
+
+@pytest.fixture
+def resultado(tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao, "DIRETORIO_EXPORTACOES", str(tmp_path / "exportacoes"))
+    # Blocos pequenos para que os arquivos de teste sejam gravados em vários blocos
+    monkeypatch.setattr(exportacao, "LINHAS_POR_BLOCO_EXPORTACAO", 7)
+    com = pd.DataFrame({'CPF_CNPJ': [f'{i:02d}.000.000/0001-00' for i in range(25)], 'NOME_DEVEDOR': ['EMPRESA AÇÃO'] * 25,
+                        'VALOR_TOTAL_DIVIDA': np.linspace(1000.5, 2000.25, 25)})
+    com.loc[3, 'NOME_DEVEDOR'] = None
+    sem = com.iloc[:0]
+    return {"com_parcelamento": com, "sem_parcelamento": sem}
+
+
+def test_csv_no_padrao_do_excel_em_portugues(resultado):
+    caminho = exportar(str(uuid.uuid4()), resultado, "csv", "com_parcelamento")
+    with open(caminho, "rb") as f:
+        assert f.read(3) == b"\xef\xbb\xbf"
+    lido = pd.read_csv(caminho, sep=";", decimal=",", encoding="utf-8-sig")
+    pd.testing.assert_frame_equal(lido, resultado["com_parcelamento"], check_dtype=False)
+
+
+def test_parquet_em_blocos_e_particao_vazia(resultado):
+    job_id = str(uuid.uuid4())
+    pd.testing.assert_frame_equal(pd.read_parquet(exportar(job_id, resultado, "parquet", "com_parcelamento")), resultado["com_parcelamento"])
+    vazio = pd.read_parquet(exportar(job_id, resultado, "parquet", "sem_parcelamento"))
+    assert vazio.empty and list(vazio.columns) == list(resultado["sem_parcelamento"].columns)
+
+
+def test_planilha_com_as_duas_abas(resultado):
+    planilha = load_workbook(exportar(str(uuid.uuid4()), resultado, "xlsx"), read_only=True)
+    assert planilha.sheetnames == list(ABAS_PLANILHA.values())
+    linhas = list(planilha[ABAS_PLANILHA["com_parcelamento"]].values)
+    assert list(linhas[0]) == list(resultado["com_parcelamento"].columns) and len(linhas) == 26
+    assert linhas[4][1] is None
+    assert list(planilha[ABAS_PLANILHA["sem_parcelamento"]].values) == [tuple(resultado["sem_parcelamento"].columns)]
+
+
+def test_arquivo_gerado_uma_vez_por_job_e_sem_colisao_de_prefixo(resultado, monkeypatch):
+    prefixo = "12345678"
+    primeiro, segundo = f"{prefixo}-aaaa", f"{prefixo}-bbbb"
+    caminho = exportar(primeiro, resultado, "csv", "com_parcelamento")
+    assert nome_exportacao(primeiro, "csv", "com_parcelamento") == nome_exportacao(segundo, "csv", "com_parcelamento")
+
+    gravacoes = []
+    gravar = exportacao._gravar_csv
+    monkeypatch.setattr(exportacao, "_gravar_csv", lambda df, destino: gravacoes.append(destino) or gravar(df, destino))
+    assert exportar(primeiro, resultado, "csv", "com_parcelamento") == caminho and gravacoes == []
+    # Mesmo prefixo no nome baixado, mas outro job: outro arquivo no cache
+    assert exportar(segundo, resultado, "csv", "com_parcelamento") != caminho and len(gravacoes) == 1
+    assert not os.path.exists(caminho + ".tmp")
+
+
+@pytest.mark.parametrize("formato, particao", [("pdf", "com_parcelamento"), ("csv", None), ("parquet", "outra")])
+def test_formato_ou_particao_invalidos(resultado, formato, particao):
+    with pytest.raises(ValueError):
+        exportar(str(uuid.uuid4()), resultado, formato, particao)
@@ -0,0 +1,116 @@
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app import processing
+from app.agendador import Agendador
+from app.cache import caminho_no_cache
+from app.cnpj import formatar_cnpj
+from app.exclusao import obter_filtro
+from app.indice import IndiceLimiar
+from app.jobs import MemoriaJobStore
+from app.pipeline import listar_csvs
+from app.snapshot import obter_snapshot
+from benchmarks.servidor import ServidorArquivo
+
+# Lista de termos do script original, com as variações acentuadas escritas uma a uma
+TERMOS_ORIGINAIS = ['MUNICIPIO', 'MUNICÍPIO', 'CONTABILIDADE', 'CONTÁBIL', 'CONTABIL', 'CONTADOR', 'CONTADORA', 'CONTADORES', 'FALENCIA',
+                    'FALÊNCIA', 'MASSA FALIDA', 'FALIDA', 'FALIDO', 'FILIAL', 'RECUPERACAO JUDICIAL', 'RECUPERAÇÃO JUDICIAL',
+                    'EM LIQUIDACAO', 'EM LIQUIDAÇÃO']
+TERMOS = ['MUNICIPIO', 'CONTABILIDADE', 'CONTABIL', 'CONTADOR', 'CONTADORA', 'CONTADORES', 'FALENCIA', 'MASSA FALIDA', 'FALIDA',
+          'FALIDO', 'FILIAL', 'RECUPERACAO JUDICIAL', 'EM LIQUIDACAO']
+
+# Colunas que o script original descartava do relatório por dívida
+COLUNAS_PARA_REMOVER_ORIGINAL = ['TIPO_PESSOA', 'TIPO_DEVEDOR', 'UNIDADE_RESPONSAVEL', 'NUMERO_INSCRICAO', 'TIPO_CREDITO', 'DATA_INSCRICAO',
+                                 'INDICADOR_AJUIZADO']
+
+
+@pytest.fixture(scope="module")
+def base_original(zip_pgfn) -> pd.DataFrame:
+    """A leitura da Fase 1 original: todos os CSVs inteiros, concatenados."""
+    with zipfile.ZipFile(zip_pgfn) as z:
+        partes = [pd.read_csv(z.open(nome), sep=';', encoding='latin-1', low_memory=False, dtype={'CPF_CNPJ': str})
+                  for nome in listar_csvs(zip_pgfn, "arquivo_lai_PREV_")]
+    return pd.concat(partes, ignore_index=True)
+
+
+def totalizar_original(df: pd.DataFrame, ufs, valor_minimo: float) -> pd.DataFrame:
+    """Os filtros e o groupby da Fase 1 original, sem nenhuma otimização."""
+    df = df[df['CPF_CNPJ'].str.contains('/0001-', na=False)]
+    df = df[df['UF_DEVEDOR'].isin(ufs)]
+    df = df[~df['NOME_DEVEDOR'].str.contains('|'.join(TERMOS_ORIGINAIS), case=False, na=False)]
+    df = df[df['VALOR_CONSOLIDADO'] > valor_minimo]
+    df_totalizado = df.groupby('CPF_CNPJ').agg(NOME_DEVEDOR=('NOME_DEVEDOR', 'first'), UF_DEVEDOR=('UF_DEVEDOR', 'first'),
+                                               VALOR_TOTAL_DIVIDA=('VALOR_CONSOLIDADO', 'sum')).reset_index()
+    df_totalizado['VALOR_TOTAL_DIVIDA'] = df_totalizado['VALOR_TOTAL_DIVIDA'].round(2)
+    return df_totalizado
+
+
+@pytest.mark.parametrize("ufs", [['RS'], ['RS', 'SC', 'SP']])
+def test_totalizar_igual_ao_groupby_original(zip_pgfn, base_original, ufs):
+    indice = IndiceLimiar(obter_snapshot(zip_pgfn, listar_csvs(zip_pgfn, "arquivo_lai_PREV_"), ufs), obter_filtro(TERMOS))
+    for valor_minimo in (0, 5_000, 10_000, 100_000, 10 ** 9):
+        esperado = totalizar_original(base_original, ufs, valor_minimo)
+        obtido = indice.totalizar(valor_minimo)
+        obtido = obtido.assign(CPF_CNPJ=formatar_cnpj(obtido['CPF_CNPJ']))
+        pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+        assert indice.contar_leads([valor_minimo]) == [len(esperado)]
+
+
+def test_relatorio_por_divida_igual_ao_original(zip_pgfn, base_original):
+    indice = IndiceLimiar(obter_snapshot(zip_pgfn, listar_csvs(zip_pgfn, "arquivo_lai_PREV_"), ['RS']), obter_filtro(TERMOS))
+    df = base_original[base_original['CPF_CNPJ'].str.contains('/0001-', na=False)]
+    df = df[df['UF_DEVEDOR'] == 'RS']
+    df = df[~df['NOME_DEVEDOR'].str.contains('|'.join(TERMOS_ORIGINAIS), case=False, na=False)]
+    for valor_minimo in (0, 10_000, 10 ** 9):
+        esperado = df[df['VALOR_CONSOLIDADO'] > valor_minimo].drop(columns=COLUNAS_PARA_REMOVER_ORIGINAL).reset_index(drop=True)
+        obtido = indice.debitos(valor_minimo)
+        obtido = obtido.assign(CPF_CNPJ=formatar_cnpj(obtido['CPF_CNPJ']))
+        pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+
+
+def test_chaves_de_cnpj_continuam_int64(zip_pgfn):
+    indice = IndiceLimiar(obter_snapshot(zip_pgfn, listar_csvs(zip_pgfn, "arquivo_lai_PREV_"), ['RS']), obter_filtro(TERMOS))
+    assert indice.cnpjs.dtype == np.int64
+    assert indice.totalizar(0)['CPF_CNPJ'].dtype == np.int64
+
+
+@pytest.fixture
+def base_publicada(zip_pgfn, monkeypatch):
+    """Publica o ZIP sintético num servidor local no lugar da URL do conjunto Previdenciário."""
+    with ServidorArquivo(zip_pgfn) as publicado:
+        monkeypatch.setitem(processing.DATASETS["PREVIDENCIARIO"], "url", publicado.url)
+        monkeypatch.setenv("PGFN_URL_DADOS_PREVIDENCIARIO", publicado.url)
+        yield publicado.url
+
+
+def test_limiares_com_base_fria_responde_202_e_prepara_fora_da_requisicao(base_publicada, monkeypatch):
+    from app import main
+
+    preparacoes = []
+    monkeypatch.setattr(main.agendador, "preparar", preparacoes.append)
+    cliente = TestClient(main.app)
+    resposta = cliente.get("/limiares", params={"valores": [0, 10_000, 10 ** 9], "uf": "RS"})
+    assert resposta.status_code == 202 and resposta.headers["Retry-After"]
+    assert preparacoes == ["PREVIDENCIARIO"]
+
+    processing.preparar_base("PREVIDENCIARIO")
+    resposta = cliente.get("/limiares", params={"valores": [0, 10_000, 10 ** 9], "uf": "RS"})
+    assert resposta.status_code == 200
+    leads = [limiar["leads"] for limiar in resposta.json()["limiares"]]
+    assert leads[0] > leads[1] > leads[2] == 0
+    assert cliente.get("/limiares", params={"valores": [0], "uf": "XX"}).status_code == 400
+
+
+def test_agendador_prepara_a_base_num_processo_do_pool(base_publicada):
+    agendador = Agendador(MemoriaJobStore(), maximo_simultaneos=1)
+    try:
+        assert agendador.preparar("previdenciario")
+        assert not agendador.preparar("PREVIDENCIARIO")  # já em andamento
+        agendador._preparacoes["PREVIDENCIARIO"].result(timeout=120)
+    finally:
+        agendador.encerrar()
+    assert processing.base_preparada("PREVIDENCIARIO") == caminho_no_cache(base_publicada)
@@ -0,0 +1,132 @@
+import time
+
+import pandas as pd
+import pytest
+
+from app import jobs as modulo_jobs
+from app.jobs import ERRO_JOB_ABANDONADO, JobStore, MemoriaJobStore, SQLiteJobStore, criar_job_store
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def armazenamento(request, tmp_path) -> JobStore:
+    return MemoriaJobStore() if request.param == "memoria" else SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def _envelhecer(armazenamento: JobStore, job_id: str, segundos: float):
+    """Recua no tempo o batimento e a última atualização do job."""
+    antes = time.time() - segundos
+    if isinstance(armazenamento, MemoriaJobStore):
+        armazenamento._jobs[job_id].update(batimento=antes, atualizado_em=antes)
+    else:
+        with armazenamento._conexao() as conexao:
+            conexao.execute("UPDATE jobs SET batimento = ?, atualizado_em = ? WHERE job_id = ?", (antes, antes, job_id))
+
+
+def _resultado(linhas: int):
+    return {"com_parcelamento": pd.DataFrame({"a": range(linhas)}), "sem_parcelamento": pd.DataFrame({"a": [0]})}
+
+
+def test_interface_incompleta_falha_ao_instanciar():
+    class Incompleto(JobStore):
+        def criar(self, job_id, status="processando", chave=None):
+            pass
+
+    with pytest.raises(TypeError):
+        Incompleto()
+
+
+def test_criar_job_store(tmp_path):
+    assert isinstance(criar_job_store("memoria"), MemoriaJobStore)
+    assert isinstance(criar_job_store(f"sqlite:///{tmp_path}/jobs.db"), SQLiteJobStore)
+    with pytest.raises(ValueError):
+        criar_job_store("redis://localhost")
+
+
+def test_criar_obter_e_atualizar(armazenamento):
+    armazenamento.criar("j", status="na_fila", chave="k")
+    armazenamento.atualizar("j", status="concluido", perfil="relatório")
+    job = armazenamento.obter("j")
+    assert (job["status"], job["chave"], job["perfil"], job["erro"]) == ("concluido", "k", "relatório", None)
+    assert armazenamento.obter("inexistente") is None and armazenamento.obter_resultado("j") is None
+
+
+def test_resultado_volta_igual(armazenamento):
+    resultado = {"com_parcelamento": pd.DataFrame({"CPF_CNPJ": ["12.345.678/0001-95"], "VALOR_TOTAL_DIVIDA": [1.5]}),
+                 "sem_parcelamento": pd.DataFrame({"CPF_CNPJ": pd.Series([], dtype=object)})}
+    armazenamento.criar("j")
+    armazenamento.gravar_resultado("j", resultado)
+    obtido = armazenamento.obter_resultado("j")
+    assert obtido["com_parcelamento"].to_dict("records") == resultado["com_parcelamento"].to_dict("records")
+    assert obtido["sem_parcelamento"].empty
+
+
+def test_remover_expirados_apaga_finalizados_antigos(armazenamento):
+    armazenamento.criar("antigo", status="concluido", chave="k")
+    armazenamento.gravar_resultado("antigo", _resultado(2))
+    armazenamento.criar("recente", status="concluido", chave="k2")
+    armazenamento.gravar_resultado("recente", _resultado(2))
+    _envelhecer(armazenamento, "antigo", 2 * modulo_jobs.TTL_JOBS_SEGUNDOS)
+
+    armazenamento.remover_expirados()
+    assert armazenamento.obter("antigo") is None and armazenamento.obter_resultado("antigo") is None
+    assert armazenamento.buscar_por_chave("k") is None
+    assert armazenamento.obter_resultado("recente")["com_parcelamento"]["a"].tolist() == [0, 1]
+
+
+def test_limite_de_tamanho_apaga_os_finalizados_mais_antigos(armazenamento, monkeypatch):
+    for indice, job_id in enumerate(["primeiro", "segundo", "em_andamento", "terceiro"]):
+        armazenamento.criar(job_id, status="processando" if job_id == "em_andamento" else "concluido")
+        armazenamento.gravar_resultado(job_id, _resultado(20_000))
+        _envelhecer(armazenamento, job_id, 10 - indice)
+    tamanho = len(modulo_jobs.serializar_tabela(_resultado(20_000)["com_parcelamento"])) if isinstance(armazenamento, SQLiteJobStore) \
+        else int(_resultado(20_000)["com_parcelamento"].memory_usage(deep=True).sum())
+
+    # Cabem só uns dois resultados e meio: os finalizados mais antigos saem até o total caber
+    monkeypatch.setattr(modulo_jobs, "TAMANHO_MAXIMO_RESULTADOS", int(tamanho * 2.5))
+    armazenamento.remover_expirados()
+    assert armazenamento.obter("primeiro") is None and armazenamento.obter("segundo") is None
+    # Jobs em andamento nunca são apagados para liberar espaço
+    assert armazenamento.obter_resultado("em_andamento") is not None
+    assert armazenamento.obter_resultado("terceiro") is not None
+
+
+def test_buscar_por_chave_reaproveita_o_mais_recente(armazenamento):
+    armazenamento.criar("a", status="concluido", chave="k")
+    armazenamento.criar("b", status="na_fila", chave="k")
+    armazenamento.criar("c", status="erro", chave="k2")
+    armazenamento.criar("d", status="cancelado", chave="k2")
+    assert armazenamento.buscar_por_chave("k")["job_id"] == "b"
+    # Jobs com erro ou cancelados não são reaproveitados
+    assert armazenamento.buscar_por_chave("k2") is None
+    assert armazenamento.buscar_por_chave("outra") is None
+
+
+def test_job_sem_batimento_nao_e_reaproveitado(armazenamento):
+    armazenamento.criar("vivo", status="processando", chave="k")
+    armazenamento.criar("morto", status="processando", chave="k")
+    _envelhecer(armazenamento, "morto", 2 * modulo_jobs.LIMITE_BATIMENTO_SEGUNDOS)
+    assert armazenamento.buscar_por_chave("k")["job_id"] == "vivo"
+
+    _envelhecer(armazenamento, "vivo", 2 * modulo_jobs.LIMITE_BATIMENTO_SEGUNDOS)
+    assert armazenamento.buscar_por_chave("k") is None
+    armazenamento.registrar_batimento(["vivo"])
+    assert armazenamento.buscar_por_chave("k")["job_id"] == "vivo"
+
+
+def test_jobs_abandonados_viram_erro(armazenamento):
+    armazenamento.criar("abandonado", status="na_fila", chave="k")
+    armazenamento.criar("ativo", status="processando", chave="k")
+    _envelhecer(armazenamento, "abandonado", 2 * modulo_jobs.LIMITE_BATIMENTO_SEGUNDOS)
+    armazenamento.remover_expirados()
+    assert armazenamento.obter("abandonado")["status"] == "erro"
+    assert armazenamento.obter("abandonado")["erro"] == ERRO_JOB_ABANDONADO
+    assert armazenamento.obter("ativo")["status"] == "processando"
+
+
+def test_jobs_abandonados_sao_resolvidos_ao_reabrir_o_sqlite(tmp_path):
+    caminho = str(tmp_path / "jobs.db")
+    armazenamento = SQLiteJobStore(caminho)
+    armazenamento.criar("abandonado", status="processando", chave="k")
+    _envelhecer(armazenamento, "abandonado", 2 * modulo_jobs.LIMITE_BATIMENTO_SEGUNDOS)
+    assert SQLiteJobStore(caminho).obter("abandonado")["status"] == "erro"
+
@@ -0,0 +1,43 @@
+import pickle
+
+import pytest
+
+from app.agendador import JobCancelado
+from app.metricas import MedidorDeEtapas, formatar_prometheus
+
+
+def test_etapa_registra_tempo_linhas_e_progresso():
+    progresso, metricas = [], []
+    medidor = MedidorDeEtapas(progresso.append, metricas)
+    with medidor.etapa("filtrando", linhas_entrada=10) as etapa:
+        etapa["linhas_saida"] = 4
+    assert progresso == ["filtrando"]
+    registro, = metricas
+    assert registro["etapa"] == "filtrando" and (registro["linhas_entrada"], registro["linhas_saida"]) == (10, 4)
+    assert not registro["erro"] and registro["duracao_segundos"] >= 0 and registro["cpu_segundos"] >= 0
+
+
+@pytest.mark.parametrize("excecao", [ValueError("painel inválido"), JobCancelado("cancelado")])
+def test_etapa_interrompida_tambem_e_registrada_com_erro(excecao):
+    medidor = MedidorDeEtapas()
+    with pytest.raises(type(excecao)):
+        with medidor.etapa("lendo_painel"):
+            raise excecao
+    registro, = medidor.metricas
+    assert registro["erro"] and registro["etapa"] == "lendo_painel" and "duracao_segundos" in registro
+
+
+def test_metricas_anexadas_a_excecao_sobrevivem_ao_pickle():
+    # É assim que as métricas de um job que falhou voltam do processo do pool
+    excecao = JobCancelado("cancelado")
+    excecao.metricas = [{"etapa": "baixando", "erro": True}]
+    assert pickle.loads(pickle.dumps(excecao)).metricas == excecao.metricas
+
+
+def test_formato_prometheus():
+    agregados = {"filtrando": {"execucoes": 2, "duracao_segundos": 0.7, "cpu_segundos": 0.5, "pico_rss_bytes": 1024,
+                               "linhas_entrada": 20, "linhas_saida": 8, "buckets": {0.5: 1, 1: 2}}}
+    texto = formatar_prometheus(agregados, {"concluido": 3})
+    assert 'pgfn_jobs{status="concluido"} 3' in texto
+    assert 'pgfn_etapa_duracao_segundos_bucket{etapa="filtrando",le="+Inf"} 2' in texto
+    assert 'pgfn_etapa_linhas_saida_total{etapa="filtrando"} 8' in texto
@@ -0,0 +1,126 @@
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from app import parcelamentos, uploads
+from app.cnpj import CNPJ_INVALIDO
+from app.parcelamentos import expandir_paineis, ler_painel, planilhas_extraidas, sha256_do_painel
+from app.processing import COLUNAS_PARA_MANTER_FASE2, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO
+from benchmarks.dados_sinteticos import gerar_devedores, gerar_painel
+
+
+@pytest.fixture(params=["openpyxl", "calamine"])
+def engine(request, tmp_path, monkeypatch):
+    """Roda o teste com cada leitor de XLSX, e com um cache de painéis só dele."""
+    if request.param == "calamine":
+        pytest.importorskip("python_calamine")
+    monkeypatch.setattr(parcelamentos, "ENGINE_CALAMINE_DISPONIVEL", request.param == "calamine")
+    monkeypatch.setattr(parcelamentos, "DIRETORIO_PAINEIS", str(tmp_path / "paineis"))
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def painel(tmp_path_factory) -> str:
+    caminho = str(tmp_path_factory.mktemp("paineis") / "painel do RS.xlsx")
+    gerar_painel(caminho, 300, gerar_devedores(500, np.random.default_rng(3)))
+    return caminho
+
+
+def _gravar_planilha(caminho: str, cabecalho, linhas):
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet("Parcelamentos")
+    aba.append(["Painel dos Parcelamentos"])
+    aba.append([])
+    aba.append(cabecalho)
+    for linha in linhas:
+        aba.append(linha)
+    planilha.save(caminho)
+    return caminho
+
+
+def test_le_so_as_colunas_usadas_com_a_chave_normalizada(engine, painel):
+    df = ler_painel(painel, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2)
+    original = pd.read_excel(painel, header=2)
+    assert list(df.columns) == ['CPF_CNPJ'] + COLUNAS_PARA_MANTER_FASE2
+    assert len(df) == len(original) and df['CPF_CNPJ'].dtype == np.int64
+    assert (df['CPF_CNPJ'] != CNPJ_INVALIDO).all()
+    assert df['Valor do Principal'].tolist() == original['Valor do Principal'].tolist()
+
+
+def test_cabecalho_com_espacos_e_linhas_de_cpf(engine, tmp_path):
+    caminho = _gravar_planilha(str(tmp_path / "painel.xlsx"), [f" {NOME_DA_COLUNA_CNPJ_NO_ARQUIVO} ", "Situação da Negociação", "Outra"],
+                               [["12.345.678/0001-95", "Em dia", 1], ["123.456.789-01", "Rescindida", 2], [191, "Em atraso", 3]])
+    df = ler_painel(caminho, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, ["Situação da Negociação"])
+    assert df['CPF_CNPJ'].tolist() == [12345678000195, 191]
+    assert df['Situação da Negociação'].tolist() == ["Em dia", "Em atraso"]
+
+
+@pytest.mark.parametrize("faltando", [NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, "Qtde de Parcelas em Atraso"])
+def test_coluna_ausente_e_erro_de_leitura_com_o_nome_dela(engine, tmp_path, faltando):
+    cabecalho = [c for c in [NOME_DA_COLUNA_CNPJ_NO_ARQUIVO] + COLUNAS_PARA_MANTER_FASE2 if c != faltando]
+    caminho = _gravar_planilha(str(tmp_path / "painel.xlsx"), cabecalho, [["12.345.678/0001-95"] + [1] * (len(cabecalho) - 1)])
+    with pytest.raises(ValueError, match=faltando):
+        ler_painel(caminho, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2)
+
+
+def test_mesma_planilha_sai_do_cache_pelo_sha256(engine, painel, monkeypatch):
+    primeira = ler_painel(painel, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2)
+
+    def nao_deveria_ler(*argumentos):
+        raise AssertionError("a planilha foi lida de novo")
+
+    monkeypatch.setattr(parcelamentos, "_ler_planilha", nao_deveria_ler)
+    with open(painel, "rb") as f:
+        conteudo = f.read()
+    assert sha256_do_painel(conteudo) == sha256_do_painel(painel)
+    # Os bytes da mesma planilha caem na mesma entrada do cache que o caminho
+    pd.testing.assert_frame_equal(ler_painel(conteudo, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2), primeira)
+    # Outras colunas mantidas são outra entrada do cache
+    with pytest.raises(AssertionError, match="lida de novo"):
+        ler_painel(painel, NOME_DA_COLUNA_CNPJ_NO_ARQUIVO, COLUNAS_PARA_MANTER_FASE2[:2])
+
+
+def _zip_de_paineis(caminho: str, painel: str, arquivos_extras: int = 0) -> str:
+    with zipfile.ZipFile(caminho, "w", zipfile.ZIP_DEFLATED) as z:
+        z.write(painel, "RS/painel.xlsx")
+        z.write(painel, "SC/painel.xlsx")
+        for numero in range(arquivos_extras):
+            z.writestr(f"leiame_{numero}.txt", "")
+    return caminho
+
+
+def test_zip_de_paineis_extraido_ao_lado_e_expira_junto(painel, tmp_path, monkeypatch):
+    caminho_zip = _zip_de_paineis(str(tmp_path / ("ab" * 32 + ".zip")), painel)
+    extraidas = expandir_paineis([caminho_zip])
+    assert extraidas == planilhas_extraidas(caminho_zip) and len(extraidas) == 2
+    with open(painel, "rb") as f, open(extraidas[0], "rb") as g:
+        assert f.read() == g.read()
+
+    # A planilha já extraída é reaproveitada com a data renovada
+    os.utime(extraidas[0], (0, 0))
+    assert expandir_paineis(caminho_zip) == extraidas and os.path.getmtime(extraidas[0]) > 0
+
+    monkeypatch.setattr(uploads, "DIRETORIO_UPLOADS", str(tmp_path))
+    os.utime(caminho_zip, (0, 0))
+    uploads._remover_uploads_expirados()
+    assert not os.path.exists(caminho_zip) and planilhas_extraidas(caminho_zip) == []
+
+
+def test_zip_de_paineis_acima_dos_limites_e_recusado_antes_de_extrair(painel, tmp_path, monkeypatch):
+    caminho_zip = _zip_de_paineis(str(tmp_path / "paineis.zip"), painel, arquivos_extras=5)
+    monkeypatch.setattr(parcelamentos, "TAMANHO_MAXIMO_PAINEIS_ZIP", 2 * os.path.getsize(painel) - 1)
+    with pytest.raises(ValueError, match="descompactadas"):
+        expandir_paineis(caminho_zip)
+    with open(caminho_zip, "rb") as f:
+        with pytest.raises(ValueError, match="descompactadas"):
+            expandir_paineis(f.read())
+    assert planilhas_extraidas(caminho_zip) == []
+
+    monkeypatch.setattr(parcelamentos, "TAMANHO_MAXIMO_PAINEIS_ZIP", 2 * os.path.getsize(painel))
+    monkeypatch.setattr(parcelamentos, "MAXIMO_ARQUIVOS_ZIP", 6)
+    with pytest.raises(ValueError, match="mais de 6 arquivos"):
+        expandir_paineis(caminho_zip)
@@ -0,0 +1,49 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.resultados import LIMITE_MAXIMO_PAGINA, codificar_cursor, decodificar_cursor, pagina
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'CPF_CNPJ': [f'{i:02d}' for i in range(7)], 'VALOR_TOTAL_DIVIDA': [30.0, 10.0, np.nan, 30.0, 50.0, 20.0, 10.0]})
+
+
+def test_cursor_ida_e_volta():
+    assert decodificar_cursor(codificar_cursor(200, 'VALOR_TOTAL_DIVIDA', False)) == (200, 'VALOR_TOTAL_DIVIDA', False)
+    assert decodificar_cursor(codificar_cursor(0, None, True)) == (0, None, True)
+
+
+@pytest.mark.parametrize("cursor", ["", "nao-e-base64!", codificar_cursor(1, None, True)[:-3], "eyJ4IjoxfQ"])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        decodificar_cursor(cursor)
+
+
+def test_paginas_seguindo_o_cursor_percorrem_tudo_na_ordem(df):
+    job_id, vistos, offset = str(uuid.uuid4()), [], 0
+    ordenar, decrescente = 'VALOR_TOTAL_DIVIDA', True
+    while True:
+        resposta = pagina(job_id, 'com_parcelamento', df, offset, 3, ordenar=ordenar, decrescente=decrescente)
+        assert resposta['total'] == len(df)
+        vistos += [registro['CPF_CNPJ'] for registro in resposta['registros']]
+        if resposta['proximo_cursor'] is None:
+            break
+        offset, ordenar, decrescente = decodificar_cursor(resposta['proximo_cursor'])
+    # Ordenação estável, com os nulos no fim
+    assert vistos == ['04', '00', '03', '05', '01', '06', '02']
+
+
+def test_pagina_colunar_e_projecao(df):
+    resposta = pagina(str(uuid.uuid4()), 'com_parcelamento', df, 5, 10, colunas=['CPF_CNPJ'], formato='colunar')
+    assert resposta['colunas'] == ['CPF_CNPJ'] and resposta['dados'] == [['05', '06']]
+    assert resposta['proximo_cursor'] is None
+
+
+def test_pagina_limites_e_colunas_invalidas(df):
+    assert pagina(str(uuid.uuid4()), 'com_parcelamento', df, 0, 10 * LIMITE_MAXIMO_PAGINA)['limite'] == LIMITE_MAXIMO_PAGINA
+    with pytest.raises(ValueError, match='inexistentes'):
+        pagina(str(uuid.uuid4()), 'com_parcelamento', df, ordenar='X')
@@ -0,0 +1,65 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import serializacao
+from app.serializacao import TAMANHO_MINIMO_COMPRESSAO, escolher_codificacao, responder_json
+
+
+@pytest.fixture
+def cliente():
+    serializacao._respostas.clear()
+    serializacao._tamanho_respostas = 0
+    geracoes = []
+    app = FastAPI()
+
+    @app.get("/dados/{linhas}")
+    def dados(linhas: int, request: Request):
+        return responder_json(request, ("dados", linhas), lambda: geracoes.append(linhas) or {"linhas": list(range(linhas))})
+
+    cliente = TestClient(app)
+    cliente.geracoes = geracoes
+    return cliente
+
+
+def _pedir(cliente, linhas, codificacao, etag=None):
+    cabecalhos = {"Accept-Encoding": codificacao}
+    if etag:
+        cabecalhos["If-None-Match"] = etag
+    return cliente.get(f"/dados/{linhas}", headers=cabecalhos)
+
+
+def test_cada_compressao_tem_a_sua_etag(cliente):
+    identidade, comprimida = _pedir(cliente, 2_000, "identity"), _pedir(cliente, 2_000, "gzip")
+    assert comprimida.headers["Content-Encoding"] == "gzip" and "Content-Encoding" not in identidade.headers
+    assert comprimida.headers["ETag"] == identidade.headers["ETag"][:-1] + '-gz"'
+    assert identidade.headers["Vary"] == comprimida.headers["Vary"] == "Accept-Encoding"
+    assert comprimida.json() == identidade.json() and cliente.geracoes == [2_000]
+
+    # A ETag de uma representação não valida a outra
+    assert _pedir(cliente, 2_000, "gzip", comprimida.headers["ETag"]).status_code == 304
+    revalidada = _pedir(cliente, 2_000, "identity", comprimida.headers["ETag"])
+    assert revalidada.status_code == 200 and revalidada.headers["ETag"] == identidade.headers["ETag"]
+    resposta_304 = _pedir(cliente, 2_000, "identity", identidade.headers["ETag"])
+    assert resposta_304.status_code == 304 and resposta_304.headers["Vary"] == "Accept-Encoding"
+
+
+def test_resposta_pequena_vai_sem_compressao_e_com_a_etag_dela(cliente):
+    pedida_gzip = _pedir(cliente, 3, "gzip")
+    assert len(pedida_gzip.content) < TAMANHO_MINIMO_COMPRESSAO and "Content-Encoding" not in pedida_gzip.headers
+    assert pedida_gzip.headers["ETag"] == _pedir(cliente, 3, "identity").headers["ETag"]
+    # Também quando sai do cache de respostas
+    assert _pedir(cliente, 3, "gzip", pedida_gzip.headers["ETag"]).status_code == 304
+
+
+def test_corpo_gzip_guardado_e_o_json_comprimido(cliente):
+    _pedir(cliente, 2_000, "gzip")
+    codificacao, corpo = serializacao._respostas[(("dados", 2_000), "gzip")]
+    assert codificacao == "gzip" and gzip.decompress(corpo) == serializacao._respostas[(("dados", 2_000), "identity")][1]
+
+
+@pytest.mark.parametrize("cabecalho, esperada", [("gzip, deflate", "gzip"), ("gzip;q=0", "identity"), (None, "identity")])
+def test_escolher_codificacao(cabecalho, esperada):
+    assert escolher_codificacao(cabecalho) == esperada
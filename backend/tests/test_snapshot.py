@@ -0,0 +1,92 @@
+import os
+import shutil
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app import snapshot
+from app.cnpj import e_matriz, normalizar_cnpj
+from app.devedores import COLUNAS_DETALHE_FASE1, ESQUEMA_PARTICAO, particionar_por_uf
+from app.pipeline import listar_csvs
+
+
+@pytest.fixture
+def zip_local(zip_pgfn, tmp_path, monkeypatch) -> str:
+    """Cópia do ZIP sintético com um diretório de snapshots só deste teste."""
+    monkeypatch.setattr(snapshot, "DIRETORIO_SNAPSHOTS", str(tmp_path / "snapshots"))
+    snapshot._particoes_abertas.clear()
+    return shutil.copy(zip_pgfn, str(tmp_path / os.path.basename(zip_pgfn)))
+
+
+@pytest.fixture
+def construcoes(monkeypatch):
+    chamadas = []
+    construir = snapshot.construir_particoes
+    monkeypatch.setattr(snapshot, "construir_particoes", lambda *a, **k: chamadas.append(a[2]) or construir(*a, **k))
+    return chamadas
+
+
+def test_particiona_uma_vez_por_versao_do_zip(zip_local, construcoes):
+    nomes = listar_csvs(zip_local, "arquivo_lai_PREV_")
+    rs = snapshot.obter_snapshot(zip_local, nomes, ['RS'])
+    sc_sp = snapshot.obter_snapshot(zip_local, nomes, ['SC', 'SP'])
+    assert len(construcoes) == 1
+    assert set(rs.column('UF_DEVEDOR').to_pylist()) == {'RS'}
+    assert set(sc_sp.column('UF_DEVEDOR').to_pylist()) == {'SC', 'SP'}
+
+    # Nova versão do ZIP (outro tamanho): particiona de novo e apaga as partições da versão anterior
+    anterior = construcoes[0]
+    with zipfile.ZipFile(zip_local, "a") as z:
+        z.writestr("LEIAME.txt", "nova versão")
+    snapshot.obter_snapshot(zip_local, nomes, ['RS'])
+    assert len(construcoes) == 2 and construcoes[1] != anterior
+    assert not os.path.exists(anterior)
+
+
+def test_particao_mantem_a_ordem_e_os_filtros_da_leitura_original(zip_local):
+    nomes = listar_csvs(zip_local, "arquivo_lai_PREV_")
+    with zipfile.ZipFile(zip_local) as z:
+        original = pd.concat([pd.read_csv(z.open(nome), sep=';', encoding='latin-1', dtype={'CPF_CNPJ': str}) for nome in nomes],
+                             ignore_index=True)
+    original = original[original['CPF_CNPJ'].str.contains('/0001-') & (original['UF_DEVEDOR'] == 'RS')]
+
+    rs = snapshot.obter_snapshot(zip_local, nomes, ['RS']).to_pandas()
+    assert rs['CPF_CNPJ'].tolist() == normalizar_cnpj(original['CPF_CNPJ']).tolist()
+    assert rs['VALOR_CONSOLIDADO'].tolist() == original['VALOR_CONSOLIDADO'].tolist()
+    assert e_matriz(rs['CPF_CNPJ']).all()
+
+
+def test_uf_sem_debitos_devolve_tabela_vazia(zip_local):
+    nomes = listar_csvs(zip_local, "arquivo_lai_PREV_")
+    destino = snapshot.diretorio_particoes(zip_local, nomes)
+    snapshot.obter_snapshot(zip_local, nomes, ['RS'])
+    os.remove(os.path.join(destino, "RR.arrow"))
+    vazia = snapshot.obter_snapshot(zip_local, nomes, ['RR'])
+    assert vazia.num_rows == 0 and vazia.schema == ESQUEMA_PARTICAO
+
+
+def test_particionamento_em_varios_processos_igual_ao_sequencial(zip_local, tmp_path):
+    nomes = listar_csvs(zip_local, "arquivo_lai_PREV_")
+    totais_paralelo = particionar_por_uf(zip_local, nomes, str(tmp_path / "paralelo"), workers=2)
+    totais_sequencial = particionar_por_uf(zip_local, nomes, str(tmp_path / "sequencial"), workers=1)
+    assert totais_paralelo == totais_sequencial
+    for uf in totais_sequencial:
+        ler = lambda pasta: pa.ipc.open_file(str(tmp_path / pasta / f"{uf}.arrow")).read_all()
+        assert ler("paralelo").equals(ler("sequencial"))
+
+
+def test_csv_sem_as_colunas_de_detalhe_fica_com_elas_nulas(tmp_path):
+    caminho_zip = str(tmp_path / "antigo.zip")
+    with zipfile.ZipFile(caminho_zip, "w") as z:
+        z.writestr("arquivo_lai_PREV_1_202001.csv", "CPF_CNPJ;NOME_DEVEDOR;UF_DEVEDOR;VALOR_CONSOLIDADO\n12.345.678/0001-95;EMPRESA;RS;1500.5\n")
+    assert particionar_por_uf(caminho_zip, ["arquivo_lai_PREV_1_202001.csv"], str(tmp_path / "particoes"), workers=1) == {"RS": 1}
+    rs = pa.ipc.open_file(str(tmp_path / "particoes" / "RS.arrow")).read_all()
+    assert rs.schema == ESQUEMA_PARTICAO and rs.column('VALOR_CONSOLIDADO').to_pylist() == [1500.5]
+    assert all(rs.column(coluna).null_count == 1 for coluna in COLUNAS_DETALHE_FASE1)
+
+    with zipfile.ZipFile(caminho_zip, "w") as z:
+        z.writestr("arquivo_lai_PREV_1_202001.csv", "CPF_CNPJ;NOME_DEVEDOR;VALOR_CONSOLIDADO\n12.345.678/0001-95;EMPRESA;1500.5\n")
+    with pytest.raises(ValueError, match="UF_DEVEDOR"):
+        particionar_por_uf(caminho_zip, ["arquivo_lai_PREV_1_202001.csv"], str(tmp_path / "outra"), workers=1)
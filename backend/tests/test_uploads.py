@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import uploads
+from app.uploads import ArquivoMuitoGrande, receber_formulario
+
+DELIMITADOR = b"----delimitador-de-teste"
+
+
+@pytest.fixture(autouse=True)
+def diretorio_uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "DIRETORIO_UPLOADS", str(tmp_path / "uploads"))
+    return tmp_path / "uploads"
+
+
+def _corpo(campos, arquivos) -> bytes:
+    partes = []
+    for nome, valor in campos.items():
+        partes.append(b"--" + DELIMITADOR + b'\r\nContent-Disposition: form-data; name="' + nome.encode() + b'"\r\n\r\n' + valor.encode() + b"\r\n")
+    for nome_arquivo, conteudo in arquivos:
+        partes.append(b"--" + DELIMITADOR + b'\r\nContent-Disposition: form-data; name="file"; filename="' + nome_arquivo.encode()
+                      + b'"\r\nContent-Type: application/octet-stream\r\n\r\n' + conteudo + b"\r\n")
+    return b"".join(partes) + b"--" + DELIMITADOR + b"--\r\n"
+
+
+def _receber_em_blocos(corpo: bytes, tamanho_bloco: int):
+    """Entrega o corpo ao receber_formulario como uma conexão entregaria um envio em chunks, sem Content-Length."""
+    blocos = [corpo[inicio:inicio + tamanho_bloco] for inicio in range(0, len(corpo), tamanho_bloco)]
+    entregues = []
+
+    async def receive():
+        if len(entregues) == len(blocos):
+            return {"type": "http.request", "body": b"", "more_body": False}
+        entregues.append(blocos[len(entregues)])
+        return {"type": "http.request", "body": entregues[-1], "more_body": True}
+
+    escopo = {"type": "http", "method": "POST", "path": "/processar",
+              "headers": [(b"content-type", b"multipart/form-data; boundary=" + DELIMITADOR), (b"transfer-encoding", b"chunked")]}
+    try:
+        return asyncio.run(receber_formulario(Request(escopo, receive))), entregues, blocos
+    except ArquivoMuitoGrande:
+        return None, entregues, blocos
+
+
+def test_arquivos_vao_direto_para_o_disco_nomeados_pelo_sha256(diretorio_uploads):
+    painel, outro = os.urandom(300_000), os.urandom(1_000)
+    corpo = _corpo({"valor_minimo": "1000.5", "uf": "RS,SC"}, [("painel RS.xlsx", painel), ("paineis.ZIP", outro)])
+    (campos, recebidos), _, _ = _receber_em_blocos(corpo, 7_000)
+    assert campos == {"valor_minimo": "1000.5", "uf": "RS,SC"}
+    assert [recebido.nome for recebido in recebidos] == ["painel RS.xlsx", "paineis.ZIP"]
+    for recebido, conteudo in zip(recebidos, (painel, outro)):
+        assert recebido.sha256 == hashlib.sha256(conteudo).hexdigest() and recebido.tamanho == len(conteudo)
+        with open(recebido.caminho, "rb") as f:
+            assert f.read() == conteudo
+    assert recebidos[1].caminho.endswith(".zip")
+    assert sorted(os.listdir(diretorio_uploads)) == sorted(os.path.basename(r.caminho) for r in recebidos)
+
+
+def test_envio_em_chunks_acima_do_limite_para_no_primeiro_bloco_excedente(diretorio_uploads, monkeypatch):
+    monkeypatch.setattr(uploads, "TAMANHO_MAXIMO_UPLOAD", 100_000)
+    corpo = _corpo({"valor_minimo": "0"}, [("painel.xlsx", os.urandom(1_000_000))])
+    resultado, entregues, blocos = _receber_em_blocos(corpo, 10_000)
+    assert resultado is None
+    # Parou logo depois do limite, sem ler o resto do corpo, e sem deixar temporários para trás
+    assert len(entregues) <= 12 < len(blocos)
+    assert os.listdir(diretorio_uploads) == []
+
+
+def test_processar_recebe_o_formulario_em_streaming(monkeypatch):
+    from app import main
+
+    pedidos = []
+    monkeypatch.setattr(main.agendador, "submeter", lambda *a, **k: pedidos.append((a, k)) or ("id-do-job", False))
+    cliente = TestClient(main.app)
+    arquivos = [("file", ("a.xlsx", b"planilha a")), ("file", ("b.xlsx", b"planilha b"))]
+    resposta = cliente.post("/processar?modo=delta", data={"valor_minimo": "2500", "termos_excluir": "FILIAL, MASSA FALIDA", "perfil": "true"},
+                            files=arquivos)
+    assert resposta.status_code == 202 and resposta.json()["job_id"] == "id-do-job"
+    (valor_minimo, caminhos, termos, perfil, uf, dataset, modo), opcoes = pedidos[0]
+    assert (valor_minimo, termos, perfil, uf, dataset, modo) == (2500.0, ["FILIAL", "MASSA FALIDA"], True, "RS", "PREVIDENCIARIO", "delta")
+    assert opcoes["hashes"] == [hashlib.sha256(b"planilha a").hexdigest(), hashlib.sha256(b"planilha b").hexdigest()]
+
+    assert cliente.post("/processar", data={"valor_minimo": "2500"}).status_code == 400  # não é multipart
+    assert cliente.post("/processar", files=arquivos).status_code == 422
+    assert cliente.post("/processar", data={"valor_minimo": "muito"}, files=arquivos).status_code == 422
+
+
+def test_processar_responde_413(monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(uploads, "TAMANHO_MAXIMO_UPLOAD", 10_000)
+    resposta = TestClient(main.app).post("/processar", data={"valor_minimo": "0"}, files=[("file", ("a.xlsx", os.urandom(50_000)))])
+    assert resposta.status_code == 413